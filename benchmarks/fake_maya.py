@@ -0,0 +1,196 @@
+import os
+import sys
+import types
+from collections import Counter
+from logic.ma_scanner import MaScanner
+
+
+class FakeScene:
+
+
+    def __init__(self):
+
+        self.scene_name: str = ''
+        self.nodes: dict = {} # node name -> {'type': node type, 'attributes': {attribute: value}}
+        self.references: list = []
+        # Maya defaults of a new scene
+        self.render_globals: dict = {'animation': False, 'startFrame': 1.0, 'endFrame': 10.0}
+        self.playback: dict = {'minTime': 1.0, 'maxTime': 120.0}
+
+
+    def load(self, filepath: str) -> None:
+
+        # the same scanner as the headless dependency scan reads the scene
+        scanner: MaScanner = MaScanner(filepath=filepath)
+        scanner.scan()
+        self.scene_name = filepath.replace('\\', '/')
+        self.nodes = {}
+        for node, node_type in scanner.nodes.items():
+            self.nodes[node] = {'type': node_type, 'attributes': {}}
+        for dependency in scanner.dependencies:
+            self.nodes[dependency.node]['attributes'][dependency.attribute] = dependency.value
+        self.references = list(scanner.references)
+
+
+    def merge(self, filepath: str) -> None:
+
+        reference: FakeScene = FakeScene()
+        reference.load(filepath)
+        self.nodes.update(reference.nodes)
+        self.references.extend(path for path in reference.references if path not in self.references)
+
+
+    def save(self, filepath: str) -> None:
+
+        lines: list = ['//Maya ASCII 2023 scene', f'//Name: {os.path.basename(filepath)}', 'requires maya "2023";']
+        for reference in self.references:
+            lines.append(f'file -r -typ "mayaAscii" "{escape(reference)}";')
+        for node, data in self.nodes.items():
+            lines.append(f'createNode {data["type"]} -n "{escape(node)}";')
+            for attribute, value in data['attributes'].items():
+                lines.append(f'\tsetAttr ".{attribute}" -type "string" "{escape(value)}";')
+        with open(filepath, 'w', encoding='utf-8') as scene_file:
+            scene_file.write('\n'.join(lines) + '\n')
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class FakeCmds(types.ModuleType):
+
+
+    def __init__(self):
+
+        super().__init__('maya.cmds')
+        self.scene: FakeScene = FakeScene()
+        self.calls: Counter = Counter()
+        self.undo_state: bool = True
+
+
+    def ls(self, type=None, showType=False, **kwargs) -> list:
+
+        self.calls['ls'] += 1
+        node_types: list = [type] if isinstance(type, str) else list(type or [])
+        nodes: list = [node for node, data in self.scene.nodes.items() if not node_types or data['type'] in node_types]
+        if not showType:
+            return nodes
+        return [item for node in nodes for item in (node, self.scene.nodes[node]['type'])]
+
+
+    def nodeType(self, node: str) -> str:
+
+        self.calls['nodeType'] += 1
+        return self.scene.nodes[node]['type']
+
+
+    def getAttr(self, plug: str, **kwargs) -> str:
+
+        self.calls['getAttr'] += 1
+        node, attribute = plug.split('.', 1)
+        if node == 'defaultRenderGlobals':
+            return self.scene.render_globals[attribute]
+        return self.scene.nodes[node]['attributes'].get(attribute, '')
+
+
+    def setAttr(self, plug: str, value: str, type: str = None, **kwargs) -> None:
+
+        self.calls['setAttr'] += 1
+        node, attribute = plug.split('.', 1)
+        self.scene.nodes[node]['attributes'][attribute] = value
+
+
+    def file(self, *args, **kwargs):
+
+        self.calls['file'] += 1
+        if kwargs.get('query') or kwargs.get('q'):
+            if kwargs.get('sceneName') or kwargs.get('sn'):
+                return self.scene.scene_name
+            if kwargs.get('reference') or kwargs.get('r'):
+                return list(self.scene.references)
+            return None
+        if kwargs.get('new'):
+            self.scene = FakeScene()
+            return None
+        if kwargs.get('open'):
+            self.scene.load(args[0])
+            return args[0]
+        if kwargs.get('importReference'):
+            self.scene.references.remove(args[0])
+            self.scene.merge(args[0])
+            return None
+        if 'rename' in kwargs:
+            self.scene.scene_name = kwargs['rename'].replace('\\', '/')
+            return kwargs['rename']
+        if kwargs.get('save'):
+            self.scene.save(self.scene.scene_name)
+            return self.scene.scene_name
+        return None
+
+
+    def playbackOptions(self, *args, **kwargs):
+
+        self.calls['playbackOptions'] += 1
+        for option in ('minTime', 'maxTime'):
+            if kwargs.get(option) is not None and not kwargs.get('query'):
+                self.scene.playback[option] = float(kwargs[option])
+            elif kwargs.get(option) and kwargs.get('query'):
+                return self.scene.playback[option]
+        return None
+
+
+    def pluginInfo(self, *args, **kwargs) -> bool:
+        return True
+
+
+    def loadPlugin(self, *args, **kwargs) -> None:
+        return None
+
+
+    def error(self, message: str) -> None:
+        raise RuntimeError(message)
+
+
+    def warning(self, message: str) -> None:
+        return None
+
+
+    def confirmDialog(self, *args, **kwargs) -> str:
+        return kwargs.get('button', 'OK')
+
+
+    def undoInfo(self, *args, **kwargs) -> bool:
+
+        if kwargs.get('query'):
+            return self.undo_state
+        self.undo_state = kwargs.get('state', kwargs.get('stateWithoutFlush', self.undo_state))
+        return self.undo_state
+
+
+class FakeMel(types.ModuleType):
+
+
+    def __init__(self):
+
+        super().__init__('maya.mel')
+        self.commands: list = []
+
+
+    def eval(self, command: str):
+
+        self.commands.append(command)
+        return None
+
+
+def install() -> FakeCmds:
+
+    # stands in for maya, maya.cmds and maya.mel so that logic.archive imports and runs without Maya
+    maya = types.ModuleType('maya')
+    cmds: FakeCmds = FakeCmds()
+    mel: FakeMel = FakeMel()
+    maya.cmds = cmds
+    maya.mel = mel
+    sys.modules['maya'] = maya
+    sys.modules['maya.cmds'] = cmds
+    sys.modules['maya.mel'] = mel
+    return cmds
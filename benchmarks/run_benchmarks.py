@@ -0,0 +1,154 @@
+import argparse
+import builtins
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from .show_tree import SCALES, generate_show
+
+
+REPO_DIRPATH: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAYA_PROJECT_DIRPATH: str = os.path.join(REPO_DIRPATH, 'project_files', 'maya')
+COUNTED_OS_FUNCTIONS: tuple = ('stat', 'lstat', 'scandir', 'listdir', 'mkdir', 'makedirs', 'replace', 'remove', 'utime', 'link', 'chmod')
+
+
+def read_proc_io() -> dict:
+
+    # read/write syscall counters of this process, Linux only
+    try:
+        with open('/proc/self/io', 'r') as io_file:
+            return {key: int(value) for key, value in (line.split(': ') for line in io_file)}
+    except OSError:
+        return {}
+
+
+def count_calls() -> Counter:
+
+    # counts the filesystem calls made through the os module and open()
+    calls: Counter = Counter()
+
+    def wrap(name: str, function):
+        def counted(*args, **kwargs):
+            calls[name] += 1
+            return function(*args, **kwargs)
+        return counted
+
+    for name in COUNTED_OS_FUNCTIONS:
+        if hasattr(os, name):
+            setattr(os, name, wrap(name, getattr(os, name)))
+    builtins.open = wrap('open', builtins.open)
+    return calls
+
+
+def archived_size(archive_path: str) -> tuple:
+
+    files: int = 0
+    size: int = 0
+    for dirpath, dirnames, filenames in os.walk(archive_path):
+        for filename in filenames:
+            if filename.endswith(('.log', '.jsonl', '.json', '.mel')):
+                continue
+            files += 1
+            size += os.path.getsize(os.path.join(dirpath, filename))
+    return files, size
+
+
+def run_case(target: str, source_path: str, archive_path: str) -> dict:
+
+    from . import fake_maya
+    cmds = fake_maya.install()
+    from logic.archive import Archive
+
+    archive_tool: Archive = Archive(source_path=source_path, archive_path=archive_path)
+    archive_tool.MAYA_PROJECT_DIRPATH = MAYA_PROJECT_DIRPATH
+    calls: Counter = count_calls()
+    io_before: dict = read_proc_io()
+
+    start: float = time.perf_counter()
+    if target == 'archive_file':
+        source_filepath: str = archive_tool.list_files(dirpath=source_path)[0]
+        archive_tool.archive_file(source_path=source_filepath, archiving_dirpath=archive_path)
+    else:
+        archive_tool.archive_files()
+    duration: float = time.perf_counter() - start
+
+    io_after: dict = read_proc_io()
+    files, size = archived_size(archive_path)
+    return {
+        'target': target,
+        'duration': duration,
+        'files': files,
+        'bytes': size,
+        'files_per_second': files / duration if duration else 0.0,
+        'mb_per_second': size / duration / 1024 / 1024 if duration else 0.0,
+        'read_syscalls': io_after.get('syscr', 0) - io_before.get('syscr', 0),
+        'write_syscalls': io_after.get('syscw', 0) - io_before.get('syscw', 0),
+        'fs_calls': sum(calls.values()),
+        'fs_calls_detail': dict(calls),
+        'cmds_calls': dict(cmds.calls),
+        'peak_memory_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def run_case_subprocess(target: str, source_path: str, archive_path: str) -> dict:
+
+    # one process per case, so that peak memory and syscall counters are not shared between cases
+    command: list = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--run-case', target, source_path, archive_path]
+    output: str = subprocess.run(command, cwd=REPO_DIRPATH, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_table(results: list) -> None:
+
+    print(f"{'scale':<8} {'target':<14} {'time s':>8} {'files':>7} {'MB':>9} {'files/s':>9} {'MB/s':>8} {'r sys':>8} {'w sys':>8} {'fs calls':>9} {'peak MB':>8}")
+    for result in results:
+        print(f"{result['scale']:<8} {result['target']:<14} {result['duration']:>8.2f} {result['files']:>7} {result['bytes'] / 1024 / 1024:>9.1f} "
+              f"{result['files_per_second']:>9.1f} {result['mb_per_second']:>8.1f} {result['read_syscalls']:>8} {result['write_syscalls']:>8} "
+              f"{result['fs_calls']:>9} {result['peak_memory_mb']:>8.1f}")
+
+
+def main(arguments: list = None) -> list:
+
+    parser = argparse.ArgumentParser(description='Benchmark Archive.archive_file / archive_files on a synthetic show tree with a fake maya.cmds.')
+    parser.add_argument('--scales', nargs='+', default=['small'], choices=sorted(SCALES))
+    parser.add_argument('--targets', nargs='+', default=['archive_file', 'archive_files'], choices=['archive_file', 'archive_files'])
+    parser.add_argument('--workdir', default=None, help='where the show trees are generated, a temporary directory by default')
+    parser.add_argument('--json', default=None, help='also write the results to this json file')
+    parser.add_argument('--run-case', nargs=3, metavar=('TARGET', 'SOURCE', 'ARCHIVE'), help=argparse.SUPPRESS)
+    arguments = parser.parse_args(arguments)
+
+    if arguments.run_case:
+        print(json.dumps(run_case(*arguments.run_case)))
+        return []
+
+    workdir: str = arguments.workdir or tempfile.mkdtemp(prefix='archive_bench_')
+    results: list = []
+    try:
+        for scale in arguments.scales:
+            show: dict = generate_show(os.path.join(workdir, scale, 'show'), **SCALES[scale])
+            for target in arguments.targets:
+                archive_path: str = os.path.join(workdir, scale, f'archive_{target}')
+                os.makedirs(archive_path)
+                result: dict = run_case_subprocess(target=target, source_path=show['source_path'], archive_path=archive_path)
+                result['scale'] = scale
+                results.append(result)
+                shutil.rmtree(archive_path)
+    finally:
+        if arguments.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+    if arguments.json:
+        with open(arguments.json, 'w', encoding='utf-8') as json_file:
+            json.dump(results, json_file, indent=4)
+    return results
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,81 @@
+import os
+from .fake_maya import FakeScene
+
+
+SCALES: dict = {
+    'small': {'assets': 2, 'textures_per_asset': 4, 'udims': 10, 'shared_textures': 4, 'rib_frames': 24, 'alembic_size': 8 * 1024 * 1024},
+    'medium': {'assets': 5, 'textures_per_asset': 10, 'udims': 40, 'shared_textures': 20, 'rib_frames': 120, 'alembic_size': 64 * 1024 * 1024},
+    'large': {'assets': 10, 'textures_per_asset': 20, 'udims': 100, 'shared_textures': 50, 'rib_frames': 480, 'alembic_size': 256 * 1024 * 1024}
+}
+
+
+def write_file(filepath: str, size: int, sparse: bool = False) -> None:
+
+    with open(filepath, 'wb') as output_file:
+        if sparse:
+            output_file.truncate(size)
+            return
+        # non zero, varying content so that dedup and checksums are meaningful
+        output_file.write((os.path.basename(filepath).encode() * (size // len(os.path.basename(filepath)) + 1))[:size])
+
+
+def generate_show(root: str, assets: int = 2, textures_per_asset: int = 4, udims: int = 10, shared_textures: int = 4,
+                  rib_frames: int = 24, alembic_size: int = 8 * 1024 * 1024, tile_size: int = 64 * 1024, rib_size: int = 32 * 1024) -> dict:
+
+    # mirrors the COUPDESOLEIL layout: 09_publish scenes pointing at 10_texture maps, rib sequences and alembic caches
+    show_root: str = os.path.join(root, 'COUPDESOLEIL')
+    publish_dirpath: str = os.path.join(show_root, '09_publish', 'asset', '04_enviro')
+    shared_map_dirpath: str = os.path.join(show_root, '10_texture', '04_enviro', 'library', 'map')
+    for dirpath in (publish_dirpath, shared_map_dirpath):
+        os.makedirs(dirpath, exist_ok=True)
+
+    shared_textures_paths: list = []
+    for index in range(shared_textures):
+        filepath: str = os.path.join(shared_map_dirpath, f'CDS_foliage{index:02d}_BaseColor.png')
+        write_file(filepath, tile_size)
+        write_file(f'{filepath}.tex', tile_size)
+        shared_textures_paths.append(filepath)
+
+    files_count: int = 2 * shared_textures
+    bytes_count: int = 2 * shared_textures * tile_size
+    for asset_index in range(assets):
+        asset: str = f'asset{asset_index:03d}'
+        map_dirpath: str = os.path.join(show_root, '10_texture', '04_enviro', asset, 'map')
+        rib_dirpath: str = os.path.join(show_root, '11_cache', 'rib', asset)
+        abc_dirpath: str = os.path.join(show_root, '11_cache', 'abc')
+        for dirpath in (map_dirpath, rib_dirpath, abc_dirpath):
+            os.makedirs(dirpath, exist_ok=True)
+
+        scene: FakeScene = FakeScene()
+        for texture_index in range(textures_per_asset):
+            texture_name: str = f'CDS_{asset}_part{texture_index:02d}_BaseColor'
+            for udim in range(1001, 1001 + udims):
+                write_file(os.path.join(map_dirpath, f'{texture_name}.{udim}.png'), tile_size)
+                write_file(os.path.join(map_dirpath, f'{texture_name}.{udim}.png.tex'), tile_size)
+            # a map sharing the tile set prefix, which the scene never uses
+            write_file(os.path.join(map_dirpath, f'{texture_name}_unused.1001.png'), tile_size)
+            files_count += 2 * udims + 1
+            bytes_count += (2 * udims + 1) * tile_size
+            scene.nodes[f'PxrTexture{texture_index}'] = {'type': 'PxrTexture', 'attributes': {'filename': os.path.join(map_dirpath, f'{texture_name}.<udim>.png')}}
+
+        for index, filepath in enumerate(shared_textures_paths):
+            scene.nodes[f'PxrTextureShared{index}'] = {'type': 'PxrTexture', 'attributes': {'filename': filepath}}
+
+        rib_name: str = f'CDS_{asset}Proxy'
+        for frame in range(1, rib_frames + 1):
+            write_file(os.path.join(rib_dirpath, f'{rib_name}.{frame:04d}.rib'), rib_size)
+        # a sequence sharing the rib name, which the scene never uses
+        write_file(os.path.join(rib_dirpath, f'{rib_name}LOD.0001.rib'), rib_size)
+        files_count += rib_frames + 1
+        bytes_count += (rib_frames + 1) * rib_size
+        scene.nodes[f'{rib_name}Shape'] = {'type': 'RenderManArchive', 'attributes': {'filename': os.path.join(rib_dirpath, f'{rib_name}.<f>.rib')}}
+
+        abc_filepath: str = os.path.join(abc_dirpath, f'CDS_{asset}.abc')
+        write_file(abc_filepath, alembic_size, sparse=True)
+        files_count += 1
+        bytes_count += alembic_size
+        scene.nodes[f'{asset}_AlembicNode'] = {'type': 'AlembicNode', 'attributes': {'abc_File': abc_filepath}}
+
+        scene.save(os.path.join(publish_dirpath, f'CDS_env_{asset}_ldv_P.ma'))
+
+    return {'source_path': publish_dirpath, 'files': files_count, 'bytes': bytes_count}
@@ -1,33 +1,51 @@
 import logging
+import math
 import os
 import shutil
+import tempfile
+import time
 from maya import cmds, mel
 from .logger import Logger
+from .archive_plan import ArchivePlan, AssetPlan, get_asset_name
+from .container import EXTENSIONS, ContainerReader, ContainerWriter
+from .copy_engine import CopyEngine
+from .dependency_plan import DependencyPlan
+from .token_pattern import TokenPattern, compile_token_pattern
+from .dedup_store import DedupStore
+from .directory_index import DirectoryIndex
+from .fast_copy import copy_file
+from .io_scheduler import IOScheduler
+from .job_control import ArchiveCancelled, JobControl
+from .manifest import Manifest, shard_path
+from .ma_scanner import MaScanner, SceneDependency, scan_maya_ascii
+from .scene_index import SceneResourceIndex
 
 
 class Archive:
 
 
-    def __init__(self, source_path: str = '', archive_path: str = ''):
+    def __init__(self, source_path: str = '', archive_path: str = '', max_copy_workers: int = 8, copy_retries: int = 3, use_dedup_store: bool = False, queue_logging: bool = True, frame_range: tuple = None, frame_handle: int = 1,
+                 output_mode: str = 'files', container_compression: str = 'gz', io_profiles: list = None, target_latency: float = 0.05,
+                 link_method: str = 'reflink', control: JobControl = None, interactive: bool = True, shard: str = None):
 
-        self.SOURCE_PATH: str = source_path.replace('/', '\\')
-        self.ARCHIVE_PATH: str = archive_path.replace('/', '\\')
+        self.SOURCE_PATH: str = source_path.replace('/', os.sep)
+        self.ARCHIVE_PATH: str = archive_path.replace('/', os.sep)
         self.Z_STRING: str = 'Z:'
         self.CDS_STRING: str = r'\\GANDALF\3d4_23_24\COUPDESOLEIL'
         self.CDS_STRING_SHORT: str = r'3d4_23_24\COUPDESOLEIL'
         self.TEXTURE_ROOT_DIRPATH: str = r'\\GANDALF\3d4_23_24\COUPDESOLEIL\10_texture'
         self.TEXTURE_ROOT_DIRNAME: str = '10_texture'
         self.CDS_NAME: str = 'COUPDESOLEIL'
-        self.UDIM_TOKEN: str = '<udim>'
-        self.UV_TOKEN: str = 'u<u>_v<v>'
         self.WORKSPACE_TOKEN: str = '<ws>'
         self.RIB_STRING: str = 'rib'
         self.MAYA_PROJECT_DIRPATH: str = r'\\GANDALF\3d4_23_24\COUPDESOLEIL\02_ressource\@DAVID\ARCHIVAGE\Archive\project_files\maya'
 
-        self.logger: Logger = Logger()
-        self.LOG_PATH: str = os.path.join(self.ARCHIVE_PATH, 'archive.log')
-        if not os.path.exists(self.LOG_PATH):
-            self.logger.write_to_file(path = self.LOG_PATH, level=logging.INFO)
+        # queue logging: formatting and writes to the share happen on a background thread, away from the copy loop
+        self.logger: Logger = Logger(queue_mode=queue_logging)
+        # a batch worker logs and records to its own shards, example : archive.worker0.log, merged by the scheduler
+        self.SHARD: str = shard
+        self.LOG_PATH: str = self.shard_path(os.path.join(self.ARCHIVE_PATH, 'archive.log'))
+        self.logger.write_to_file(path = self.LOG_PATH, level=logging.INFO)
 
         self.CACHE_DICT: dict = {
             'AlembicNode': 'abc_File',
@@ -35,6 +53,52 @@ class Archive:
             'gpuCache': 'cacheFileName',
             'xgmSplineCache': 'fileName'
         }
+        self.RENDERMAN_DICT: dict = {
+            'PxrTexture': 'filename',
+            'PxrPtexture': 'filename',
+            'PxrNormalMap': 'filename',
+            'RenderManArchive': 'filename'
+        }
+
+        # every path bearing node of the opened scene, read and rewritten in batches
+        self.scene_index: SceneResourceIndex = SceneResourceIndex(node_attributes={**self.RENDERMAN_DICT, **self.CACHE_DICT}, logger=self.logger)
+        self.dependency_plans: dict = {} # (kind, attribute value, frame range) -> DependencyPlan, for the whole session
+
+        # optional content addressed store: unique files are kept once under the archive root and hard linked into each asset
+        self.STORE_DIRPATH: str = os.path.join(self.ARCHIVE_PATH, '.store')
+        self.dedup_store: DedupStore = DedupStore(store_dirpath=self.STORE_DIRPATH, logger=self.logger) if use_dedup_store else None
+
+        # every copied file, rewritten attribute and finished asset, so that a re-run only does what is left
+        self.MANIFEST_PATH: str = os.path.join(self.ARCHIVE_PATH, 'archive_manifest.jsonl')
+        self.PLAN_PATH: str = os.path.join(self.ARCHIVE_PATH, 'archive_plan.json')
+        self.EVENTS_PATH: str = self.shard_path(os.path.join(self.ARCHIVE_PATH, 'archive_events.jsonl'))
+        self.logger.write_events_to_file(path=self.EVENTS_PATH)
+        self.manifest: Manifest = Manifest(manifest_path=self.MANIFEST_PATH, logger=self.logger, shard=shard)
+
+        # reads and writes both hit GANDALF: concurrency per share, bandwidth per host, by time of day and share latency
+        self.io_scheduler: IOScheduler = IOScheduler(logger=self.logger, profiles=io_profiles, target_latency=target_latency)
+        # pause / cancel between two files, progress of the assets, files and bytes of the plan
+        self.control: JobControl = control or JobControl()
+        self.INTERACTIVE: bool = interactive # False in a mayapy job, messages are only logged
+
+        # copy, reflink or hardlink: a source on the filesystem of the archive is cloned or linked instead of read and written, the manifest keeps the method of every file
+        self.LINK_METHOD: str = link_method
+        self.copy_engine: CopyEngine = CopyEngine(logger=self.logger, max_workers=max_copy_workers, retries=copy_retries, store=self.dedup_store, manifest=self.manifest, scheduler=self.io_scheduler,
+                                                  link_method=link_method, control=self.control)
+        self.directory_index: DirectoryIndex = DirectoryIndex() # source directories are listed once per session
+
+        # frame sequences (rib, alembic, xgen) are limited to the explicit range, or to the render range of shot publishes
+        self.FRAME_RANGE: tuple = tuple(frame_range) if frame_range else None # example : (101, 148)
+        self.FRAME_HANDLE: int = frame_handle
+        self.scene_frame_range: tuple = None # range of the opened scene, handle included, None for every frame
+        self.applied_plans: set = set() # plans applied to the current asset
+
+        # files: one file per dependency in the archive, container: one compressed tar and its index per publish
+        self.OUTPUT_MODE: str = output_mode
+        self.CONTAINER_COMPRESSION: str = container_compression # None, gz, xz or zst
+        self.STAGING_DIRPATH: str = tempfile.gettempdir() # local disk, where the maya project of a container is built
+        self.staging_root: str = None
+        self.extraction_root: str = None
 
 
     def load_plugins(self) -> None:
@@ -56,39 +120,6 @@ class Archive:
         return maya_path
 
 
-    def list_renderman_nodes(self) -> list:
-
-        nodes_to_return: list = []
-
-        pxr_texture_nodes = cmds.ls(type = 'PxrTexture') # filename
-        pxr_ptexture_nodes = cmds.ls(type = 'PxrPtexture') # filename
-        pxr_normalmap_nodes = cmds.ls(type = 'PxrNormalMap') # filename
-
-        nodes_to_return = pxr_texture_nodes + pxr_ptexture_nodes + pxr_normalmap_nodes
-
-        return nodes_to_return
-
-
-    def list_rib_nodes(self):
-        return cmds.ls(type = 'RenderManArchive') # filename
-
-
-    def list_gpu_cache_nodes(self) -> list:
-        return cmds.ls(type = 'gpuCache') # cacheGeomPath
-
-
-    def list_file_nodes(self) -> list:
-        return cmds.ls(type = 'file') # fileTextureName
-
-
-    def list_alembic_nodes(self) -> list:
-        return cmds.ls(type='AlembicNode') # abc_File
-
-
-    def list_xgen_cache(self) -> list:
-        return cmds.ls(type='xgmSplineCache') # fileName
-
-
     def list_files(self, dirpath: str) -> list:
 
         files = []
@@ -102,32 +133,98 @@ class Archive:
 
     def get_relative_path_until(self, filepath: str, stop_dir: str) -> str:
 
-        parts = filepath.replace('/', '\\').split(os.sep)
+        parts = filepath.replace('/', os.sep).split(os.sep)
         try:
             stop_index = parts.index(stop_dir)
         except ValueError:
             raise ValueError(f"'{stop_dir}' not found in the filepath")
         
         relative_parts = parts[stop_index + 2:-1]
-        relative_path = os.path.join(*relative_parts).replace('/', '\\')
+        relative_path = os.path.join(*relative_parts).replace('/', os.sep)
         return relative_path
 
 
-    def find_files_witch_match(self, parent_dirpath: str, match_string: str) -> list:
+    def find_token_files(self, parent_dirpath: str, filename: str, frame_range: tuple = None, frames_skipped: list = None) -> list:
 
-        files = []
-        for file in os.listdir(parent_dirpath):
-            if match_string in file:
-                files.append(os.path.join(parent_dirpath, file))
+        # exact members of the tile set or sequence: CDS_bat01_A_BaseColor.<udim>.png does not match CDS_bat01_A_BaseColor_old.1001.png
+        pattern: TokenPattern = compile_token_pattern(filename)
+        candidates: list = self.directory_index.find_files_starting_with(dirpath=parent_dirpath, prefix=pattern.prefix)
+        files: list = []
+        for filepath in candidates:
+            values: dict = pattern.match(os.path.basename(filepath))
+            if values is None:
+                continue
+            if frame_range and 'frame' in values and not frame_range[0] <= values['frame'] <= frame_range[1]:
+                if frames_skipped is not None:
+                    frames_skipped.append(filepath)
+                continue
+            files.append(filepath)
         return files
 
 
-    def archive_texture(self, texture_node: str, sourceimages_dirpath: str, current_project: str) -> None:
+    def get_frame_range(self) -> tuple:
 
-        texture_filepath_attribute: str = cmds.getAttr(f'{texture_node}.filename').replace('/', '\\') # example : \\GANDALF\3d4_23_24\COUPDESOLEIL\10_texture\04_enviro\bat02\map\CDS_glycinePlante_DiffuseColor_ACES - ACEScg.1001.png
-        if not texture_filepath_attribute or texture_filepath_attribute == '':
-            self.logger.error(f'{texture_node}.filename attribute is empty.')
+        # render range when the scene renders an animation, playback range otherwise
+        if cmds.getAttr('defaultRenderGlobals.animation'):
+            return (cmds.getAttr('defaultRenderGlobals.startFrame'), cmds.getAttr('defaultRenderGlobals.endFrame'))
+        return (cmds.playbackOptions(query=True, minTime=True), cmds.playbackOptions(query=True, maxTime=True))
+
+
+    def set_scene_frame_range(self, is_shot: bool, scene_range: tuple = None) -> tuple:
+
+        # asset publishes keep every frame of their proxies, their time range means nothing
+        frame_range: tuple = self.FRAME_RANGE
+        if frame_range is None and is_shot:
+            frame_range = scene_range or self.get_frame_range()
+        if frame_range is None:
+            self.scene_frame_range = None
+            self.logger.info('Frame Range: every frame')
+            return None
+        self.scene_frame_range = (int(math.floor(frame_range[0])) - self.FRAME_HANDLE, int(math.ceil(frame_range[1])) + self.FRAME_HANDLE)
+        self.logger.info(f'Frame Range: {self.scene_frame_range[0]} - {self.scene_frame_range[1]} (handle {self.FRAME_HANDLE})')
+        return self.scene_frame_range
+
+
+    def count_frames_skipped(self, plan: DependencyPlan) -> None:
+
+        if not plan.frames_skipped:
+            return
+        size: int = 0
+        for filepath in plan.frames_skipped:
+            stat: os.stat_result = self.directory_index.stat(filepath)
+            size += stat.st_size if stat else 0
+        self.logger.count('frames_skipped', len(plan.frames_skipped))
+        self.logger.count('bytes_frames_skipped', size)
+        self.logger.info(f'{plan.source_value}: {len(plan.frames_skipped)} frames out of range skipped.')
+
+
+    def queue_copy(self, source_filepath: str, destination_dirpath: str) -> None:
+
+        destination_filepath: str = os.path.join(destination_dirpath, os.path.basename(source_filepath))
+        stat: os.stat_result = self.directory_index.stat(source_filepath)
+        if self.OUTPUT_MODE == 'files' and not self.manifest.needs_copy(source_filepath=source_filepath, destination_filepath=destination_filepath, stat=stat):
+            self.logger.count('files_skipped')
+            self.logger.count('bytes_skipped', stat.st_size if stat else 0)
             return
+        self.copy_engine.queue(source_filepath=source_filepath, destination_dirpath=destination_dirpath)
+
+
+    def set_path_attribute(self, resource: SceneDependency, value: str) -> None:
+
+        # applied with every other rewrite of the scene by SceneResourceIndex.apply_rewrites
+        self.scene_index.set_path(resource=resource, value=value)
+        self.logger.debug('setAttr %s.%s %s', resource.node, resource.attribute, value)
+        self.manifest.record_attribute(scene_filepath=self.scene_index.scene_path, node=resource.node, attribute=resource.attribute, value=value)
+
+
+    def resolve_texture(self, value: str) -> DependencyPlan:
+
+        plan: DependencyPlan = DependencyPlan(kind='texture', source_value=value, style='workspace_posix')
+        texture_filepath_attribute: str = value.replace('/', os.sep) # example : \\GANDALF\3d4_23_24\COUPDESOLEIL\10_texture\04_enviro\bat02\map\CDS_glycinePlante_DiffuseColor_ACES - ACEScg.1001.png
+        if not texture_filepath_attribute or texture_filepath_attribute == '':
+            self.logger.error('Texture filename attribute is empty.')
+            plan.valid = False
+            return plan
         if self.TEXTURE_ROOT_DIRNAME not in texture_filepath_attribute:
             self.logger.warning(f'Texture file {texture_filepath_attribute} not in texture folder.')
         if self.Z_STRING in texture_filepath_attribute:
@@ -145,86 +242,81 @@ class Archive:
         # recreate the texture tree in the archive maya project
         intermediate_dirs = self.get_relative_path_until(filepath=texture_filepath, stop_dir=self.CDS_NAME)
         self.logger.info(f'Intermediate Dirs: {intermediate_dirs}')
-        texture_archive_parent_dirpath: str = os.path.join(sourceimages_dirpath, *intermediate_dirs.split('\\'))
-        if not os.path.exists(texture_archive_parent_dirpath):
-            os.makedirs(texture_archive_parent_dirpath)
-        self.logger.info(f'Texture Archive Parent Dirpath: {texture_archive_parent_dirpath}')
+        texture_archive_relative_dirpath: str = os.path.join(*intermediate_dirs.split(os.sep))
+        plan.directories.append(texture_archive_relative_dirpath)
 
         # set texture in filename attribute
-        texture_filepath_attribute_archive: str = os.path.join(texture_archive_parent_dirpath, texture_filename_attribute).replace(current_project, self.WORKSPACE_TOKEN).replace('\\', '/')
-        cmds.setAttr(f'{texture_node}.filename', texture_filepath_attribute_archive, type='string')
-        self.logger.info(f'setAttr {texture_node}.filename {texture_filepath_attribute_archive}')
+        plan.value_relative_path = os.path.join(texture_archive_relative_dirpath, texture_filename_attribute)
 
-        if not self.UDIM_TOKEN in texture_filepath_attribute and not self.UV_TOKEN in texture_filepath_attribute:
-            if not os.path.exists(texture_filepath):
+        if not compile_token_pattern(texture_filename_attribute).tokens:
+            if not self.directory_index.exists(texture_filepath):
                 self.logger.error(f'{texture_filepath} texture file does not exists.')
-                return
+                plan.missing.append(texture_filepath)
+                return plan
             # copy texture file
-            texture_filepath_archive: str = os.path.join(texture_archive_parent_dirpath, texture_filename)
-            if not os.path.exists(texture_filepath_archive):
-                shutil.copy(texture_filepath, texture_archive_parent_dirpath)
-                self.logger.info(f'Copy : {texture_filepath} -> {texture_archive_parent_dirpath}')
-            self.logger.info(f'Texture Filepath Archive: {texture_filepath_archive}')
+            plan.add_copy(source_filepath=texture_filepath, relative_dirpath=texture_archive_relative_dirpath)
 
             # copy .tex file
             tex_file: str = f'{texture_filepath}.tex'
-            if os.path.exists(tex_file):
-                if not os.path.exists(os.path.join(texture_archive_parent_dirpath, tex_file)):
-                    shutil.copy(tex_file, texture_archive_parent_dirpath)
-                    self.logger.info(f'Copy: {tex_file} -> {texture_archive_parent_dirpath}')
-            return
+            if self.directory_index.exists(tex_file):
+                plan.add_copy(source_filepath=tex_file, relative_dirpath=texture_archive_relative_dirpath)
+            return plan
         
-        if self.UDIM_TOKEN in texture_filepath_attribute:
-            match_string = texture_filename_attribute.split(self.UDIM_TOKEN)[0]
-            for texture_filepath_udim in self.find_files_witch_match(parent_dirpath=texture_parent_directory, match_string=match_string):
-                if not os.path.exists(texture_filepath_udim):
-                    self.logger.error(f'{texture_filepath_udim} texture file does not exists.')
-                    continue
-                texture_filename_udim: str = os.path.basename(texture_filepath_udim)
-                if not os.path.exists(os.path.join(texture_archive_parent_dirpath, texture_filename_udim)):
-                    shutil.copy(texture_filepath_udim, texture_archive_parent_dirpath)
-                    self.logger.info(f'Copy: {texture_filepath_udim} -> {texture_archive_parent_dirpath}')
-            return
+        # <udim>, u<u>_v<v> and frame tokens: every tile or frame with its .tex
+        for texture_filepath_token in self.find_token_files(parent_dirpath=texture_parent_directory, filename=texture_filename_attribute):
+            plan.add_copy(source_filepath=texture_filepath_token, relative_dirpath=texture_archive_relative_dirpath)
+        return plan
 
-        if self.UV_TOKEN in texture_filepath_attribute:
-            match_string = texture_filename_attribute.split(self.UV_TOKEN)[0]
-            for texture_filepath_udim in self.find_files_witch_match(parent_dirpath=texture_parent_directory, match_string=match_string):
-                if not os.path.exists(texture_filepath_udim):
-                    self.logger.error(f'{texture_filepath_udim} texture file does not exists.')
-                    continue
-                texture_filename_udim: str = os.path.basename(texture_filepath_udim)
-                if not os.path.exists(os.path.join(texture_archive_parent_dirpath, texture_filename_udim)):
-                    shutil.copy(texture_filepath_udim, texture_archive_parent_dirpath)
-                    self.logger.info(f'Copy: {texture_filepath_udim} -> {texture_archive_parent_dirpath}')
-            return
-
-
-    def archive_cache(self, cache_node: str, cache_dirpath: str) -> None:
 
-        cache_attribute: str = self.CACHE_DICT.get(cmds.nodeType(cache_node))
+    def resolve_cache(self, value: str) -> DependencyPlan:
 
-        cache_filepath_attribute: str = cmds.getAttr(f'{cache_node}.{cache_attribute}')
+        plan: DependencyPlan = DependencyPlan(kind='cache', source_value=value, style='absolute')
+        cache_filepath_attribute: str = value
+        if 'frame' in compile_token_pattern(os.path.basename(cache_filepath_attribute)).tokens:
+            return self.resolve_cache_sequence(plan=plan)
         if not os.path.exists(cache_filepath_attribute):
             self.logger.error(f'{cache_filepath_attribute} cache file does not exists.')
-            return
+            plan.missing.append(cache_filepath_attribute)
+            plan.valid = False
+            return plan
         
         if self.Z_STRING in cache_filepath_attribute:
             self.logger.warning(f'{cache_filepath_attribute} is set on Z: network drive.')
             cache_filepath_attribute = cache_filepath_attribute.replace(self.Z_STRING, self.CDS_STRING)
 
         cache_filename: str = os.path.basename(cache_filepath_attribute)
-        cache_filepath_archive: str = os.path.join(cache_dirpath, cache_filename)
-        if not os.path.exists(cache_filepath_archive):
-            shutil.copy(cache_filepath_attribute, cache_dirpath)
-            self.logger.info(f'Copy: {cache_filepath_attribute} -> {cache_dirpath}')
-        
-        cmds.setAttr(f'{cache_node}.{cache_attribute}', cache_filepath_archive, type='string')
-        self.logger.info(f'setAttr {cache_node}.{cache_attribute} {cache_filepath_archive}')
+        plan.value_relative_path = cache_filename
+        plan.add_copy(source_filepath=cache_filepath_attribute, relative_dirpath='')
+        return plan
+
+
+    def resolve_cache_sequence(self, plan: DependencyPlan) -> DependencyPlan:
 
+        # alembic or xgen cache written one file per frame, example : CDS_herbe.<f>.abc
+        cache_filepath_attribute: str = plan.source_value
+        if self.Z_STRING in cache_filepath_attribute:
+            self.logger.warning(f'{cache_filepath_attribute} is set on Z: network drive.')
+            cache_filepath_attribute = cache_filepath_attribute.replace(self.Z_STRING, self.CDS_STRING)
+
+        cache_filename: str = os.path.basename(cache_filepath_attribute)
+        cache_filepaths: list = self.find_token_files(parent_dirpath=os.path.dirname(cache_filepath_attribute), filename=cache_filename,
+                                                      frame_range=self.scene_frame_range, frames_skipped=plan.frames_skipped)
+        if not cache_filepaths:
+            self.logger.error(f'{cache_filepath_attribute} cache sequence does not exists.')
+            plan.missing.append(cache_filepath_attribute)
+            plan.valid = False
+            return plan
+
+        plan.value_relative_path = cache_filename
+        for cache_filepath in cache_filepaths:
+            plan.add_copy(source_filepath=cache_filepath, relative_dirpath='')
+        return plan
 
-    def archive_rib(self, rib_node: str, cache_dirpath: str, current_project: str):
 
-        rib_filepath_attribute: str = cmds.getAttr(f'{rib_node}.filename')
+    def resolve_rib(self, value: str) -> DependencyPlan:
+
+        plan: DependencyPlan = DependencyPlan(kind='rib', source_value=value, style='workspace')
+        rib_filepath_attribute: str = value
         if self.Z_STRING in rib_filepath_attribute:
             self.logger.warning(f'{rib_filepath_attribute} is set on Z: network drive.')
             rib_filepath_attribute = rib_filepath_attribute.replace(self.Z_STRING, self.CDS_STRING)
@@ -233,41 +325,242 @@ class Archive:
         rib_filename_attribute: str = os.path.basename(rib_filepath_attribute) # example: CDS_buissonLavandeA.<f>.rib
         rib_name: str = rib_filename_attribute.split('.')[0] # example: CDS_buissonLavandeA
 
-        rib_archive_dirpath: str = os.path.join(cache_dirpath, self.RIB_STRING, rib_name)
-        if not os.path.exists(rib_archive_dirpath):
-            os.makedirs(rib_archive_dirpath)
-            self.logger.info(f'Create rib directory: {rib_archive_dirpath}')
-        
-        for rib_filename in os.listdir(rib_files_parent_dirpath):
-            if not rib_filename.endswith('.rib'):
-                continue
-            if not rib_filename.startswith(rib_name):
-                continue
-            rib_filepath: str = os.path.join(rib_files_parent_dirpath, rib_filename)
-            rib_file_path_archive: str = os.path.join(rib_archive_dirpath, rib_filename)
-            if not os.path.exists(rib_file_path_archive):
-                shutil.copy(rib_filepath, rib_archive_dirpath)
-                self.logger.info(f'Copy: {rib_filepath} -> {rib_archive_dirpath}')
-
-        rib_filepath_attribute_archive: str = os.path.join(rib_archive_dirpath, rib_filename_attribute).replace(current_project, self.WORKSPACE_TOKEN)
-        cmds.setAttr(f'{rib_node}.filename', rib_filepath_attribute_archive, type='string')
-        self.logger.info(f'setAttr {rib_node}.filename {rib_filepath_attribute_archive}')
+        rib_archive_relative_dirpath: str = os.path.join(self.RIB_STRING, rib_name)
+        plan.directories.append(rib_archive_relative_dirpath)
         
+        for rib_filepath in self.find_token_files(parent_dirpath=rib_files_parent_dirpath, filename=rib_filename_attribute,
+                                                  frame_range=self.scene_frame_range, frames_skipped=plan.frames_skipped):
+            plan.add_copy(source_filepath=rib_filepath, relative_dirpath=rib_archive_relative_dirpath)
 
-    def import_all_references(self):
-        references = cmds.file(query=True, reference=True)
-        
-        if not references:
+        plan.value_relative_path = os.path.join(rib_archive_relative_dirpath, rib_filename_attribute)
+        return plan
+
+
+    def resolve(self, resource: SceneDependency) -> DependencyPlan:
+
+        # a value shared by several nodes, references or publishes of the batch is resolved once
+        if resource.node_type in self.RENDERMAN_DICT:
+            kind: str = 'rib' if resource.node_type == 'RenderManArchive' else 'texture'
+        else:
+            kind: str = 'cache'
+        # sequences depend on the frame range of the scene, textures do not
+        key: tuple = (kind, resource.value, None if kind == 'texture' else self.scene_frame_range)
+        plan: DependencyPlan = self.dependency_plans.get(key)
+        if plan is not None:
+            self.logger.count('plans_reused')
+            return plan
+
+        try:
+            if kind == 'texture':
+                plan = self.resolve_texture(value=resource.value)
+            elif kind == 'rib':
+                plan = self.resolve_rib(value=resource.value)
+            else:
+                plan = self.resolve_cache(value=resource.value)
+        except ValueError as error:
+            # example : a texture outside the COUPDESOLEIL tree, the attribute is left untouched and reported, the batch goes on
+            self.logger.error(f'{resource.node}.{resource.attribute} cannot be archived: {resource.value} ({error})')
+            plan = DependencyPlan(kind=kind, source_value=resource.value)
+            plan.valid = False
+            plan.missing.append(resource.value)
+        self.dependency_plans[key] = plan
+        return plan
+
+
+    def apply_plan(self, resource: SceneDependency, plan: DependencyPlan, root_dirpath: str, current_project: str) -> None:
+
+        if not plan.valid:
             return
-        for ref in references:
-            try:
-                cmds.file(ref, importReference=True)
-                self.logger.info(f'{ref} Reference Imported.')
-            except:
-                self.logger.error(f'Fail Import: {ref}')
-
-            cmds.file(rename=cmds.file(query=True, sceneName=True))
-            cmds.file(save=True, force=True)
+        # frames left out are counted once per asset, even when several nodes share the sequence
+        if id(plan) not in self.applied_plans:
+            self.applied_plans.add(id(plan))
+            self.count_frames_skipped(plan=plan)
+        for relative_dirpath in plan.directories:
+            dirpath: str = os.path.join(root_dirpath, relative_dirpath)
+            if not os.path.exists(dirpath):
+                os.makedirs(dirpath)
+                self.logger.info(f'Create directory: {dirpath}')
+        for source_filepath, relative_dirpath in plan.copies:
+            self.queue_copy(source_filepath=source_filepath, destination_dirpath=os.path.join(root_dirpath, relative_dirpath))
+        value: str = plan.value_for(root_dirpath=self.extracted_path(root_dirpath), current_project=self.extracted_path(current_project), workspace_token=self.WORKSPACE_TOKEN)
+        self.set_path_attribute(resource=resource, value=value)
+
+
+    def extracted_path(self, path: str) -> str:
+
+        # container mode: the scene points where the container is extracted, not at the staging directory
+        if self.staging_root is None or not path.startswith(self.staging_root):
+            return path
+        return f'{self.extraction_root}{path[len(self.staging_root):]}'
+
+
+    def archive_texture(self, resource: SceneDependency, sourceimages_dirpath: str, current_project: str) -> None:
+        self.apply_plan(resource=resource, plan=self.resolve(resource), root_dirpath=sourceimages_dirpath, current_project=current_project)
+
+
+    def archive_cache(self, resource: SceneDependency, cache_dirpath: str) -> None:
+        self.apply_plan(resource=resource, plan=self.resolve(resource), root_dirpath=cache_dirpath, current_project=cache_dirpath)
+
+
+    def archive_rib(self, resource: SceneDependency, cache_dirpath: str, current_project: str):
+        self.apply_plan(resource=resource, plan=self.resolve(resource), root_dirpath=cache_dirpath, current_project=current_project)
+        
+
+    def import_all_references(self) -> int:
+
+        # imports the whole reference tree: the references of an imported file become top level references
+        imported: int = 0
+        failed: set = set()
+        while True:
+            references: list = [ref for ref in cmds.file(query=True, reference=True) or [] if ref not in failed]
+            if not references:
+                break
+            for ref in references:
+                try:
+                    cmds.file(ref, importReference=True)
+                    imported += 1
+                    self.logger.info(f'{ref} Reference Imported.')
+                except RuntimeError:
+                    failed.add(ref)
+                    self.logger.error(f'Fail Import: {ref}')
+        return imported
+
+
+    def shard_path(self, path: str) -> str:
+        return shard_path(path, self.SHARD) if self.SHARD else path
+
+
+    def get_asset_name(self, publish_filename: str) -> str:
+        return get_asset_name(publish_filename)
+
+
+    def get_source_root(self, filepath: str) -> str:
+
+        # example : \\GANDALF\3d4_23_24\COUPDESOLEIL\10_texture
+        parts: list = filepath.replace('/', os.sep).split(os.sep)
+        if self.CDS_NAME in parts[:-1]:
+            return os.sep.join(parts[:parts.index(self.CDS_NAME) + 2])
+        return os.path.dirname(filepath)
+
+
+    def plan_file(self, source_path: str, archiving_dirpath: str) -> AssetPlan:
+
+        publish_filename: str = os.path.basename(source_path)
+        asset_name: str = self.get_asset_name(publish_filename=publish_filename)
+        archived_asset_maya_dirpath: str = os.path.join(archiving_dirpath, asset_name, 'maya')
+        archived_asset_sourceimages_dirpath: str = os.path.join(archived_asset_maya_dirpath, 'sourceimages')
+        archived_asset_cache_dirpath: str = os.path.join(archived_asset_maya_dirpath, 'cache')
+
+        try:
+            scanner: MaScanner = scan_maya_ascii(filepath=source_path)
+        except ValueError:
+            self.logger.warning(f'{source_path} is not a Maya ASCII file, its dependencies are resolved when it is archived.')
+            asset: AssetPlan = AssetPlan(source_filepath=source_path, asset_name=asset_name, archived_asset_maya_dirpath=archived_asset_maya_dirpath)
+            asset.scanned = False
+            return asset
+
+        frame_range: tuple = self.set_scene_frame_range(is_shot='seq' in publish_filename, scene_range=scanner.frame_range())
+        asset: AssetPlan = AssetPlan(source_filepath=source_path, asset_name=asset_name, archived_asset_maya_dirpath=archived_asset_maya_dirpath, frame_range=frame_range)
+        for resource in scanner.ordered_dependencies():
+            # same archive roots as the node loops of archive_file
+            if resource.node_type in ('AlembicNode', 'gpuCache', 'xgmSplineCache', 'RenderManArchive'):
+                root_dirpath: str = archived_asset_cache_dirpath
+            else:
+                root_dirpath: str = archived_asset_sourceimages_dirpath
+            asset.add(resource=resource, plan=self.resolve(resource), root_dirpath=root_dirpath)
+        return asset
+
+
+    def notify(self, message: str, icon: str = 'information') -> None:
+
+        getattr(self.logger, 'info' if icon == 'information' else 'error')(message)
+        if self.INTERACTIVE:
+            cmds.confirmDialog(message=message, messageAlign='left', icon=icon, button='OK')
+
+
+    def plan_files(self, iteration = None, start = None, publish_files: list = None) -> ArchivePlan:
+
+        # resolves every dependency of every publish without opening Maya scenes or copying anything
+        plan: ArchivePlan = ArchivePlan(source_path=self.SOURCE_PATH, archive_path=self.ARCHIVE_PATH, logger=self.logger, stat=self.directory_index.stat,
+                                        needs_copy=self.manifest.needs_copy if self.OUTPUT_MODE == 'files' else None, source_root=self.get_source_root)
+        plan.dependency_plans = self.dependency_plans
+        # the publish tree is listed again, files published since the last plan of this session are seen
+        self.directory_index.invalidate()
+
+        if publish_files is None:
+            publish_files = self.list_files(dirpath=self.SOURCE_PATH)
+        if iteration:
+            publish_files = publish_files[start:iteration]
+
+        with self.logger.span('phase', 'plan'):
+            for publish_file in publish_files:
+                if self.manifest.asset_done(publish_file):
+                    self.logger.info(f'Already archived: {publish_file}')
+                    continue
+                plan.add_asset(self.plan_file(source_path=publish_file, archiving_dirpath=self.ARCHIVE_PATH))
+
+        plan.log_report()
+        plan.write_report(path=self.PLAN_PATH)
+        return plan
+
+
+    def execute_plan(self, plan: ArchivePlan) -> bool:
+
+        if not plan.check_capacity():
+            self.notify(message=f'Not enough space on {plan.archive_path}, see {self.LOG_PATH}.', icon='critical')
+            return False
+
+        # the plans resolved while planning are used as is, nothing is scanned twice
+        self.dependency_plans.update(plan.dependency_plans)
+        totals: dict = plan.totals()
+        self.control.set_totals(assets=len(plan.assets), files=totals['files_to_copy'], size=totals['bytes_to_copy'])
+        self.load_plugins()
+        for asset in plan.assets:
+            self.control.checkpoint()
+            self.control.start_asset(asset.asset_name)
+            self.archive_file(source_path=asset.source_filepath, archiving_dirpath=self.ARCHIVE_PATH)
+            self.control.finish_asset()
+        return True
+
+
+    def write_container(self, asset_name: str, archived_asset_dirpath: str, publish_filename: str) -> str:
+
+        # one container per publish: the ldv and mod publishes of an asset both extract into the asset directory, neither replaces the other
+        # example : CDS_env_eglise_ldv_P.tar.gz
+        container_path: str = os.path.join(self.extraction_root, f'{os.path.splitext(publish_filename)[0]}{EXTENSIONS[self.CONTAINER_COMPRESSION]}')
+        jobs: list = self.copy_engine.take_jobs()
+        failed_jobs: list = []
+        # a cancelled container is removed with its staging directory, the asset is archived again on the next run
+        try:
+            with ContainerWriter(container_path=container_path, logger=self.logger, compression=self.CONTAINER_COMPRESSION, threads=self.copy_engine.MAX_WORKERS, asset_name=asset_name) as container:
+                for job in jobs:
+                    self.control.checkpoint()
+                    start: float = time.perf_counter()
+                    try:
+                        with self.io_scheduler.transfer(source_filepath=job.source_filepath, destination_filepath=container_path) as transfer:
+                            container.add_file(source_filepath=job.source_filepath, arcname=os.path.relpath(job.destination_filepath, self.staging_root), throttle=transfer.throttle)
+                    except (FileNotFoundError, PermissionError) as error:
+                        job.error = error
+                        failed_jobs.append(job)
+                        self.control.file_failed()
+                        continue
+                    size: int = container.members[os.path.relpath(job.destination_filepath, self.staging_root).replace(os.sep, '/')]['size']
+                    self.logger.metrics.record_span(kind='copy', name=os.path.basename(job.source_filepath), directory=os.path.dirname(job.source_filepath), duration=time.perf_counter() - start, size=size)
+                    self.logger.count('files_copied')
+                    self.logger.count('bytes_copied', size)
+                    self.logger.info('Container: %s -> %s', job.source_filepath, container_path)
+                    self.control.file_done(size)
+                # the maya project with the saved scene, so that <ws> paths resolve once extracted in the archive directory
+                container.add_tree(dirpath=archived_asset_dirpath, arcname=asset_name)
+        finally:
+            shutil.rmtree(self.staging_root, ignore_errors=True)
+        self.copy_engine.report(jobs=jobs, failed_jobs=failed_jobs)
+
+        # the publish is only recorded as archived once its scene is in the index of the final container
+        scene_name: str = f'{asset_name}/maya/scenes/{publish_filename}'
+        if scene_name not in ContainerReader(container_path=container_path).members:
+            raise OSError(f'{scene_name} is missing from {container_path}.')
+        return container_path
 
 
     def archive_file(self, source_path: str, archiving_dirpath: str) -> None:
@@ -278,11 +571,17 @@ class Archive:
         self.logger.info(f'Publish Filepath: {source_path}')
 
         publish_filename: str = os.path.basename(source_path) # example: CDS_env_eglise_ldv_P.ma
-        if 'seq' in publish_filename:
-            asset_name: str = publish_filename.split('.')[0] # example: CDS_seq030_sh080_render_P
-        else:
-            asset_name: str = publish_filename.split('_')[2] # example: eglise
+        asset_name: str = self.get_asset_name(publish_filename=publish_filename)
         self.logger.info(f'Asset Name: {asset_name}')
+        self.logger.metrics.set_asset(asset_name)
+        self.applied_plans = set()
+
+        # container mode: the maya project is built on local disk, then streamed into one container on the archive share
+        self.staging_root = None
+        if self.OUTPUT_MODE == 'container':
+            self.staging_root = tempfile.mkdtemp(prefix='archive_', dir=self.STAGING_DIRPATH)
+            self.extraction_root = archiving_dirpath
+            archiving_dirpath = self.staging_root
 
         archived_asset_dirpath: str = os.path.join(archiving_dirpath, asset_name)
         if not os.path.exists(archived_asset_dirpath):
@@ -296,51 +595,101 @@ class Archive:
         archived_asset_sourceimages_dirpath: str = os.path.join(archived_asset_maya_dirpath, 'sourceimages')
         archived_asset_cache_dirpath: str = os.path.join(archived_asset_maya_dirpath, 'cache')
         self.logger.info(f'Archived Asset Sourceimages Dirpath: {archived_asset_sourceimages_dirpath}')
+        # empty directories of the project template are not always kept
+        for dirname in ('scenes', 'sourceimages', 'cache'):
+            os.makedirs(os.path.join(archived_asset_maya_dirpath, dirname), exist_ok=True)
 
         archived_asset_filepath: str = os.path.join(archived_asset_maya_dirpath, 'scenes', publish_filename)
-        if not os.path.exists(archived_asset_filepath):
-            shutil.copy(source_path, archived_asset_filepath)
+        # an asset that did not finish is archived again from a fresh copy of its publish
+        if not os.path.exists(archived_asset_filepath) or not self.manifest.asset_done(source_path):
+            with self.io_scheduler.transfer(source_filepath=source_path, destination_filepath=archived_asset_filepath) as transfer:
+                copy_file(source_filepath=source_path, destination_filepath=archived_asset_filepath, hash_name=None, throttle=transfer.throttle)
         self.logger.info(f'Archived Asset Filepath: {archived_asset_filepath}')
 
-        cmds.file(archived_asset_filepath, open=True, force=True)
-        current_project = self.set_project().replace('/', '\\')
-
-        for texture_node in self.list_renderman_nodes():
-            self.logger.info(f'Texture Node: {texture_node} ------------------------------------------------------')
-            self.archive_texture(texture_node=texture_node, sourceimages_dirpath=archived_asset_sourceimages_dirpath, current_project=current_project)
-
-        for rib_node in self.list_rib_nodes():
-            self.logger.info(f'Rib Node: {rib_node} ------------------------------------------------------')
-            self.archive_rib(rib_node=rib_node, cache_dirpath=archived_asset_cache_dirpath, current_project=current_project)
-
-        for cache_node in self.list_alembic_nodes() + self.list_gpu_cache_nodes() + self.list_xgen_cache():
-            self.logger.info(f'Cache Node: {cache_node} ------------------------------------------------------')
-            self.archive_cache(cache_node=cache_node, cache_dirpath=archived_asset_cache_dirpath)
-
-        for file_node in self.list_file_nodes():
-            self.logger.info(f'File Node: {file_node} ------------------------------------------------------')
-            self.archive_cache(cache_node=file_node, cache_dirpath=archived_asset_sourceimages_dirpath)
-
-        self.import_all_references()
-
-        cmds.file(save=True, force=True)
-
+        with self.logger.span('phase', 'open_scene'):
+            cmds.file(archived_asset_filepath, open=True, force=True)
+            current_project = self.set_project().replace('/', os.sep)
+            self.set_scene_frame_range(is_shot='seq' in publish_filename)
+
+        # references are flattened first, so that their nodes are rewritten in place and the scene saved once
+        with self.logger.span('phase', 'import_references'):
+            self.import_all_references()
+
+        with self.logger.span('phase', 'scene_index'):
+            self.scene_index.collect()
+
+        with self.logger.span('phase', 'texture_nodes'):
+            for resource in self.scene_index.of_type('PxrTexture', 'PxrPtexture', 'PxrNormalMap'):
+                self.logger.info(f'Texture Node: {resource.node} ------------------------------------------------------')
+                with self.logger.span('node', resource.node):
+                    self.archive_texture(resource=resource, sourceimages_dirpath=archived_asset_sourceimages_dirpath, current_project=current_project)
+
+        with self.logger.span('phase', 'rib_nodes'):
+            for resource in self.scene_index.of_type('RenderManArchive'):
+                self.logger.info(f'Rib Node: {resource.node} ------------------------------------------------------')
+                with self.logger.span('node', resource.node):
+                    self.archive_rib(resource=resource, cache_dirpath=archived_asset_cache_dirpath, current_project=current_project)
+
+        with self.logger.span('phase', 'cache_nodes'):
+            for resource in self.scene_index.of_type('AlembicNode', 'gpuCache', 'xgmSplineCache'):
+                self.logger.info(f'Cache Node: {resource.node} ------------------------------------------------------')
+                with self.logger.span('node', resource.node):
+                    self.archive_cache(resource=resource, cache_dirpath=archived_asset_cache_dirpath)
+
+        with self.logger.span('phase', 'file_nodes'):
+            for resource in self.scene_index.of_type('file'):
+                self.logger.info(f'File Node: {resource.node} ------------------------------------------------------')
+                with self.logger.span('node', resource.node):
+                    self.archive_cache(resource=resource, cache_dirpath=archived_asset_sourceimages_dirpath)
+
+        with self.logger.span('phase', 'rewrite_attributes'):
+            self.scene_index.apply_rewrites()
+
+        # copy every queued texture, cache and rib file of the asset
+        if self.OUTPUT_MODE == 'files':
+            with self.logger.span('phase', 'copy_files'):
+                self.copy_engine.run()
+                if self.dedup_store is not None:
+                    self.dedup_store.save_index()
+                    self.dedup_store.report()
+
+        with self.logger.span('phase', 'save_scene'):
+            cmds.file(save=True, force=True)
 
-    def archive_files(self, iteration = None, start = None) -> None:
+        if self.OUTPUT_MODE == 'container':
+            with self.logger.span('phase', 'container'):
+                self.write_container(asset_name=asset_name, archived_asset_dirpath=archived_asset_dirpath, publish_filename=publish_filename)
+        self.manifest.record_asset(source_filepath=source_path)
+        self.logger.log_summary(title=f'Summary {asset_name}', asset=asset_name)
+        self.logger.flush()
 
-        self.load_plugins()
 
-        publish_files: list = self.list_files(dirpath=self.SOURCE_PATH)
+    def archive_files(self, iteration = None, start = None, publish_files: list = None) -> str:
 
-        if iteration:
-            publish_files = publish_files[start:iteration]
-
-        for publish_file in publish_files:
-            self.archive_file(source_path=publish_file, archiving_dirpath=self.ARCHIVE_PATH)
+        # missing files and a full archive share are known before the first copy
+        plan: ArchivePlan = self.plan_files(iteration=iteration, start=start, publish_files=publish_files)
+        try:
+            executed: bool = self.execute_plan(plan=plan)
+        except ArchiveCancelled:
+            # stopped between two files: copied files are in the manifest, the unfinished asset is archived again on the next run
+            self.logger.warning(f'Archiving cancelled after {self.control.assets_done}/{self.control.assets_total} assets.')
+            executed = None
+        if executed is False:
+            self.manifest.close()
+            self.logger.close()
+            self.control.finish('refused')
+            return self.control.state
 
         cmds.file(new=True, force=True)
+        self.manifest.close()
         self.logger.info('End Archiving Files. -----------------------------------------------------------------------')
-        cmds.confirmDialog(message='Archiving done.', messageAlign='left', icon='information', button='OK')
+        self.logger.log_summary(title='Summary Archiving Files')
+        for line in self.io_scheduler.report():
+            self.logger.info(line)
+        self.logger.close()
+        self.control.finish('done' if executed else 'cancelled')
+        self.notify(message='Archiving done.' if executed else 'Archiving cancelled, archive again to resume.')
+        return self.control.state
 
 
 if __name__ == '__main__':
@@ -0,0 +1,233 @@
+import argparse
+import collections
+import json
+import os
+import subprocess
+import sys
+import threading
+import traceback
+from .batch_scheduler import MAYAPY_PATH
+from .fast_copy import temporary_path
+from .io_scheduler import IOProfile
+from .job_control import JobControl, format_progress
+from .logger import Logger
+
+
+PROGRESS_PREFIX: str = '@@ARCHIVE_PROGRESS@@ '
+PROGRESS_INTERVAL: float = 1.0
+COMMANDS: tuple = ('pause', 'resume', 'cancel')
+FINAL_STATES: tuple = ('done', 'cancelled', 'refused', 'failed')
+
+
+class ArchiveJob:
+
+
+    def __init__(self, source_path: str, archive_path: str, publish_files: list = None, options: dict = None, mayapy: str = MAYAPY_PATH,
+                 command: list = None, on_progress=None, on_finished=None, logger: Logger = None):
+
+        self.SOURCE_PATH: str = source_path
+        self.ARCHIVE_PATH: str = archive_path
+        self.PUBLISH_FILES: list = publish_files # None for every publish of SOURCE_PATH, example : [r'\\GANDALF\...\CDS_env_eglise_ldv_P.ma']
+        self.options: dict = dict(options or {}) # Archive keyword arguments, example : {'frame_range': (101, 148), 'io_profiles': [IOProfile(...)]}
+        self.JOB_PATH: str = os.path.join(archive_path, 'archive_job.json')
+        self.COMMAND: list = command or [mayapy, '-m', 'logic.archive_job', 'run', self.JOB_PATH]
+        self.CWD: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        # called from the reader thread: a Maya UI hands them over to the main thread with maya.utils.executeDeferred
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.logger: Logger = logger or Logger(logger_name='ArchiveJob')
+
+        self.process: subprocess.Popen = None
+        self.output: collections.deque = collections.deque(maxlen=50) # last lines of the job, the full log is archive.log
+        self.last_progress: dict = {'state': 'pending', 'error': '', 'asset': '', 'assets_done': 0, 'assets_total': 0, 'files_done': 0, 'files_failed': 0,
+                                    'files_total': 0, 'bytes_done': 0, 'bytes_total': 0, 'elapsed': 0.0, 'throughput': 0.0, 'eta': None}
+        self._lock: threading.Lock = threading.Lock()
+        self._finished: threading.Event = threading.Event()
+        self._reader: threading.Thread = None
+
+
+    def write_job(self) -> None:
+
+        options: dict = dict(self.options)
+        if options.get('io_profiles') is not None:
+            options['io_profiles'] = [vars(profile) for profile in options['io_profiles']]
+        job: dict = {'source_path': self.SOURCE_PATH, 'archive_path': self.ARCHIVE_PATH, 'publish_files': self.PUBLISH_FILES, 'options': options}
+        os.makedirs(self.ARCHIVE_PATH, exist_ok=True)
+        temp_path: str = temporary_path(self.JOB_PATH)
+        with open(temp_path, 'w', encoding='utf-8') as job_file:
+            json.dump(job, job_file, indent=1)
+        os.replace(temp_path, self.JOB_PATH)
+
+
+    def start(self) -> None:
+
+        if self.process is not None:
+            raise RuntimeError(f'Archive job {self.JOB_PATH} already started.')
+        self.write_job()
+        self.process = subprocess.Popen(self.COMMAND, cwd=self.CWD, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        self._reader = threading.Thread(target=self.read_output, daemon=True)
+        self._reader.start()
+        self.logger.info(f'Archive job started: pid {self.process.pid}, {self.SOURCE_PATH} -> {self.ARCHIVE_PATH}')
+
+
+    def read_output(self) -> None:
+
+        for line in self.process.stdout:
+            if line.startswith(PROGRESS_PREFIX):
+                try:
+                    progress: dict = json.loads(line[len(PROGRESS_PREFIX):])
+                except ValueError:
+                    progress = None
+                if progress is not None:
+                    with self._lock:
+                        self.last_progress = progress
+                    if self.on_progress is not None:
+                        self.on_progress(progress)
+                    continue
+            self.output.append(line.rstrip())
+
+        returncode: int = self.process.wait()
+        with self._lock:
+            # a job killed or crashed before its last progress line
+            if self.last_progress['state'] not in FINAL_STATES:
+                self.last_progress = dict(self.last_progress, state='failed', error=self.last_progress['error'] or f'job exited with code {returncode}')
+            progress: dict = dict(self.last_progress)
+        level: str = 'info' if progress['state'] in ('done', 'cancelled') else 'error'
+        getattr(self.logger, level)(f"Archive job {progress['state']}: {format_progress(progress)} {progress['error']}")
+        if progress['state'] == 'failed':
+            for output_line in self.output:
+                self.logger.error(f'[job] {output_line}')
+        self._finished.set()
+        if self.on_finished is not None:
+            self.on_finished(progress)
+
+
+    def send(self, command: str) -> None:
+
+        if not self.is_running():
+            return
+        try:
+            self.process.stdin.write(f'{command}\n')
+            self.process.stdin.flush()
+        except OSError:
+            pass
+
+
+    def pause(self) -> None:
+        self.send('pause')
+
+
+    def resume(self) -> None:
+        self.send('resume')
+
+
+    def cancel(self) -> None:
+        self.send('cancel')
+
+
+    def is_running(self) -> bool:
+        return self.process is not None and not self._finished.is_set()
+
+
+    def progress(self) -> dict:
+
+        with self._lock:
+            return dict(self.last_progress)
+
+
+    def wait(self, timeout: float = None) -> dict:
+
+        self._finished.wait(timeout=timeout)
+        return self.progress()
+
+
+def read_commands(control: JobControl) -> None:
+
+    # stdin closed means the Maya session that started the job is gone: the job stops at the next file
+    for line in sys.stdin:
+        command: str = line.strip()
+        if command in COMMANDS:
+            getattr(control, command)()
+    control.cancel()
+
+
+def write_progress(control: JobControl) -> None:
+
+    sys.stdout.write(f'{PROGRESS_PREFIX}{json.dumps(control.progress())}\n')
+    sys.stdout.flush()
+
+
+def report_progress(control: JobControl, stop_event: threading.Event) -> None:
+
+    while not stop_event.wait(PROGRESS_INTERVAL):
+        write_progress(control)
+
+
+def run(job_path: str) -> None:
+
+    with open(job_path, 'r', encoding='utf-8') as job_file:
+        job: dict = json.load(job_file)
+    options: dict = job['options']
+    if options.get('io_profiles') is not None:
+        options['io_profiles'] = [IOProfile(**profile) for profile in options['io_profiles']]
+
+    control: JobControl = JobControl()
+    threading.Thread(target=read_commands, args=(control,), daemon=True).start()
+    stop_event: threading.Event = threading.Event()
+    reporter: threading.Thread = threading.Thread(target=report_progress, args=(control, stop_event), daemon=True)
+    reporter.start()
+
+    try:
+        # Maya must be initialized before the archive module talks to it
+        import maya.standalone
+        maya.standalone.initialize(name='python')
+        from .archive import Archive
+
+        archive_tool: Archive = Archive(source_path=job['source_path'], archive_path=job['archive_path'], control=control, interactive=False, **options)
+        archive_tool.archive_files(publish_files=job['publish_files'])
+        maya.standalone.uninitialize()
+    except Exception:
+        control.finish('failed', error=traceback.format_exc())
+    finally:
+        stop_event.set()
+        reporter.join()
+        write_progress(control)
+
+
+def start(arguments: argparse.Namespace) -> int:
+
+    # the same job as the UI, from a terminal: Ctrl+C cancels at the next file
+    options: dict = {'link_method': arguments.link_method, 'output_mode': arguments.output_mode}
+    if arguments.frames:
+        options['frame_range'] = tuple(arguments.frames)
+    job: ArchiveJob = ArchiveJob(source_path=arguments.source_path, archive_path=arguments.archive_path, options=options, mayapy=arguments.mayapy,
+                                 on_progress=lambda progress: print(format_progress(progress), flush=True))
+    job.start()
+    try:
+        progress: dict = job.wait()
+    except KeyboardInterrupt:
+        job.cancel()
+        progress = job.wait()
+    return 0 if progress['state'] == 'done' else 1
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Archive publishes in a background mayapy process with progress, pause and cancel.')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    run_parser = subparsers.add_parser('run', help='run a job file, started by ArchiveJob under mayapy')
+    run_parser.add_argument('job_path')
+    start_parser = subparsers.add_parser('start', help='start a job and print its progress')
+    start_parser.add_argument('source_path')
+    start_parser.add_argument('archive_path')
+    start_parser.add_argument('--frames', type=int, nargs=2, default=None)
+    start_parser.add_argument('--output-mode', choices=('files', 'container'), default='files')
+    start_parser.add_argument('--link-method', choices=('copy', 'reflink', 'hardlink'), default='reflink')
+    start_parser.add_argument('--mayapy', default=MAYAPY_PATH)
+    arguments = parser.parse_args()
+
+    if arguments.action == 'run':
+        run(job_path=arguments.job_path)
+        sys.exit(0)
+    sys.exit(start(arguments))
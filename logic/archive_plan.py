@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+from collections import defaultdict
+from .dependency_plan import DependencyPlan
+from .logger import Logger
+from .ma_scanner import SceneDependency
+
+
+def get_asset_name(publish_filename: str) -> str:
+
+    if 'seq' in publish_filename:
+        return publish_filename.split('.')[0] # example: CDS_seq030_sh080_render_P
+    return publish_filename.split('_')[2] # example: eglise
+
+
+class AssetPlan:
+
+
+    def __init__(self, source_filepath: str, asset_name: str, archived_asset_maya_dirpath: str, frame_range: tuple = None):
+
+        self.source_filepath: str = source_filepath # example : \\GANDALF\3d4_23_24\COUPDESOLEIL\09_publish\asset\04_enviro\CDS_env_eglise_ldv_P.ma
+        self.asset_name: str = asset_name
+        self.archived_asset_maya_dirpath: str = archived_asset_maya_dirpath
+        self.frame_range: tuple = frame_range
+        self.scanned: bool = True # False for .mb publishes, their dependencies are only known once opened in Maya
+        self.dependencies: list = [] # (SceneDependency, DependencyPlan, archive root dirpath)
+
+
+    def add(self, resource: SceneDependency, plan: DependencyPlan, root_dirpath: str) -> None:
+        self.dependencies.append((resource, plan, root_dirpath))
+
+
+    def copies(self) -> dict:
+
+        # destination filepath -> source filepath, a file used by several nodes is copied once
+        copies: dict = {}
+        for resource, plan, root_dirpath in self.dependencies:
+            if not plan.valid:
+                continue
+            for source_filepath, relative_dirpath in plan.copies:
+                destination_filepath: str = os.path.join(root_dirpath, relative_dirpath, os.path.basename(source_filepath))
+                copies.setdefault(destination_filepath, source_filepath)
+        return copies
+
+
+    def missing(self) -> list:
+
+        missing: list = []
+        for resource, plan, root_dirpath in self.dependencies:
+            missing.extend(filepath for filepath in plan.missing if filepath not in missing)
+        return missing
+
+
+class ArchivePlan:
+
+
+    def __init__(self, source_path: str, archive_path: str, logger: Logger, stat=os.stat, needs_copy=None, source_root=os.path.dirname):
+
+        self.source_path: str = source_path
+        self.archive_path: str = archive_path
+        self.logger: Logger = logger
+        self.stat = stat # cached stat of a source file, None when it does not exist
+        self.needs_copy = needs_copy # manifest check, files already archived do not need space
+        self.source_root = source_root # root directory a source file is reported under
+        self.assets: list = [] # AssetPlan, in archiving order
+        self.dependency_plans: dict = {} # resolved plans, handed back to the Archive that executes the plan
+        self.MARGIN: float = 0.05 # free space kept on the archive share on top of the planned bytes
+
+
+    def add_asset(self, asset: AssetPlan) -> None:
+        self.assets.append(asset)
+
+
+    def size(self, filepath: str) -> int:
+
+        stat: os.stat_result = self.stat(filepath)
+        return stat.st_size if stat else 0
+
+
+    def totals(self) -> dict:
+
+        totals: dict = {'assets': len(self.assets), 'files': 0, 'bytes': 0, 'files_to_copy': 0, 'bytes_to_copy': 0,
+                        'duplicate_files': 0, 'duplicate_bytes': 0, 'missing': 0, 'unscanned': 0}
+        sources: dict = defaultdict(int) # source filepath -> number of asset projects it is copied into
+        for asset in self.assets:
+            totals['missing'] += len(asset.missing())
+            totals['unscanned'] += 0 if asset.scanned else 1
+            for destination_filepath, source_filepath in asset.copies().items():
+                size: int = self.size(source_filepath)
+                sources[source_filepath] += 1
+                totals['files'] += 1
+                totals['bytes'] += size
+                if self.needs_copy is None or self.needs_copy(source_filepath=source_filepath, destination_filepath=destination_filepath, stat=self.stat(source_filepath)):
+                    totals['files_to_copy'] += 1
+                    totals['bytes_to_copy'] += size
+        # a source file archived into several asset projects
+        for source_filepath, count in sources.items():
+            if count > 1:
+                totals['duplicate_files'] += count - 1
+                totals['duplicate_bytes'] += (count - 1) * self.size(source_filepath)
+        return totals
+
+
+    def asset_totals(self, asset: AssetPlan) -> dict:
+
+        copies: dict = asset.copies()
+        return {'files': len(copies), 'bytes': sum(self.size(source_filepath) for source_filepath in copies.values()), 'missing': asset.missing()}
+
+
+    def root_totals(self) -> dict:
+
+        roots: dict = defaultdict(lambda: {'files': 0, 'bytes': 0, 'missing': 0})
+        for asset in self.assets:
+            for source_filepath in asset.copies().values():
+                root: dict = roots[self.source_root(source_filepath)]
+                root['files'] += 1
+                root['bytes'] += self.size(source_filepath)
+            for filepath in asset.missing():
+                roots[self.source_root(filepath)]['missing'] += 1
+        return dict(roots)
+
+
+    def free_space(self) -> int:
+
+        # the archive directory may not exist yet, its closest existing parent is on the same share
+        dirpath: str = self.archive_path
+        while dirpath and not os.path.isdir(dirpath):
+            parent: str = os.path.dirname(dirpath)
+            if parent == dirpath:
+                break
+            dirpath = parent
+        return shutil.disk_usage(dirpath).free
+
+
+    def required_space(self) -> int:
+        return int(self.totals()['bytes_to_copy'] * (1 + self.MARGIN))
+
+
+    def check_capacity(self) -> bool:
+
+        required: int = self.required_space()
+        free: int = self.free_space()
+        if required > free:
+            self.logger.error(f'Not enough space on {self.archive_path}: {required / 1024 ** 3:.2f} GB needed, {free / 1024 ** 3:.2f} GB free.')
+            return False
+        self.logger.info(f'Space on {self.archive_path}: {required / 1024 ** 3:.2f} GB needed, {free / 1024 ** 3:.2f} GB free.')
+        return True
+
+
+    def report(self) -> list:
+
+        lines: list = []
+        totals: dict = self.totals()
+        lines.append(f"Plan {self.source_path}: {totals['assets']} assets, {totals['files']} files ({totals['bytes'] / 1024 / 1024:.1f} MB), "
+                     f"to copy: {totals['files_to_copy']} ({totals['bytes_to_copy'] / 1024 / 1024:.1f} MB)")
+        lines.append(f"Duplicates: {totals['duplicate_files']} files ({totals['duplicate_bytes'] / 1024 / 1024:.1f} MB), missing: {totals['missing']}, "
+                     f"not scanned: {totals['unscanned']}")
+        for asset in self.assets:
+            asset_totals: dict = self.asset_totals(asset)
+            lines.append(f"  asset {asset.asset_name:<24} {asset_totals['files']:>7} files {asset_totals['bytes'] / 1024 / 1024:>10.1f} MB "
+                         f"{len(asset_totals['missing'])} missing{'' if asset.scanned else ' (not scanned)'}")
+            for filepath in asset_totals['missing']:
+                lines.append(f'    missing {filepath}')
+        for root, root_totals in sorted(self.root_totals().items(), key=lambda item: item[1]['bytes'], reverse=True):
+            lines.append(f"  root  {root} {root_totals['files']} files {root_totals['bytes'] / 1024 / 1024:.1f} MB {root_totals['missing']} missing")
+        return lines
+
+
+    def log_report(self) -> None:
+
+        for line in self.report():
+            self.logger.info(line)
+
+
+    def write_report(self, path: str) -> None:
+
+        report: dict = {
+            'source_path': self.source_path,
+            'archive_path': self.archive_path,
+            'totals': self.totals(),
+            'free_space': self.free_space(),
+            'assets': [dict(self.asset_totals(asset), asset=asset.asset_name, source=asset.source_filepath, scanned=asset.scanned) for asset in self.assets],
+            'roots': self.root_totals()
+        }
+        with open(path, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=4)
@@ -0,0 +1,379 @@
+import argparse
+import hashlib
+import json
+import lzma
+import os
+import sys
+import tarfile
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .container import EXTENSIONS, INDEX_EXTENSION, ContainerReader, open_decompressed
+from .fast_copy import BUFFER_SIZE, temporary_path
+from .logger import Logger
+from .ma_scanner import MaScanner
+from .manifest import Manifest
+from .token_pattern import TokenPattern, compile_token_pattern
+
+
+class AssetCheck:
+
+
+    def __init__(self, asset_name: str, kind: str, path: str):
+
+        self.asset_name: str = asset_name
+        self.kind: str = kind # project or container
+        self.path: str = path # example : \\GANDALF\3d4_23_24\ARCHIVAGE\COUP-DE-SOLEIL\2_ASSETS\eglise
+        self.scenes: list = []
+        self.references_checked: int = 0 # path attributes and references resolved
+        self.files_checked: int = 0 # files whose size or hash was compared
+        self.issues: list = []
+
+
+    def add_issue(self, issue_type: str, path: str = '', **fields) -> None:
+        self.issues.append(dict(fields, type=issue_type, path=path))
+
+
+    def to_dict(self) -> dict:
+        return {'asset': self.asset_name, 'kind': self.kind, 'path': self.path, 'scenes': self.scenes, 'references_checked': self.references_checked,
+                'files_checked': self.files_checked, 'ok': not self.issues, 'issues': self.issues}
+
+
+class ArchiveVerifier:
+
+
+    def __init__(self, archive_path: str, logger: Logger = None, max_workers: int = 8, check_hashes: bool = False, report_path: str = None, hash_name: str = 'sha256'):
+
+        self.ARCHIVE_PATH: str = os.path.normpath(archive_path) # example : \\GANDALF\3d4_23_24\ARCHIVAGE\COUP-DE-SOLEIL\2_ASSETS\A_CHARAS
+        self.MAX_WORKERS: int = max(1, max_workers)
+        self.SCAN_WORKERS: int = max(1, min(self.MAX_WORKERS, os.cpu_count() or 1)) # processes: the .ma parsing is pure Python and holds the GIL
+        self.CHECK_HASHES: bool = check_hashes # hashes re-read every archived byte, sizes only cost the directory listing
+        self.HASH_NAME: str = hash_name
+        self.WORKSPACE_TOKEN: str = '<ws>'
+        self.SKIPPED_DIRNAMES: tuple = ('.store',)
+        self.MANIFEST_PATH: str = os.path.join(self.ARCHIVE_PATH, 'archive_manifest.jsonl')
+        self.REPORT_PATH: str = report_path or os.path.join(self.ARCHIVE_PATH, 'archive_verify.json')
+        self.logger: Logger = logger or Logger(logger_name='ArchiveVerify')
+        self.manifest: Manifest = None
+        self.manifest_dirpaths: dict = {} # normcased destination dirpath -> copy records of the manifest
+        self.manifest_assets: dict = {} # normcased asset dirpath -> copy records of the manifest inside it
+        self.source_listings: dict = {} # source dirpath -> filenames, None when it cannot be listed
+        self.scan_executor: ProcessPoolExecutor = None
+
+
+    def find_assets(self) -> list:
+
+        # an asset directory holds a maya project, a container sits next to its index
+        checks: list = []
+        container_extensions: tuple = tuple(EXTENSIONS.values())
+        with os.scandir(self.ARCHIVE_PATH) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.name.startswith('.') or entry.name in self.SKIPPED_DIRNAMES:
+                    continue
+                if entry.is_dir() and os.path.isdir(os.path.join(entry.path, 'maya')):
+                    checks.append(AssetCheck(asset_name=entry.name, kind='project', path=entry.path))
+                elif entry.is_file() and entry.name.endswith(container_extensions) and os.path.isfile(f'{entry.path}{INDEX_EXTENSION}'):
+                    extension: str = next(extension for extension in container_extensions if entry.name.endswith(extension))
+                    checks.append(AssetCheck(asset_name=entry.name[:-len(extension)], kind='container', path=entry.path))
+        return checks
+
+
+    def project_listing(self, check: AssetCheck) -> dict:
+
+        # normcased dirpath -> {filename: size}, one walk per asset instead of one stat per attribute
+        listing: dict = {}
+        for root, dirnames, filenames in os.walk(check.path):
+            files: dict = {}
+            for filename in filenames:
+                try:
+                    files[filename] = os.stat(os.path.join(root, filename)).st_size
+                except OSError:
+                    continue
+            listing[os.path.normcase(root)] = files
+        return listing
+
+
+    def container_listing(self, reader: ContainerReader) -> dict:
+
+        # same listing built from the index, member names are relative to the directory the container is extracted in
+        listing: dict = {}
+        for name, member in reader.members.items():
+            if member['type'] != 'file':
+                continue
+            filepath: str = os.path.join(self.ARCHIVE_PATH, *name.split('/'))
+            listing.setdefault(os.path.normcase(os.path.dirname(filepath)), {})[os.path.basename(filepath)] = member['size']
+        return listing
+
+
+    def resolve_value(self, value: str, project_dirpath: str) -> str:
+
+        # example : <ws>/sourceimages/04_enviro/bat01/map/CDS_bat01_A_BaseColor.<udim>.png -> <archive>\bat01\maya\sourceimages\...
+        path: str = value.replace(self.WORKSPACE_TOKEN, project_dirpath)
+        path = path.replace('/', os.sep).replace('\\', os.sep) if not path.startswith(('\\\\', '//')) else path.replace('/', '\\')
+        if not os.path.isabs(path):
+            path = os.path.join(project_dirpath, path)
+        return os.path.normpath(path)
+
+
+    def is_inside_archive(self, path: str) -> bool:
+
+        archive_path: str = os.path.normcase(self.ARCHIVE_PATH)
+        return os.path.normcase(path).startswith(archive_path.rstrip(os.sep) + os.sep)
+
+
+    def check_target(self, check: AssetCheck, listing: dict, path: str, **fields) -> None:
+
+        check.references_checked += 1
+        if not self.is_inside_archive(path):
+            check.add_issue('outside', path=path, **fields)
+            return
+        files: dict = listing.get(os.path.normcase(os.path.dirname(path)), {})
+        filename: str = os.path.basename(path)
+        pattern = compile_token_pattern(filename)
+        if not pattern.tokens:
+            if filename not in files:
+                check.add_issue('missing', path=path, **fields)
+            return
+        # <udim>, u<u>_v<v> and frame tokens: at least one file of the set was archived, then the whole set
+        if not any(pattern.matches(name) for name in files):
+            check.add_issue('missing', path=path, **fields)
+            return
+        self.check_token_set(check, path, pattern, **fields)
+
+
+    def list_source(self, dirpath: str) -> list:
+
+        if dirpath not in self.source_listings:
+            try:
+                self.source_listings[dirpath] = os.listdir(dirpath)
+            except OSError:
+                self.source_listings[dirpath] = None
+        return self.source_listings[dirpath]
+
+
+    def check_token_set(self, check: AssetCheck, path: str, pattern: TokenPattern, **fields) -> None:
+
+        # the manifest records which members of the set were copied and from where: every member of the source set must be one of them,
+        # the presence and size of the recorded copies is checked by check_manifest_files
+        records: list = [record for record in self.manifest_dirpaths.get(os.path.normcase(os.path.dirname(path)), [])
+                         if pattern.matches(os.path.basename(record['destination']))]
+        if not records:
+            return
+        source_names: list = self.list_source(os.path.dirname(records[0]['source']))
+        if source_names is None:
+            return
+        recorded: set = {os.path.basename(record['source']) for record in records}
+        expected: dict = {name: values for name, values in ((name, pattern.match(name)) for name in source_names) if values is not None}
+        if 'frame' in pattern.tokens:
+            # a frame range archives part of a sequence, example : 101-148 of a 1-250 cache: only the gaps inside the archived range count
+            frames: list = [expected[name]['frame'] for name in recorded if 'frame' in expected.get(name, {})]
+            if frames:
+                expected = {name: values for name, values in expected.items() if 'frame' not in values or min(frames) <= values['frame'] <= max(frames)}
+        missing: list = sorted(name for name in expected if name not in recorded)
+        if missing:
+            check.add_issue('incomplete', path=path, missing=missing[:20], missing_count=len(missing), **fields)
+
+
+    def check_scene(self, check: AssetCheck, listing: dict, scene_filepath: str, scene_name: str, project_dirpath: str) -> None:
+
+        check.scenes.append(scene_name)
+        if os.path.splitext(scene_filepath)[1].lower() != '.ma':
+            check.add_issue('unscanned', path=scene_name)
+            return
+        try:
+            if self.scan_executor is not None:
+                dependencies, references = self.scan_executor.submit(scan_scene, scene_filepath).result()
+            else:
+                dependencies, references = scan_scene(scene_filepath)
+        except OSError as error:
+            check.add_issue('unreadable', path=scene_name, error=str(error))
+            return
+        for dependency in dependencies:
+            if not dependency.value:
+                continue
+            self.check_target(check, listing, self.resolve_value(value=dependency.value, project_dirpath=project_dirpath), scene=scene_name,
+                              node=dependency.node, attribute=dependency.attribute, value=dependency.value)
+        # references are imported while archiving, one left in the scene is loaded from wherever it points
+        for reference_path in references:
+            self.check_target(check, listing, self.resolve_value(value=reference_path, project_dirpath=project_dirpath), scene=scene_name,
+                              node='reference', attribute='', value=reference_path)
+
+
+    def hash_file(self, filepath: str) -> str:
+
+        file_hash = hashlib.new(self.HASH_NAME)
+        with open(filepath, 'rb') as hashed_file:
+            while True:
+                chunk: bytes = hashed_file.read(BUFFER_SIZE)
+                if not chunk:
+                    break
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+
+    def check_manifest_files(self, check: AssetCheck, listing: dict) -> None:
+
+        # every file the manifest recorded for this asset: present, same size, and same hash when asked
+        for record in self.manifest_assets.get(os.path.normcase(check.path), []):
+            destination_filepath: str = record['destination']
+            check.files_checked += 1
+            size: int = listing.get(os.path.normcase(os.path.dirname(destination_filepath)), {}).get(os.path.basename(destination_filepath))
+            if size is None:
+                check.add_issue('missing', path=destination_filepath, source=record['source'])
+            elif size != record['size']:
+                check.add_issue('size_mismatch', path=destination_filepath, expected=record['size'], found=size)
+            elif self.CHECK_HASHES and record.get('hash'):
+                try:
+                    digest: str = self.hash_file(destination_filepath)
+                except OSError as error:
+                    check.add_issue('unreadable', path=destination_filepath, error=str(error))
+                    continue
+                if digest != record['hash']:
+                    check.add_issue('hash_mismatch', path=destination_filepath, expected=record['hash'], found=digest)
+
+
+    def check_container_members(self, check: AssetCheck, reader: ContainerReader) -> None:
+
+        # one sequential pass over the container, every member hash compared with the index
+        hash_name: str = reader.index.get('hash_name')
+        with open(check.path, 'rb') as container_file:
+            with tarfile.open(fileobj=open_decompressed(container_file, reader.COMPRESSION), mode='r|') as tar:
+                for tarinfo in tar:
+                    member: dict = reader.members.get(tarinfo.name)
+                    if not tarinfo.isfile() or member is None or not member.get(hash_name):
+                        continue
+                    check.files_checked += 1
+                    file_hash = hashlib.new(hash_name)
+                    member_file = tar.extractfile(tarinfo)
+                    while True:
+                        chunk: bytes = member_file.read(BUFFER_SIZE)
+                        if not chunk:
+                            break
+                        file_hash.update(chunk)
+                    if file_hash.hexdigest() != member[hash_name]:
+                        check.add_issue('hash_mismatch', path=tarinfo.name, expected=member[hash_name], found=file_hash.hexdigest())
+
+
+    def verify_project(self, check: AssetCheck) -> None:
+
+        listing: dict = self.project_listing(check)
+        project_dirpath: str = os.path.join(check.path, 'maya')
+        scenes_dirpath: str = os.path.join(project_dirpath, 'scenes')
+        for filename in sorted(listing.get(os.path.normcase(scenes_dirpath), {})):
+            if os.path.splitext(filename)[1].lower() in ('.ma', '.mb'):
+                self.check_scene(check, listing, os.path.join(scenes_dirpath, filename), filename, project_dirpath)
+        self.check_manifest_files(check, listing)
+
+
+    def verify_container(self, check: AssetCheck) -> None:
+
+        reader: ContainerReader = ContainerReader(container_path=check.path)
+        if os.path.getsize(check.path) != reader.index.get('size'):
+            check.add_issue('size_mismatch', path=check.path, expected=reader.index.get('size'), found=os.path.getsize(check.path))
+            return
+        listing: dict = self.container_listing(reader)
+        # one container per publish, named after it: the index keeps the asset directory it extracts into
+        asset_name: str = reader.index.get('asset') or check.asset_name
+        project_dirpath: str = os.path.join(self.ARCHIVE_PATH, asset_name, 'maya')
+        scene_prefix: str = f'{asset_name}/maya/scenes/'
+        # scenes are extracted to local disk to be scanned, everything else is checked against the index
+        for name in sorted(name for name, member in reader.members.items() if member['type'] == 'file' and name.startswith(scene_prefix)):
+            with tempfile.TemporaryDirectory(prefix='archive_verify_') as temp_dirpath:
+                scene_filepath: str = os.path.join(temp_dirpath, os.path.basename(name))
+                reader.extract(name=name, destination_filepath=scene_filepath)
+                self.check_scene(check, listing, scene_filepath, os.path.basename(name), project_dirpath)
+        if self.CHECK_HASHES:
+            self.check_container_members(check, reader)
+
+
+    def verify_asset(self, check: AssetCheck) -> AssetCheck:
+
+        start: float = time.perf_counter()
+        try:
+            if check.kind == 'container':
+                self.verify_container(check)
+            else:
+                self.verify_project(check)
+        except (OSError, ValueError, tarfile.TarError, EOFError, zlib.error, lzma.LZMAError) as error:
+            check.add_issue('unreadable', path=check.path, error=str(error))
+        self.logger.metrics.record_span(kind='verify', name=check.asset_name, directory=self.ARCHIVE_PATH, duration=time.perf_counter() - start)
+        if check.issues:
+            self.logger.warning(f'Verify: {check.asset_name} {len(check.issues)} issues')
+        else:
+            self.logger.info(f'Verify: {check.asset_name} ok, {check.references_checked} paths, {check.files_checked} files')
+        return check
+
+
+    def verify(self) -> dict:
+
+        start: float = time.time()
+        self.manifest = Manifest(manifest_path=self.MANIFEST_PATH, logger=self.logger) if os.path.exists(self.MANIFEST_PATH) else None
+        self.manifest_dirpaths = {}
+        self.manifest_assets = {}
+        # one pass over the manifest, each asset then only reads its own records
+        archive_root: str = os.path.normcase(self.ARCHIVE_PATH).rstrip(os.sep) + os.sep
+        for destination_filepath, record in (self.manifest.copies.items() if self.manifest is not None else ()):
+            destination_key: str = os.path.normcase(destination_filepath)
+            self.manifest_dirpaths.setdefault(os.path.dirname(destination_key), []).append(record)
+            if destination_key.startswith(archive_root):
+                # example : <archive>\eglise\maya\sourceimages\...\CDS_eglise_BaseColor.1001.png -> <archive>\eglise
+                asset_key: str = archive_root + destination_key[len(archive_root):].split(os.sep, 1)[0]
+                self.manifest_assets.setdefault(asset_key, []).append(record)
+        self.source_listings = {}
+        checks: list = self.find_assets()
+        self.logger.info(f'Verifying {len(checks)} assets in {self.ARCHIVE_PATH}, hashes: {self.CHECK_HASHES}')
+        # threads walk, read and hash the assets, the scenes are parsed in worker processes
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor, ProcessPoolExecutor(max_workers=self.SCAN_WORKERS) as scan_executor:
+            self.scan_executor = scan_executor
+            try:
+                checks = list(executor.map(self.verify_asset, checks))
+            finally:
+                self.scan_executor = None
+
+        totals: dict = {'assets': len(checks), 'assets_ok': 0, 'scenes': 0, 'references_checked': 0, 'files_checked': 0, 'issues': 0}
+        for check in checks:
+            totals['assets_ok'] += 0 if check.issues else 1
+            totals['scenes'] += len(check.scenes)
+            totals['references_checked'] += check.references_checked
+            totals['files_checked'] += check.files_checked
+            totals['issues'] += len(check.issues)
+            for issue in check.issues:
+                totals[issue['type']] = totals.get(issue['type'], 0) + 1
+
+        report: dict = {'archive_path': self.ARCHIVE_PATH, 'check_hashes': self.CHECK_HASHES, 'started': start, 'duration': time.time() - start,
+                        'totals': totals, 'assets': [check.to_dict() for check in checks]}
+        self.write_report(report)
+        self.logger.info(f"Verify report: {totals['assets_ok']}/{totals['assets']} assets ok, {totals['references_checked']} paths, "
+                         f"{totals['files_checked']} files, {totals['issues']} issues in {report['duration']:.1f}s -> {self.REPORT_PATH}")
+        return report
+
+
+    def write_report(self, report: dict) -> None:
+
+        temp_path: str = temporary_path(self.REPORT_PATH)
+        with open(temp_path, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=1)
+        os.replace(temp_path, self.REPORT_PATH)
+
+
+def scan_scene(scene_filepath: str) -> tuple:
+
+    # runs in a worker process of ArchiveVerifier.verify
+    scanner: MaScanner = MaScanner(filepath=scene_filepath)
+    return scanner.scan(), scanner.references
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Check that every archived asset of an archive root is self-contained.')
+    parser.add_argument('archive_path')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--hashes', action='store_true', help='compare file hashes with the manifest and the container indexes')
+    parser.add_argument('--report', default=None)
+    arguments = parser.parse_args()
+
+    verifier: ArchiveVerifier = ArchiveVerifier(archive_path=arguments.archive_path, max_workers=arguments.workers, check_hashes=arguments.hashes, report_path=arguments.report)
+    verify_report: dict = verifier.verify()
+    verifier.logger.flush()
+    sys.exit(1 if verify_report['totals']['issues'] else 0)
@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from .archive_plan import get_asset_name
+from .fast_copy import temporary_path
+from .io_scheduler import DEFAULT_PROFILES, split_profiles
+from .logger import Logger
+from .manifest import Manifest, merge_shards
+
+
+RESULT_PREFIX: str = '@@ARCHIVE_RESULT@@ '
+MAYAPY_PATH: str = r'C:\Program Files\Autodesk\Maya2023\bin\mayapy.exe'
+
+
+class WorkerProcess:
+
+
+    def __init__(self, worker_id: int, command: list, cwd: str, logger: Logger):
+
+        self.worker_id: int = worker_id
+        self.logger: Logger = logger
+        self.scenes_done: int = 0
+        self.results: queue.Queue = queue.Queue()
+
+        # stderr is merged into stdout: result lines are picked out, everything else goes to the batch log
+        self.process: subprocess.Popen = subprocess.Popen(command, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        self._reader: threading.Thread = threading.Thread(target=self.read_output, daemon=True)
+        self._reader.start()
+        self.logger.info(f'[worker {self.worker_id}] Started pid {self.process.pid}')
+
+
+    def read_output(self) -> None:
+
+        for line in self.process.stdout:
+            if line.startswith(RESULT_PREFIX):
+                try:
+                    self.results.put(json.loads(line[len(RESULT_PREFIX):]))
+                    continue
+                except ValueError:
+                    pass
+            self.logger.info(f'[worker {self.worker_id}] {line.rstrip()}')
+        self.results.put(None)
+
+
+    def submit(self, source_path: str) -> None:
+
+        self.process.stdin.write(f'{source_path}\n')
+        self.process.stdin.flush()
+
+
+    def wait_result(self, timeout: float) -> dict:
+        return self.results.get(timeout=timeout)
+
+
+    def stop(self, timeout: float = 60) -> None:
+
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+            return
+        self._reader.join(timeout=timeout)
+        self.logger.info(f'[worker {self.worker_id}] Stopped after {self.scenes_done} scenes')
+
+
+    def kill(self) -> None:
+
+        self.process.kill()
+        self.process.wait()
+        self.logger.warning(f'[worker {self.worker_id}] Killed pid {self.process.pid}')
+
+
+class BatchScheduler:
+
+
+    def __init__(self, source_path: str, archive_path: str, workers: int = 4, scenes_per_worker: int = 20, scene_timeout: float = 3600, worker_command: list = None,
+                 mayapy: str = MAYAPY_PATH, options: dict = None, logger: Logger = None):
+
+        self.SOURCE_PATH: str = source_path
+        self.ARCHIVE_PATH: str = archive_path
+        self.WORKERS: int = max(1, workers)
+        self.SCENES_PER_WORKER: int = max(1, scenes_per_worker) # workers are recycled to limit Maya memory growth
+        self.SCENE_TIMEOUT: float = scene_timeout
+        self.WORKER_COMMAND: list = worker_command or [mayapy, '-m', 'logic.batch_worker', archive_path] # the shard name of the worker and --options are appended
+        self.WORKER_CWD: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.BATCH_LOG_PATH: str = os.path.join(archive_path, 'archive_batch.log')
+        self.SHARDED_FILENAMES: tuple = ('archive_manifest.jsonl', 'archive.log', 'archive_events.jsonl')
+        self.OPTIONS_PATH: str = os.path.join(archive_path, 'archive_batch_options.json')
+        self.options: dict = dict(options or {}) # Archive keyword arguments of every worker, example : {'link_method': 'hardlink', 'io_profiles': [IOProfile(...)]}
+
+        self.logger: Logger = logger or Logger(logger_name='ArchiveBatch')
+        if logger is None:
+            self.logger.write_to_file(path=self.BATCH_LOG_PATH)
+
+        self.results: list = []
+        self._lock: threading.Lock = threading.Lock()
+
+
+    def list_publish_files(self) -> list:
+
+        # same selection as Archive.list_files, without Maya
+        with os.scandir(self.SOURCE_PATH) as entries:
+            return sorted(entry.path for entry in entries if entry.is_file())
+
+
+    def write_options(self, workers: int) -> None:
+
+        # the I/O budget is divided between the workers: together they stay within the bandwidth and streams of the profiles
+        options: dict = dict(self.options)
+        io_profiles: list = options.get('io_profiles')
+        options['io_profiles'] = [vars(profile) for profile in split_profiles(DEFAULT_PROFILES if io_profiles is None else io_profiles, workers)]
+        os.makedirs(self.ARCHIVE_PATH, exist_ok=True)
+        temp_path: str = temporary_path(self.OPTIONS_PATH)
+        with open(temp_path, 'w', encoding='utf-8') as options_file:
+            json.dump(options, options_file, indent=1)
+        os.replace(temp_path, self.OPTIONS_PATH)
+
+
+    def asset_key(self, publish_file: str) -> str:
+
+        # publishes of the same asset share the archived asset directory, example : CDS_env_eglise_ldv_P.ma and CDS_env_eglise_mod_P.ma
+        try:
+            return get_asset_name(os.path.basename(publish_file))
+        except IndexError:
+            return publish_file
+
+
+    def merge_worker_shards(self) -> None:
+
+        for filename in self.SHARDED_FILENAMES:
+            merged: int = merge_shards(os.path.join(self.ARCHIVE_PATH, filename))
+            if merged:
+                self.logger.info(f'Merged {merged} worker shards into {filename}')
+
+
+    def record(self, result: dict) -> None:
+
+        with self._lock:
+            self.results.append(result)
+        level: str = 'info' if result['status'] == 'done' else 'error'
+        getattr(self.logger, level)(f"{result['status'].upper()}: {result['source']} ({result.get('duration', 0):.1f}s) {result.get('error', '')}")
+
+
+    def worker_loop(self, worker_id: int, work: queue.Queue) -> None:
+
+        worker: WorkerProcess = None
+        command: list = self.WORKER_COMMAND + [f'worker{worker_id}', '--options', self.OPTIONS_PATH]
+        try:
+            while True:
+                try:
+                    # every publish of one asset, archived one after the other by the same worker
+                    source_paths: list = work.get_nowait()
+                except queue.Empty:
+                    break
+
+                for source_path in source_paths:
+                    if worker is None:
+                        worker = WorkerProcess(worker_id=worker_id, command=command, cwd=self.WORKER_CWD, logger=self.logger)
+
+                    start: float = time.time()
+                    try:
+                        worker.submit(source_path)
+                        result: dict = worker.wait_result(timeout=self.SCENE_TIMEOUT)
+                    except queue.Empty:
+                        worker.kill()
+                        worker = None
+                        self.record({'source': source_path, 'status': 'timeout', 'duration': time.time() - start, 'error': f'no result after {self.SCENE_TIMEOUT}s'})
+                        continue
+                    except OSError:
+                        result = None
+
+                    if result is None:
+                        worker.kill()
+                        worker = None
+                        self.record({'source': source_path, 'status': 'error', 'duration': time.time() - start, 'error': 'worker exited'})
+                        continue
+
+                    self.record(result)
+                    worker.scenes_done += 1
+                    if worker.scenes_done >= self.SCENES_PER_WORKER:
+                        worker.stop()
+                        worker = None
+        finally:
+            if worker is not None:
+                worker.stop()
+
+
+    def run(self, publish_files: list = None) -> dict:
+
+        if publish_files is None:
+            publish_files = self.list_publish_files()
+
+        # shards left by an interrupted batch go into the manifest before it is read
+        self.merge_worker_shards()
+
+        # publishes already archived and unchanged since are not sent to the workers
+        manifest: Manifest = Manifest(manifest_path=os.path.join(self.ARCHIVE_PATH, 'archive_manifest.jsonl'), logger=self.logger)
+        pending_files: list = [publish_file for publish_file in publish_files if not manifest.asset_done(publish_file)]
+        self.logger.info(f'Batch: {len(pending_files)} publish files to archive, {len(publish_files) - len(pending_files)} already archived, {self.WORKERS} workers.')
+
+        # two workers never copy into the same archived asset directory at once
+        groups: dict = {}
+        for publish_file in pending_files:
+            groups.setdefault(self.asset_key(publish_file), []).append(publish_file)
+        work: queue.Queue = queue.Queue()
+        for group in groups.values():
+            work.put(group)
+            if len(group) > 1:
+                self.logger.info(f'Batch: {len(group)} publishes of {self.asset_key(group[0])} are archived one after the other.')
+
+        start: float = time.time()
+        workers: int = min(self.WORKERS, len(groups))
+        self.write_options(workers=workers)
+        threads: list = [threading.Thread(target=self.worker_loop, args=(worker_id, work)) for worker_id in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.merge_worker_shards()
+
+        return self.summary(duration=time.time() - start, skipped=len(publish_files) - len(pending_files))
+
+
+    def summary(self, duration: float, skipped: int = 0) -> dict:
+
+        counts: dict = {'done': 0, 'error': 0, 'timeout': 0}
+        for result in self.results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        summary: dict = dict(counts, skipped=skipped, duration=duration, failed=[result for result in self.results if result['status'] != 'done'])
+
+        self.logger.info(f"Batch summary: {counts['done']} done, {counts['error']} errors, {counts['timeout']} timeouts, {skipped} skipped in {duration:.1f}s")
+        for result in sorted(self.results, key=lambda result: result.get('duration', 0), reverse=True)[:10]:
+            self.logger.info(f"  {result.get('duration', 0):>8.1f}s  {result['status']:<8} {result['source']}")
+        for result in summary['failed']:
+            self.logger.error(f"Failed: {result['source']} ({result['status']}: {result.get('error', '')})")
+        return summary
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Archive every publish of a folder with a pool of mayapy workers.')
+    parser.add_argument('source_path')
+    parser.add_argument('archive_path')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--scenes-per-worker', type=int, default=20)
+    parser.add_argument('--scene-timeout', type=float, default=3600)
+    parser.add_argument('--mayapy', default=MAYAPY_PATH)
+    parser.add_argument('--output-mode', choices=('files', 'container'), default='files')
+    parser.add_argument('--link-method', choices=('copy', 'reflink', 'hardlink'), default='reflink')
+    parser.add_argument('--dedup-store', action='store_true')
+    arguments = parser.parse_args()
+
+    scheduler: BatchScheduler = BatchScheduler(
+        source_path=arguments.source_path,
+        archive_path=arguments.archive_path,
+        workers=arguments.workers,
+        scenes_per_worker=arguments.scenes_per_worker,
+        scene_timeout=arguments.scene_timeout,
+        mayapy=arguments.mayapy,
+        options={'output_mode': arguments.output_mode, 'link_method': arguments.link_method, 'use_dedup_store': arguments.dedup_store}
+    )
+    summary: dict = scheduler.run()
+    sys.exit(1 if summary['failed'] else 0)
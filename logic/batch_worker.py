@@ -0,0 +1,69 @@
+import argparse
+import json
+import sys
+import time
+import traceback
+from .batch_scheduler import RESULT_PREFIX
+from .io_scheduler import IOProfile
+
+
+def read_options(options_path: str) -> dict:
+
+    # Archive keyword arguments written by BatchScheduler.write_options
+    if options_path is None:
+        return {}
+    with open(options_path, 'r', encoding='utf-8') as options_file:
+        options: dict = json.load(options_file)
+    if options.get('io_profiles') is not None:
+        options['io_profiles'] = [IOProfile(**profile) for profile in options['io_profiles']]
+    return options
+
+
+def main(archive_path: str, shard: str = None, options_path: str = None) -> None:
+
+    # Maya must be initialized before the archive module talks to it
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    from maya import cmds
+    from .archive import Archive
+
+    # several workers archive into the same root: each one writes its own manifest, log and events shard
+    archive_tool: Archive = Archive(archive_path=archive_path, shard=shard, interactive=False, **read_options(options_path))
+    archive_tool.load_plugins()
+
+    for line in sys.stdin:
+        source_path: str = line.strip()
+        if not source_path:
+            continue
+
+        start: float = time.time()
+        result: dict = {'source': source_path, 'status': 'done', 'error': ''}
+        # a worker lives for several publishes: the source directories are listed again for each one
+        archive_tool.directory_index.invalidate()
+        try:
+            archive_tool.archive_file(source_path=source_path, archiving_dirpath=archive_tool.ARCHIVE_PATH)
+        except Exception as error:
+            result['status'] = 'error'
+            result['error'] = str(error)
+            archive_tool.logger.error(traceback.format_exc())
+        finally:
+            cmds.file(new=True, force=True)
+        result['duration'] = time.time() - start
+
+        sys.stdout.write(f'{RESULT_PREFIX}{json.dumps(result)}\n')
+        sys.stdout.flush()
+
+    archive_tool.manifest.close()
+    archive_tool.logger.close()
+    maya.standalone.uninitialize()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Archive the publish paths read from stdin, started by BatchScheduler under mayapy.')
+    parser.add_argument('archive_path')
+    parser.add_argument('shard', nargs='?', default=None)
+    parser.add_argument('--options', default=None, help='json file of Archive keyword arguments')
+    arguments = parser.parse_args()
+
+    main(archive_path=arguments.archive_path, shard=arguments.shard, options_path=arguments.options)
@@ -0,0 +1,265 @@
+import collections
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import tarfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+from .fast_copy import BUFFER_SIZE, temporary_path
+from .logger import Logger
+
+
+BLOCK_SIZE: int = 4 * 1024 * 1024 # uncompressed bytes compressed as one independent gzip member / xz stream / zstd frame
+EXTENSIONS: dict = {None: '.tar', 'gz': '.tar.gz', 'xz': '.tar.xz', 'zst': '.tar.zst'}
+INDEX_EXTENSION: str = '.index.json'
+
+_compressors: threading.local = threading.local()
+
+
+def available_compressions() -> list:
+    return [None, 'gz', 'xz'] + (['zst'] if zstandard is not None else [])
+
+
+def compress_block(block: bytes, compression: str, level: int) -> bytes:
+
+    # every block is a complete stream on its own: blocks compress in parallel and concatenate into a valid file
+    if compression == 'gz':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(block) + compressor.flush()
+    if compression == 'xz':
+        return lzma.compress(block, format=lzma.FORMAT_XZ, preset=level)
+    if compression == 'zst':
+        compressor = getattr(_compressors, 'zstd', None)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(level=level)
+            _compressors.zstd = compressor
+        return compressor.compress(block)
+    return block
+
+
+def open_decompressed(fileobj, compression: str):
+
+    # reads the concatenated blocks from the current position of fileobj
+    if compression == 'gz':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(fileobj, mode='rb')
+    if compression == 'zst':
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+    return fileobj
+
+
+class ContainerWriter:
+
+
+    def __init__(self, container_path: str, logger: Logger, compression: str = 'gz', level: int = None, threads: int = 8, hash_name: str = 'sha256', asset_name: str = None):
+
+        if compression not in available_compressions():
+            raise ValueError(f'Compression {compression} is not available, use one of {available_compressions()}.')
+        self.container_path: str = container_path # example : \\GANDALF\3d4_23_24\ARCHIVAGE\COUP-DE-SOLEIL\2_ASSETS\CDS_env_eglise_ldv_P.tar.gz
+        self.asset_name: str = asset_name # directory the container extracts into, example : eglise
+        self.index_path: str = f'{container_path}{INDEX_EXTENSION}'
+        self.logger: Logger = logger
+        self.COMPRESSION: str = compression
+        self.LEVEL: int = level if level is not None else {'gz': 6, 'xz': 6, 'zst': 3}.get(compression, 0)
+        self.THREADS: int = max(1, threads)
+        self.HASH_NAME: str = hash_name
+
+        self._temporary_path: str = temporary_path(container_path)
+        self._file = open(self._temporary_path, 'wb')
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=self.THREADS) if compression else None
+        self._pending: collections.deque = collections.deque() # (block number, future or bytes), in file order
+        self._buffer: bytearray = bytearray()
+        self._block_number: int = 0
+        self._member_blocks: dict = {} # block number -> member name starting with this block
+        self._offset: int = 0 # compressed bytes written so far
+        self._data_offset: int = 0 # uncompressed tar bytes so far
+        self.members: dict = {} # member name -> index entry
+        self.names: set = set()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+    def submit_block(self) -> None:
+
+        if not self._buffer:
+            return
+        block: bytes = bytes(self._buffer)
+        self._buffer = bytearray()
+        if self._executor is not None:
+            self._pending.append((self._block_number, self._executor.submit(compress_block, block, self.COMPRESSION, self.LEVEL)))
+        else:
+            self._pending.append((self._block_number, block))
+        self._block_number += 1
+        # bounded read ahead: compressed blocks are written in order, a few blocks behind the reader
+        while len(self._pending) > self.THREADS * 2:
+            self.write_block()
+
+
+    def write_block(self) -> None:
+
+        block_number, block = self._pending.popleft()
+        data: bytes = block.result() if self._executor is not None else block
+        name: str = self._member_blocks.pop(block_number, None)
+        if name is not None:
+            self.members[name]['offset'] = self._offset
+        self._file.write(data)
+        self._offset += len(data)
+
+
+    def write(self, data: bytes) -> None:
+
+        self._buffer += data
+        self._data_offset += len(data)
+        if len(self._buffer) >= BLOCK_SIZE:
+            self.submit_block()
+
+
+    def start_member(self, tarinfo: tarfile.TarInfo) -> None:
+
+        # a member starts a new block, so that it can be read from its offset without the blocks before it
+        self.submit_block()
+        self._member_blocks[self._block_number] = tarinfo.name
+        self.members[tarinfo.name] = {'offset': None, 'data_offset': self._data_offset, 'size': tarinfo.size, 'type': 'file' if tarinfo.isfile() else 'dir'}
+        self.names.add(tarinfo.name)
+        self.write(tarinfo.tobuf(format=tarfile.PAX_FORMAT, encoding='utf-8', errors='surrogateescape'))
+
+
+    def add_file(self, source_filepath: str, arcname: str, throttle=None) -> str:
+
+        arcname = arcname.replace(os.sep, '/')
+        if arcname in self.names:
+            return self.members[arcname].get(self.HASH_NAME)
+        # the source is opened before the header is written: a file that cannot be read leaves no partial member
+        with open(source_filepath, 'rb') as source_file:
+            stat: os.stat_result = os.fstat(source_file.fileno())
+            tarinfo: tarfile.TarInfo = tarfile.TarInfo(name=arcname)
+            tarinfo.size = stat.st_size
+            tarinfo.mtime = stat.st_mtime
+            tarinfo.mode = stat.st_mode & 0o7777
+            self.start_member(tarinfo)
+
+            hasher = hashlib.new(self.HASH_NAME) if self.HASH_NAME else None
+            remaining: int = stat.st_size
+            while remaining > 0:
+                chunk: bytes = source_file.read(min(BUFFER_SIZE, remaining))
+                if not chunk:
+                    raise OSError(f'{source_filepath} changed size while it was archived.')
+                remaining -= len(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                self.write(chunk)
+                if throttle is not None:
+                    throttle(len(chunk))
+        padding: int = -stat.st_size % tarfile.BLOCKSIZE
+        if padding:
+            self.write(tarfile.NUL * padding)
+
+        digest: str = hasher.hexdigest() if hasher is not None else None
+        if digest is not None:
+            self.members[arcname][self.HASH_NAME] = digest
+        return digest
+
+
+    def add_directory(self, arcname: str) -> None:
+
+        arcname = arcname.replace(os.sep, '/').rstrip('/')
+        if not arcname or arcname in self.names:
+            return
+        tarinfo: tarfile.TarInfo = tarfile.TarInfo(name=arcname)
+        tarinfo.type = tarfile.DIRTYPE
+        tarinfo.mode = 0o755
+        tarinfo.mtime = time.time()
+        self.start_member(tarinfo)
+
+
+    def add_tree(self, dirpath: str, arcname: str) -> None:
+
+        # directories and files not already in the container, example : the maya project with the saved scene
+        self.add_directory(arcname)
+        for root, dirnames, filenames in os.walk(dirpath):
+            dirnames.sort()
+            relative_root: str = os.path.relpath(root, dirpath)
+            root_arcname: str = arcname if relative_root == '.' else f"{arcname}/{relative_root.replace(os.sep, '/')}"
+            self.add_directory(root_arcname)
+            for filename in sorted(filenames):
+                self.add_file(source_filepath=os.path.join(root, filename), arcname=f'{root_arcname}/{filename}')
+
+
+    def close(self) -> None:
+
+        # end of archive: two zero blocks
+        self.submit_block()
+        self.write(tarfile.NUL * tarfile.BLOCKSIZE * 2)
+        self.submit_block()
+        while self._pending:
+            self.write_block()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._file.close()
+        os.replace(self._temporary_path, self.container_path)
+
+        index: dict = {'container': os.path.basename(self.container_path), 'asset': self.asset_name, 'compression': self.COMPRESSION, 'block_size': BLOCK_SIZE,
+                       'hash_name': self.HASH_NAME, 'size': self._offset, 'members': self.members}
+        index_temporary_path: str = temporary_path(self.index_path)
+        with open(index_temporary_path, 'w', encoding='utf-8') as index_file:
+            json.dump(index, index_file, indent=1)
+        os.replace(index_temporary_path, self.index_path)
+        self.logger.info(f'Container: {self.container_path} {len(self.members)} members, {self._data_offset / 1024 / 1024:.1f} MB -> {self._offset / 1024 / 1024:.1f} MB')
+
+
+    def abort(self) -> None:
+
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+        self._file.close()
+        if os.path.exists(self._temporary_path):
+            os.remove(self._temporary_path)
+
+
+class ContainerReader:
+
+
+    def __init__(self, container_path: str):
+
+        self.container_path: str = container_path
+        with open(f'{container_path}{INDEX_EXTENSION}', 'r', encoding='utf-8') as index_file:
+            self.index: dict = json.load(index_file)
+        self.members: dict = self.index['members']
+        self.COMPRESSION: str = self.index['compression']
+
+
+    def extract(self, name: str, destination_filepath: str) -> None:
+
+        # random access: decompression starts at the block of the member, not at the start of the container
+        with open(self.container_path, 'rb') as container_file:
+            container_file.seek(self.members[name]['offset'])
+            with tarfile.open(fileobj=open_decompressed(container_file, self.COMPRESSION), mode='r|') as tar:
+                tarinfo: tarfile.TarInfo = tar.next()
+                if tarinfo is None or tarinfo.name != name:
+                    raise OSError(f'{name} not found at its offset in {self.container_path}.')
+                member_file = tar.extractfile(tarinfo)
+                with open(destination_filepath, 'wb') as destination_file:
+                    while True:
+                        chunk: bytes = member_file.read(BUFFER_SIZE)
+                        if not chunk:
+                            break
+                        destination_file.write(chunk)
@@ -0,0 +1,150 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .logger import Logger
+from .dedup_store import DedupStore
+from .fast_copy import LINK_METHODS, place_file
+from .io_scheduler import IOScheduler
+from .job_control import ArchiveCancelled, JobControl
+from .manifest import Manifest
+
+
+class CopyJob:
+
+
+    def __init__(self, source_filepath: str, destination_dirpath: str):
+
+        self.source_filepath: str = source_filepath
+        self.destination_dirpath: str = destination_dirpath
+        self.destination_filepath: str = os.path.join(destination_dirpath, os.path.basename(source_filepath))
+        self.attempts: int = 0
+        self.error: Exception = None
+        self.digest: str = None
+        self.method: str = None # copy, reflink, hardlink or store
+
+
+class CopyEngine:
+
+
+    def __init__(self, logger: Logger, max_workers: int = 8, retries: int = 3, retry_delay: float = 1.0, store: DedupStore = None, manifest: Manifest = None, hash_name: str = 'sha256', scheduler: IOScheduler = None,
+                 link_method: str = 'copy', control: JobControl = None):
+
+        if link_method not in LINK_METHODS:
+            raise ValueError(f'Unknown link method {link_method}, use one of {LINK_METHODS}.')
+
+        self.logger: Logger = logger
+        self.store: DedupStore = store
+        self.manifest: Manifest = manifest
+        self.scheduler: IOScheduler = scheduler or IOScheduler(logger=logger, profiles=[])
+        self.control: JobControl = control or JobControl() # pause and cancel between two files, progress
+        self.MAX_WORKERS: int = max(1, max_workers)
+        self.RETRIES: int = max(1, retries)
+        self.RETRY_DELAY: float = retry_delay
+        self.HASH_NAME: str = hash_name # the digest of every dependency copy goes to the manifest, None skips it and allows kernel side copies
+        self.LINK_METHOD: str = link_method # reflink or hardlink when the source and the archive are on the same filesystem
+
+        self.jobs: list = []
+        self._queued_destinations: set = set()
+        self._devices: dict = {} # destination dirpath -> st_dev
+
+
+    def queue(self, source_filepath: str, destination_dirpath: str) -> CopyJob:
+
+        job: CopyJob = CopyJob(source_filepath=source_filepath, destination_dirpath=destination_dirpath)
+        if job.destination_filepath in self._queued_destinations:
+            return job
+        self._queued_destinations.add(job.destination_filepath)
+        self.jobs.append(job)
+        return job
+
+
+    def copy(self, job: CopyJob) -> CopyJob:
+
+        self.control.checkpoint()
+        while job.attempts < self.RETRIES:
+            job.attempts += 1
+            try:
+                start: float = time.perf_counter()
+                digest: str = None
+                with self.scheduler.transfer(source_filepath=job.source_filepath, destination_filepath=job.destination_filepath) as transfer:
+                    stat: os.stat_result = transfer.stat
+                    if self.store is not None:
+                        method: str = 'store'
+                        digest = self.store.materialize(source_filepath=job.source_filepath, destination_filepath=job.destination_filepath, stat=stat, throttle=transfer.throttle)
+                    else:
+                        method, digest = place_file(source_filepath=job.source_filepath, destination_filepath=job.destination_filepath, method=self.LINK_METHOD,
+                                                    same_device=self.same_device(stat=stat, destination_dirpath=job.destination_dirpath), hash_name=self.HASH_NAME, throttle=transfer.throttle)
+                if self.manifest is not None:
+                    self.manifest.record_copy(source_filepath=job.source_filepath, destination_filepath=job.destination_filepath, size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=digest, method=method)
+                job.digest = digest
+                job.method = method
+                job.error = None
+                self.logger.metrics.record_span(kind='copy', name=os.path.basename(job.source_filepath), directory=os.path.dirname(job.source_filepath), duration=time.perf_counter() - start, size=stat.st_size)
+                self.logger.count('files_copied')
+                self.logger.count('bytes_copied', stat.st_size)
+                if method in ('reflink', 'hardlink'):
+                    self.logger.count(f'files_{method}')
+                    self.logger.count(f'bytes_{method}', stat.st_size)
+                self.logger.info('Copy: %s -> %s (%s)', job.source_filepath, job.destination_dirpath, method)
+                self.control.file_done(stat.st_size)
+                return job
+            except OSError as error:
+                job.error = error
+                self.logger.warning('Copy attempt %s/%s failed: %s (%s)', job.attempts, self.RETRIES, job.source_filepath, error)
+                if job.attempts < self.RETRIES:
+                    time.sleep(self.RETRY_DELAY * job.attempts)
+        self.control.file_failed()
+        return job
+
+
+    def same_device(self, stat: os.stat_result, destination_dirpath: str) -> bool:
+
+        # links only work inside one filesystem, a copy across devices is not even attempted as a link
+        if self.LINK_METHOD == 'copy':
+            return False
+        device: int = self._devices.get(destination_dirpath)
+        if device is None:
+            device = os.stat(destination_dirpath).st_dev
+            self._devices[destination_dirpath] = device
+        return device == stat.st_dev
+
+
+    def take_jobs(self) -> list:
+
+        jobs: list = self.jobs
+        self.jobs = []
+        self._queued_destinations = set()
+        return jobs
+
+
+    def run(self) -> list:
+
+        jobs: list = self.take_jobs()
+        if not jobs:
+            return []
+
+        failed_jobs: list = []
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            futures = [executor.submit(self.copy, job) for job in jobs]
+            try:
+                for future in as_completed(futures):
+                    job: CopyJob = future.result()
+                    if job.error is not None:
+                        failed_jobs.append(job)
+            except ArchiveCancelled:
+                # files being copied are finished, the ones not started are left for the next run
+                for future in futures:
+                    future.cancel()
+                self.logger.warning(f'Copy cancelled: {sum(1 for future in futures if future.cancelled())}/{len(jobs)} files left for the next run.')
+                raise
+
+        self.report(jobs=jobs, failed_jobs=failed_jobs)
+        return failed_jobs
+
+
+    def report(self, jobs: list, failed_jobs: list) -> None:
+
+        self.logger.info(f'Copy report: {len(jobs) - len(failed_jobs)} copied, {len(failed_jobs)} failed.')
+        self.logger.count('files_failed', len(failed_jobs))
+        for job in failed_jobs:
+            self.logger.error(f'Fail Copy: {job.source_filepath} -> {job.destination_dirpath} after {job.attempts} attempts ({job.error})')
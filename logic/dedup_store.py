@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from .fast_copy import copy_data, temporary_path
+from .logger import Logger
+
+
+class DedupStore:
+
+
+    def __init__(self, store_dirpath: str, logger: Logger, hash_name: str = 'sha256'):
+
+        self.STORE_DIRPATH: str = store_dirpath # example : \\GANDALF\3d4_23_24\ARCHIVAGE\COUP-DE-SOLEIL\2_ASSETS\A_CHARAS\.store
+        self.INDEX_PATH: str = os.path.join(store_dirpath, 'index.json')
+        self.LOCK_PATH: str = f'{self.INDEX_PATH}.lock'
+        self.LOCK_TIMEOUT: float = 30.0
+        self.LOCK_STALE: float = 120.0 # a lock older than this was left by a crashed worker
+        self.HASH_NAME: str = hash_name
+        self.logger: Logger = logger
+
+        self._lock: threading.Lock = threading.Lock()
+        self._index: dict = {} # source filepath -> [size, mtime_ns, digest]
+        self._changed: set = set() # source filepaths hashed this session, merged into the index on disk
+        self.load_index()
+
+        self.files_total: int = 0
+        self.files_deduplicated: int = 0
+        self.bytes_total: int = 0
+        self.bytes_stored: int = 0 # bytes written to new blobs
+        self._unique_sizes: dict = {} # digest -> size, for the blobs materialized this session
+
+
+    def load_index(self) -> None:
+
+        if not os.path.exists(self.INDEX_PATH):
+            return
+        try:
+            with open(self.INDEX_PATH, 'r', encoding='utf-8') as index_file:
+                self._index = json.load(index_file)
+        except (OSError, ValueError):
+            self.logger.warning(f'Dedup store index {self.INDEX_PATH} is unreadable, files will be hashed again.')
+            self._index = {}
+
+
+    @contextmanager
+    def index_lock(self):
+
+        # batch workers share the store: one writer at a time, a lock file works across processes and on SMB shares
+        start: float = time.monotonic()
+        while True:
+            try:
+                lock_fd: int = os.open(self.LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.LOCK_PATH) > self.LOCK_STALE:
+                        os.remove(self.LOCK_PATH)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() - start > self.LOCK_TIMEOUT:
+                    raise TimeoutError(f'Dedup store index is locked: {self.LOCK_PATH}')
+                time.sleep(0.1)
+        try:
+            os.close(lock_fd)
+            yield
+        finally:
+            os.remove(self.LOCK_PATH)
+
+
+    def save_index(self) -> None:
+
+        os.makedirs(self.STORE_DIRPATH, exist_ok=True)
+        with self._lock:
+            changes: dict = {filepath: self._index[filepath] for filepath in self._changed}
+        if not changes:
+            return
+        try:
+            with self.index_lock():
+                # entries written by other workers since this one loaded the index are kept
+                index: dict = {}
+                if os.path.exists(self.INDEX_PATH):
+                    try:
+                        with open(self.INDEX_PATH, 'r', encoding='utf-8') as index_file:
+                            index = json.load(index_file)
+                    except (OSError, ValueError):
+                        index = {}
+                index.update(changes)
+                temp_path: str = f'{self.INDEX_PATH}.{uuid.uuid4().hex}.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as index_file:
+                    json.dump(index, index_file)
+                os.replace(temp_path, self.INDEX_PATH)
+        except TimeoutError as error:
+            # the index only saves hashing, the next save merges these entries
+            self.logger.warning(f'{error}, index not saved this time.')
+            return
+        with self._lock:
+            self._index.update(index)
+            self._changed.difference_update(changes)
+
+
+    def known_digest(self, filepath: str, stat: os.stat_result) -> str:
+
+        # size + mtime pre-filter: a source that did not change is not hashed again
+        with self._lock:
+            entry: list = self._index.get(filepath)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+
+    def remember_digest(self, filepath: str, stat: os.stat_result, digest: str) -> None:
+
+        with self._lock:
+            self._index[filepath] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._changed.add(filepath)
+
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.STORE_DIRPATH, digest[:2], digest)
+
+
+    def materialize(self, source_filepath: str, destination_filepath: str, stat: os.stat_result = None, throttle=None) -> str:
+
+        stat = os.stat(source_filepath) if stat is None else stat
+        digest: str = self.known_digest(filepath=source_filepath, stat=stat)
+        deduplicated: bool = digest is not None and os.path.exists(self.blob_path(digest))
+        if not deduplicated:
+            # unknown sources are hashed while copied into the store, then renamed to their digest;
+            # concurrent writers of the same content only race on an atomic rename
+            os.makedirs(self.STORE_DIRPATH, exist_ok=True)
+            temp_path: str = temporary_path(os.path.join(self.STORE_DIRPATH, os.path.basename(source_filepath)))
+            try:
+                digest = copy_data(source_filepath, temp_path, hash_name=self.HASH_NAME, throttle=throttle)
+                self.remember_digest(filepath=source_filepath, stat=stat, digest=digest)
+                deduplicated = os.path.exists(self.blob_path(digest))
+                if not deduplicated:
+                    os.makedirs(os.path.dirname(self.blob_path(digest)), exist_ok=True)
+                    os.replace(temp_path, self.blob_path(digest))
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        blob_path: str = self.blob_path(digest)
+
+        # linked or copied under a temporary name then renamed: the destination is never missing, even after a crash
+        temp_path: str = temporary_path(destination_filepath)
+        try:
+            try:
+                os.link(blob_path, temp_path)
+            except OSError as error:
+                self.logger.warning(f'Hard link failed, copy instead: {blob_path} -> {destination_filepath} ({error})')
+                copy_data(blob_path, temp_path, hash_name=None)
+            os.replace(temp_path, destination_filepath)
+        finally:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+
+        with self._lock:
+            self.files_total += 1
+            self.bytes_total += stat.st_size
+            self._unique_sizes[digest] = stat.st_size
+            if deduplicated:
+                self.files_deduplicated += 1
+            else:
+                self.bytes_stored += stat.st_size
+        return digest
+
+
+    def unique_bytes(self) -> int:
+        return sum(self._unique_sizes.values())
+
+
+    def bytes_saved(self) -> int:
+        return self.bytes_total - self.unique_bytes()
+
+
+    def dedup_ratio(self) -> float:
+        unique_bytes: int = self.unique_bytes()
+        return self.bytes_total / unique_bytes if unique_bytes else 1.0
+
+
+    def report(self) -> None:
+
+        self.logger.info(f'Dedup store: {self.files_total} files, {self.files_deduplicated} already stored, '
+                         f'{self.bytes_total} bytes materialized, {self.bytes_stored} new bytes stored, '
+                         f'{self.bytes_saved()} bytes saved, ratio {self.dedup_ratio():.2f}')
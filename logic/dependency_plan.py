@@ -0,0 +1,35 @@
+import os
+
+
+class DependencyPlan:
+
+
+    def __init__(self, kind: str, source_value: str, style: str = 'absolute'):
+
+        self.kind: str = kind # texture, rib or cache
+        self.source_value: str = source_value # attribute value in the publish
+        self.style: str = style # absolute, workspace or workspace_posix: how the rewritten value is written
+        self.valid: bool = True # False when the attribute must be left untouched
+        self.value_relative_path: str = '' # rewritten value, relative to the archive root directory of the node
+        self.directories: list = [] # directories to create, relative to the archive root directory
+        self.copies: list = [] # (source filepath, destination dirpath relative to the archive root directory)
+        self.missing: list = [] # source files the attribute points to that do not exist
+        self.frames_skipped: list = [] # frames of the sequence left out of the frame range
+
+
+    def add_copy(self, source_filepath: str, relative_dirpath: str) -> None:
+
+        if relative_dirpath not in self.directories:
+            self.directories.append(relative_dirpath)
+        self.copies.append((source_filepath, relative_dirpath))
+
+
+    def value_for(self, root_dirpath: str, current_project: str, workspace_token: str) -> str:
+
+        value: str = os.path.join(root_dirpath, self.value_relative_path)
+        if self.style == 'absolute':
+            return value
+        value = value.replace(current_project, workspace_token)
+        if self.style == 'workspace_posix':
+            value = value.replace('\\', '/')
+        return value
@@ -0,0 +1,92 @@
+import bisect
+import os
+import threading
+
+
+class DirectoryListing:
+
+
+    def __init__(self, dirpath: str):
+
+        self.dirpath: str = dirpath
+        # keyed by os.path.normcase(name): lookups are case-insensitive on Windows shares like os.path.exists, exact on Linux
+        self.stats: dict = {} # normcased filename -> os.stat_result, regular files only
+        self.real_names: dict = {} # normcased filename -> filename as it is on disk
+        self.names: list = [] # sorted normcased filenames
+
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_file():
+                            continue
+                        key: str = os.path.normcase(entry.name)
+                        self.stats[key] = entry.stat()
+                        self.real_names[key] = entry.name
+                    except OSError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        self.names = sorted(self.stats)
+
+
+    def starting_with(self, prefix: str) -> list:
+
+        # real filenames, so that copies keep the case of the files on disk
+        prefix = os.path.normcase(prefix)
+        start: int = bisect.bisect_left(self.names, prefix)
+        names: list = []
+        for name in self.names[start:]:
+            if not name.startswith(prefix):
+                break
+            names.append(self.real_names[name])
+        return names
+
+
+    def contains(self, filename: str) -> bool:
+        return os.path.normcase(filename) in self.stats
+
+
+    def stat(self, filename: str) -> os.stat_result:
+        return self.stats.get(os.path.normcase(filename))
+
+
+class DirectoryIndex:
+
+
+    def __init__(self):
+
+        self._listings: dict = {}
+        self._lock: threading.Lock = threading.Lock()
+
+
+    def listing(self, dirpath: str) -> DirectoryListing:
+
+        key: str = os.path.normcase(os.path.normpath(dirpath))
+        with self._lock:
+            listing: DirectoryListing = self._listings.get(key)
+            if listing is None:
+                listing = DirectoryListing(dirpath=dirpath)
+                self._listings[key] = listing
+        return listing
+
+
+    def find_files_starting_with(self, dirpath: str, prefix: str) -> list:
+        return [os.path.join(dirpath, filename) for filename in self.listing(dirpath).starting_with(prefix)]
+
+
+    def exists(self, filepath: str) -> bool:
+        return self.listing(os.path.dirname(filepath)).contains(os.path.basename(filepath))
+
+
+    def stat(self, filepath: str) -> os.stat_result:
+        return self.listing(os.path.dirname(filepath)).stat(os.path.basename(filepath))
+
+
+    def invalidate(self, dirpath: str = None) -> None:
+
+        with self._lock:
+            if dirpath is None:
+                self._listings = {}
+                return
+            self._listings.pop(os.path.normcase(os.path.normpath(dirpath)), None)
@@ -0,0 +1,155 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+BUFFER_SIZE: int = 8 * 1024 * 1024
+KERNEL_COPY_ERRNOS: tuple = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.EPERM)
+LINK_ERRNOS: tuple = KERNEL_COPY_ERRNOS + (errno.ENOTTY, errno.EACCES, errno.EMLINK)
+LINK_METHODS: tuple = ('copy', 'reflink', 'hardlink')
+FICLONE: int = 0x40049409 # linux ioctl, btrfs / xfs / ocfs2 clone of a whole file
+
+_buffers: threading.local = threading.local()
+
+
+def get_buffer(buffer_size: int = BUFFER_SIZE) -> bytearray:
+
+    # one reusable buffer per copy thread
+    buffer: bytearray = getattr(_buffers, 'buffer', None)
+    if buffer is None or len(buffer) != buffer_size:
+        buffer = bytearray(buffer_size)
+        _buffers.buffer = buffer
+    return buffer
+
+
+def temporary_path(destination_filepath: str) -> str:
+
+    dirpath, filename = os.path.split(destination_filepath)
+    return os.path.join(dirpath, f'.{filename}.{uuid.uuid4().hex[:8]}.part')
+
+
+def kernel_copy(source_fd: int, destination_fd: int, size: int, throttle=None) -> bool:
+
+    # copy_file_range / sendfile keep the data in the kernel, or on the server for network shares that support it
+    # only unhashed copies take this path (the publish scene copy): dependency copies are hashed for the manifest, and Windows has neither call
+    for copy_function in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if copy_function is None:
+            continue
+        offset: int = 0
+        try:
+            while offset < size:
+                if copy_function is os.sendfile:
+                    copied: int = os.sendfile(destination_fd, source_fd, offset, min(size - offset, BUFFER_SIZE * 8))
+                else:
+                    copied: int = os.copy_file_range(source_fd, destination_fd, min(size - offset, BUFFER_SIZE * 8), offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+                if throttle is not None:
+                    throttle(copied)
+            if offset == size:
+                return True
+            # a source truncated while copied: a short file must never be renamed into place
+            if offset:
+                raise OSError(errno.EIO, f'Kernel copy stopped at {offset} of {size} bytes.')
+        except OSError as error:
+            if offset or error.errno not in KERNEL_COPY_ERRNOS:
+                raise
+    return False
+
+
+def copy_data(source_filepath: str, destination_filepath: str, hash_name: str = 'sha256', buffer_size: int = BUFFER_SIZE, throttle=None) -> str:
+
+    # single pass: the digest is computed from the buffer that is written, so the source is read once
+    stat: os.stat_result = os.stat(source_filepath)
+    digest: str = None
+    with open(source_filepath, 'rb') as source_file, open(destination_filepath, 'wb') as destination_file:
+        if hash_name is None and kernel_copy(source_file.fileno(), destination_file.fileno(), stat.st_size, throttle=throttle):
+            digest = None
+        else:
+            file_hash = hashlib.new(hash_name) if hash_name else None
+            buffer: bytearray = get_buffer(buffer_size)
+            view: memoryview = memoryview(buffer)
+            while True:
+                size: int = source_file.readinto(buffer)
+                if not size:
+                    break
+                if file_hash is not None:
+                    file_hash.update(view[:size])
+                destination_file.write(view[:size])
+                # throttle(size) blocks while the bandwidth of the share is used up
+                if throttle is not None:
+                    throttle(size)
+            digest = file_hash.hexdigest() if file_hash is not None else None
+
+    shutil.copymode(source_filepath, destination_filepath)
+    os.utime(destination_filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return digest
+
+
+def copy_file(source_filepath: str, destination_filepath: str, hash_name: str = 'sha256', buffer_size: int = BUFFER_SIZE, throttle=None) -> str:
+    return place_file(source_filepath, destination_filepath, method='copy', hash_name=hash_name, buffer_size=buffer_size, throttle=throttle)[1]
+
+
+def place_file(source_filepath: str, destination_filepath: str, method: str = 'copy', same_device: bool = True, hash_name: str = 'sha256',
+               buffer_size: int = BUFFER_SIZE, throttle=None) -> tuple:
+
+    # (method used, digest): hardlink falls back to reflink, reflink to a real copy, links have no digest since no byte is read
+    # written under a temporary name then renamed: a crash never leaves a half written file under the final name
+    if method not in LINK_METHODS:
+        raise ValueError(f'Unknown link method {method}, use one of {LINK_METHODS}.')
+    temp_filepath: str = temporary_path(destination_filepath)
+    try:
+        if method == 'hardlink' and same_device and hard_link(source_filepath, temp_filepath):
+            used: str = 'hardlink'
+            digest: str = None
+        elif method in ('hardlink', 'reflink') and same_device and reflink_data(source_filepath, temp_filepath):
+            used: str = 'reflink'
+            digest: str = None
+        else:
+            used: str = 'copy'
+            digest: str = copy_data(source_filepath, temp_filepath, hash_name=hash_name, buffer_size=buffer_size, throttle=throttle)
+        os.replace(temp_filepath, destination_filepath)
+    finally:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+    return used, digest
+
+
+def hard_link(source_filepath: str, destination_filepath: str) -> bool:
+
+    # the archive shares the inode of the publish: a publish overwritten in place changes the archived file too
+    try:
+        os.link(source_filepath, destination_filepath)
+    except OSError as error:
+        if error.errno not in LINK_ERRNOS:
+            raise
+        return False
+    return True
+
+
+def reflink_data(source_filepath: str, destination_filepath: str) -> bool:
+
+    # copy on write clone: no data moves, the blocks are shared until one side is modified
+    if fcntl is None:
+        return False
+    stat: os.stat_result = os.stat(source_filepath)
+    try:
+        with open(source_filepath, 'rb') as source_file, open(destination_filepath, 'wb') as destination_file:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    except OSError as error:
+        if error.errno not in LINK_ERRNOS:
+            raise
+        if os.path.exists(destination_filepath):
+            os.remove(destination_filepath)
+        return False
+    shutil.copymode(source_filepath, destination_filepath)
+    os.utime(destination_filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return True
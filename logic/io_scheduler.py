@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from .logger import Logger
+
+
+class IOProfile:
+
+
+    def __init__(self, name: str, start_hour: int, end_hour: int, bytes_per_second: float = 0, max_per_share: int = 8):
+
+        self.name: str = name
+        self.start_hour: int = start_hour # example : 8, included
+        self.end_hour: int = end_hour # example : 20, excluded, a profile with end_hour <= start_hour runs over midnight
+        self.bytes_per_second: float = bytes_per_second # per host, 0 for no limit
+        self.max_per_share: int = max(1, max_per_share)
+
+
+    def is_active(self, hour: int) -> bool:
+
+        if self.start_hour < self.end_hour:
+            return self.start_hour <= hour < self.end_hour
+        return hour >= self.start_hour or hour < self.end_hour
+
+
+    def __repr__(self) -> str:
+        return f'IOProfile({self.name} {self.start_hour}h-{self.end_hour}h, {self.bytes_per_second / 1024 / 1024:.0f} MB/s, {self.max_per_share} per share)'
+
+
+# renders and workstation saves share GANDALF during the day, the archive gets the server at night
+DEFAULT_PROFILES: list = [
+    IOProfile(name='day', start_hour=8, end_hour=20, bytes_per_second=40 * 1024 * 1024, max_per_share=2),
+    IOProfile(name='night', start_hour=20, end_hour=8, bytes_per_second=0, max_per_share=8)
+]
+UNLIMITED_PROFILE: IOProfile = IOProfile(name='unlimited', start_hour=0, end_hour=24, bytes_per_second=0, max_per_share=64)
+
+
+def split_profiles(profiles: list, parts: int) -> list:
+
+    # the limits of a profile hold per process: N batch workers on one share each get 1/N of the bandwidth and of the streams
+    # example : day 40 MB/s, 2 per share over 2 workers -> 20 MB/s, 1 per share each, a worker keeps at least one stream
+    parts = max(1, parts)
+    return [IOProfile(name=profile.name, start_hour=profile.start_hour, end_hour=profile.end_hour, bytes_per_second=profile.bytes_per_second / parts,
+                      max_per_share=max(1, profile.max_per_share // parts)) for profile in profiles]
+
+
+def volume_of(path: str) -> tuple:
+
+    # (host, share) of a UNC path, (drive, '') or (top directory, '') otherwise
+    normalized: str = path.replace('/', '\\') if path.startswith(('\\\\', '//')) else path
+    if normalized.startswith('\\\\'):
+        parts: list = normalized[2:].split('\\')
+        return (parts[0].lower(), parts[1].lower() if len(parts) > 1 else '')
+    drive: str = os.path.splitdrive(path)[0]
+    if drive:
+        return (drive.lower(), '')
+    parts: list = os.path.abspath(path).split(os.sep)
+    return (parts[1] if len(parts) > 1 else os.sep, '')
+
+
+class TokenBucket:
+
+
+    def __init__(self, rate: float = 0):
+
+        self._lock: threading.Lock = threading.Lock()
+        self.rate: float = rate # bytes per second, 0 for no limit
+        self._tokens: float = rate
+        self._last: float = time.monotonic()
+
+
+    def set_rate(self, rate: float) -> None:
+
+        with self._lock:
+            self.rate = rate
+            self._tokens = min(self._tokens, rate)
+
+
+    def consume(self, size: int) -> float:
+
+        # the bucket may go in debt for a chunk larger than one second of tokens, the caller then waits the debt out
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            now: float = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= size
+            wait: float = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class ShareLimiter:
+
+
+    def __init__(self, volume: tuple, limit: int, target_latency: float):
+
+        self.volume: tuple = volume
+        self.TARGET_LATENCY: float = target_latency
+        self.max_limit: int = limit
+        self.limit: float = float(limit) # lowered when the share gets slow, raised back while it answers quickly
+        self.active: int = 0
+        self.latency: float = 0.0 # moving average of the metadata round trip, seconds
+        self._condition: threading.Condition = threading.Condition()
+        self._last_decrease: float = 0.0
+
+
+    def acquire(self) -> None:
+
+        with self._condition:
+            while self.active >= max(1, int(self.limit)):
+                self._condition.wait()
+            self.active += 1
+
+
+    def release(self) -> None:
+
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+
+    def set_max_limit(self, limit: int) -> None:
+
+        with self._condition:
+            self.max_limit = limit
+            self.limit = min(self.limit, limit)
+            self._condition.notify_all()
+
+
+    def observe(self, latency: float) -> None:
+
+        # additive increase, multiplicative decrease, at most one decrease per second
+        with self._condition:
+            self.latency = latency if not self.latency else 0.8 * self.latency + 0.2 * latency
+            now: float = time.monotonic()
+            if self.latency > self.TARGET_LATENCY * 2 and now - self._last_decrease >= 1.0:
+                self.limit = max(1.0, self.limit / 2)
+                self._last_decrease = now
+            elif self.latency < self.TARGET_LATENCY:
+                self.limit = min(float(self.max_limit), self.limit + 1 / max(1.0, self.limit))
+            self._condition.notify_all()
+
+
+class Transfer:
+
+
+    def __init__(self, buckets: list):
+
+        self.buckets: list = buckets
+        self.stat: os.stat_result = None # stat of the source, timed as the latency sample of its share
+        self.throttled: float = 0.0
+
+
+    def throttle(self, size: int) -> None:
+
+        for bucket in self.buckets:
+            self.throttled += bucket.consume(size)
+
+
+class IOScheduler:
+
+
+    def __init__(self, logger: Logger, profiles: list = None, target_latency: float = 0.05, profile_check_interval: float = 60):
+
+        self.logger: Logger = logger
+        self.PROFILES: list = list(profiles) if profiles is not None else list(DEFAULT_PROFILES)
+        self.TARGET_LATENCY: float = target_latency
+        self.PROFILE_CHECK_INTERVAL: float = profile_check_interval
+
+        self._lock: threading.Lock = threading.Lock()
+        self.limiters: dict = {} # (host, share) -> ShareLimiter
+        self.buckets: dict = {} # host -> TokenBucket, reads and writes on one server share its bandwidth
+        self.profile: IOProfile = None
+        self._profile_checked: float = 0.0
+
+
+    def active_profile(self, hour: int = None) -> IOProfile:
+
+        hour = time.localtime().tm_hour if hour is None else hour
+        for profile in self.PROFILES:
+            if profile.is_active(hour):
+                return profile
+        return UNLIMITED_PROFILE
+
+
+    def refresh_profile(self) -> IOProfile:
+
+        now: float = time.monotonic()
+        with self._lock:
+            if self.profile is not None and now - self._profile_checked < self.PROFILE_CHECK_INTERVAL:
+                return self.profile
+            self._profile_checked = now
+            profile: IOProfile = self.active_profile()
+            if profile is self.profile:
+                return profile
+            self.profile = profile
+            limiters: list = list(self.limiters.values())
+            buckets: list = list(self.buckets.values())
+        for limiter in limiters:
+            limiter.set_max_limit(profile.max_per_share)
+        for bucket in buckets:
+            bucket.set_rate(profile.bytes_per_second)
+        self.logger.info(f'I/O profile: {profile}')
+        return profile
+
+
+    def limiter(self, volume: tuple) -> ShareLimiter:
+
+        with self._lock:
+            limiter: ShareLimiter = self.limiters.get(volume)
+            if limiter is None:
+                limiter = ShareLimiter(volume=volume, limit=self.profile.max_per_share, target_latency=self.TARGET_LATENCY)
+                self.limiters[volume] = limiter
+            return limiter
+
+
+    def bucket(self, host: str) -> TokenBucket:
+
+        with self._lock:
+            bucket: TokenBucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(rate=self.profile.bytes_per_second)
+                self.buckets[host] = bucket
+            return bucket
+
+
+    @contextmanager
+    def transfer(self, source_filepath: str, destination_filepath: str):
+
+        self.refresh_profile()
+        volumes: list = sorted({volume_of(source_filepath), volume_of(destination_filepath)})
+        # shares are always taken in the same order, two transfers in opposite directions cannot hold one each
+        limiters: list = [self.limiter(volume) for volume in volumes]
+        transfer: Transfer = Transfer(buckets=[self.bucket(host) for host in sorted({volume[0] for volume in volumes})])
+        acquired: list = []
+        try:
+            for limiter in limiters:
+                limiter.acquire()
+                acquired.append(limiter)
+            start: float = time.perf_counter()
+            transfer.stat = os.stat(source_filepath)
+            self.limiter(volume_of(source_filepath)).observe(time.perf_counter() - start)
+            yield transfer
+        finally:
+            for limiter in reversed(acquired):
+                limiter.release()
+            if transfer.throttled:
+                self.logger.count('seconds_throttled', transfer.throttled)
+
+
+    def report(self) -> list:
+
+        lines: list = [f'I/O profile: {self.profile}']
+        with self._lock:
+            limiters: list = list(self.limiters.values())
+        for limiter in limiters:
+            lines.append(f"  share {'/'.join(part for part in limiter.volume if part)}: concurrency {limiter.limit:.1f}/{limiter.max_limit}, latency {limiter.latency * 1000:.1f} ms")
+        return lines
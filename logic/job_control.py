@@ -0,0 +1,138 @@
+import threading
+import time
+
+
+class ArchiveCancelled(Exception):
+    pass
+
+
+class JobControl:
+
+
+    def __init__(self):
+
+        self._lock: threading.Lock = threading.Lock()
+        self._running: threading.Event = threading.Event() # cleared while paused
+        self._running.set()
+        self._cancelled: threading.Event = threading.Event()
+
+        self.state: str = 'running' # running, paused, cancelling, then done, cancelled, refused or failed
+        self.error: str = ''
+        self.asset: str = ''
+        self.assets_total: int = 0
+        self.assets_done: int = 0
+        self.files_total: int = 0
+        self.files_done: int = 0
+        self.files_failed: int = 0
+        self.bytes_total: int = 0
+        self.bytes_done: int = 0
+        self.started: float = time.monotonic()
+        self.paused_seconds: float = 0.0 # paused time is left out of the throughput
+        self._paused_at: float = None
+
+
+    def pause(self) -> None:
+
+        with self._lock:
+            if self.state != 'running':
+                return
+            self.state = 'paused'
+            self._paused_at = time.monotonic()
+            self._running.clear()
+
+
+    def resume(self) -> None:
+
+        with self._lock:
+            if self.state != 'paused':
+                return
+            self.state = 'running'
+            self.paused_seconds += time.monotonic() - self._paused_at
+            self._paused_at = None
+            self._running.set()
+
+
+    def cancel(self) -> None:
+
+        with self._lock:
+            if self.state not in ('running', 'paused'):
+                return
+            if self._paused_at is not None:
+                self.paused_seconds += time.monotonic() - self._paused_at
+                self._paused_at = None
+            self.state = 'cancelling'
+            self._cancelled.set()
+            self._running.set()
+
+
+    def checkpoint(self) -> None:
+
+        # called between two files and two assets: waits while paused, stops there when cancelled
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise ArchiveCancelled()
+
+
+    def finish(self, state: str, error: str = '') -> None:
+
+        with self._lock:
+            self.state = state
+            self.error = error
+            self._running.set()
+
+
+    def set_totals(self, assets: int, files: int, size: int) -> None:
+
+        with self._lock:
+            self.assets_total = assets
+            self.files_total = files
+            self.bytes_total = size
+
+
+    def start_asset(self, asset_name: str) -> None:
+
+        with self._lock:
+            self.asset = asset_name
+
+
+    def finish_asset(self) -> None:
+
+        with self._lock:
+            self.assets_done += 1
+
+
+    def file_done(self, size: int) -> None:
+
+        with self._lock:
+            self.files_done += 1
+            self.bytes_done += size
+
+
+    def file_failed(self) -> None:
+
+        with self._lock:
+            self.files_failed += 1
+
+
+    def progress(self) -> dict:
+
+        with self._lock:
+            now: float = time.monotonic()
+            paused: float = self.paused_seconds + (now - self._paused_at if self._paused_at is not None else 0.0)
+            active: float = max(0.0, now - self.started - paused)
+            throughput: float = self.bytes_done / active if active else 0.0
+            remaining: int = max(0, self.bytes_total - self.bytes_done)
+            return {'state': self.state, 'error': self.error, 'asset': self.asset, 'assets_done': self.assets_done, 'assets_total': self.assets_total,
+                    'files_done': self.files_done, 'files_failed': self.files_failed, 'files_total': self.files_total,
+                    'bytes_done': self.bytes_done, 'bytes_total': self.bytes_total, 'elapsed': now - self.started, 'throughput': throughput,
+                    'eta': remaining / throughput if throughput else None}
+
+
+def format_progress(progress: dict) -> str:
+
+    # example : running eglise 3/10 assets, 1200/5000 files, 1.20/4.50 GB, 85.3 MB/s, ETA 0:12:31
+    eta: float = progress.get('eta')
+    eta_text: str = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta is not None else '--:--:--'
+    return (f"{progress['state']} {progress['asset']} {progress['assets_done']}/{progress['assets_total']} assets, "
+            f"{progress['files_done']}/{progress['files_total']} files, {progress['bytes_done'] / 1024 ** 3:.2f}/{progress['bytes_total'] / 1024 ** 3:.2f} GB, "
+            f"{progress['throughput'] / 1024 / 1024:.1f} MB/s, ETA {eta_text}")
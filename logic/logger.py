@@ -1,5 +1,50 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import time
+from .metrics import Metrics
+
+
+# logger name -> QueueListener, shared by every Logger using the same name
+_QUEUE_LISTENERS = {}
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+
+    # the record is formatted by the listener thread, not by the caller
+    def prepare(self, record):
+        return record
+
+
+class BufferedFileHandler(logging.FileHandler):
+
+
+    def __init__(self, filename, buffer_size=64 * 1024, flush_interval=1.0, flush_level=logging.ERROR):
+        self.BUFFER_SIZE = buffer_size
+        self.FLUSH_INTERVAL = flush_interval
+        self.FLUSH_LEVEL = flush_level
+        self._last_flush = time.monotonic()
+        super().__init__(filename, encoding='utf-8')
+
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, encoding=self.encoding, buffering=self.BUFFER_SIZE)
+
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(f'{self.format(record)}{self.terminator}')
+            now = time.monotonic()
+            if record.levelno >= self.FLUSH_LEVEL or now - self._last_flush >= self.FLUSH_INTERVAL:
+                self.flush()
+                self._last_flush = now
+        except Exception:
+            self.handleError(record)
 
 
 class Logger:
@@ -11,7 +56,8 @@ class Logger:
         file_format_default = "[%(asctime)s][%(name)s][%(levelname)s] %(message)s",
         level_default = logging.DEBUG,
         level_write_default = logging.INFO,
-        propagate_default = False
+        propagate_default = False,
+        queue_mode = False
     ):
         
         self.LOGGER_NAME = logger_name
@@ -23,6 +69,9 @@ class Logger:
 
         self._logger = None
         self.init_logger()
+        self.metrics = Metrics()
+        if queue_mode:
+            self.enable_queue()
 
 
     def init_logger(self):
@@ -56,15 +105,15 @@ class Logger:
 
 
     def info(self, msg, *args, **kwargs):
-        self._logger.info(f'{msg}', *args, **kwargs)
+        self._logger.info(msg, *args, **kwargs)
 
 
     def warning(self, msg, *args, **kwargs):
-        self._logger.warning(f'{msg}', *args, **kwargs)
+        self._logger.warning(msg, *args, **kwargs)
 
 
     def error(self, msg, *args, **kwargs):
-        self._logger.error(f'{msg}', *args, **kwargs)
+        self._logger.error(msg, *args, **kwargs)
 
 
     def critical(self, msg, *args, **kwargs):
@@ -79,13 +128,128 @@ class Logger:
         self._logger.exception(msg, *args, **kwargs)
 
 
+    def handlers(self):
+        listener = _QUEUE_LISTENERS.get(self.LOGGER_NAME)
+        if listener is not None:
+            return list(listener.handlers)
+        return list(self._logger.handlers)
+
+
+    def add_handler(self, handler):
+        listener = _QUEUE_LISTENERS.get(self.LOGGER_NAME)
+        if listener is not None:
+            listener.handlers = listener.handlers + (handler,)
+        else:
+            self._logger.addHandler(handler)
+
+
+    def remove_handler(self, handler):
+        listener = _QUEUE_LISTENERS.get(self.LOGGER_NAME)
+        if listener is not None:
+            listener.handlers = tuple(listener_handler for listener_handler in listener.handlers if listener_handler is not handler)
+        else:
+            self._logger.removeHandler(handler)
+        handler.close()
+
+
     def write_to_file(self, path, level=None):
         if level is None:
             level = self.LEVEL_WRITE_DEFAULT
-        file_handler = logging.FileHandler(path)
+
+        # one handler per file, however many Logger instances share the logger name
+        path = os.path.abspath(path)
+        file_handlers = [handler for handler in self.handlers() if isinstance(handler, logging.FileHandler)]
+        for handler in file_handlers:
+            if handler.baseFilename == path:
+                handler.setLevel(min(handler.level, level))
+                return
+
+        # one file per logger name: a new archive root replaces the log of the previous archive, once its queued records are written
+        if file_handlers:
+            self.flush()
+        for handler in file_handlers:
+            self.remove_handler(handler)
+
+        file_handler = BufferedFileHandler(path) if self.queue_enabled() else logging.FileHandler(path)
         file_handler.setLevel(level)
 
         formatter = logging.Formatter(self.FILE_FORMAT_DEFAULT)
         file_handler.setFormatter(formatter)
 
-        self._logger.addHandler(file_handler)
+        self.add_handler(file_handler)
+
+
+    def queue_enabled(self):
+        return self.LOGGER_NAME in _QUEUE_LISTENERS
+
+
+    def enable_queue(self):
+        if self.queue_enabled():
+            return
+
+        # the handlers move behind a queue: formatting and file writes happen on the listener thread
+        handlers = list(self._logger.handlers)
+        for handler in handlers:
+            self._logger.removeHandler(handler)
+        for index, handler in enumerate(handlers):
+            if type(handler) is logging.FileHandler:
+                buffered_handler = BufferedFileHandler(handler.baseFilename)
+                buffered_handler.setLevel(handler.level)
+                buffered_handler.setFormatter(handler.formatter)
+                handler.close()
+                handlers[index] = buffered_handler
+
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self._logger.addHandler(DeferredQueueHandler(log_queue))
+        _QUEUE_LISTENERS[self.LOGGER_NAME] = listener
+        listener.start()
+        atexit.register(self.disable_queue)
+
+
+    def flush(self):
+        listener = _QUEUE_LISTENERS.get(self.LOGGER_NAME)
+        if listener is not None:
+            # waits for the queued records, then restarts the listener thread
+            listener.stop()
+            listener.start()
+        for handler in self.handlers():
+            handler.flush()
+        self.metrics.flush()
+
+
+    def close(self):
+        # end of an archive: the events file is released, the summaries stay available
+        self.flush()
+        self.metrics.close()
+
+
+    def disable_queue(self):
+        listener = _QUEUE_LISTENERS.pop(self.LOGGER_NAME, None)
+        if listener is None:
+            return
+        listener.stop()
+        for handler in list(self._logger.handlers):
+            if isinstance(handler, DeferredQueueHandler):
+                self._logger.removeHandler(handler)
+        for handler in listener.handlers:
+            handler.flush()
+            self._logger.addHandler(handler)
+
+
+    def write_events_to_file(self, path):
+        self.metrics.write_events_to_file(path)
+
+
+    def span(self, kind, name='', **fields):
+        return self.metrics.span(kind, name, **fields)
+
+
+    def count(self, counter, value=1):
+        self.metrics.count(counter, value)
+
+
+    def log_summary(self, title, asset=None):
+        self.info(f'{title} -----------------------------------------------------------------------')
+        for line in self.metrics.summary(asset=asset):
+            self.info(line)
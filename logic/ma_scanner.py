@@ -0,0 +1,257 @@
+import os
+
+
+class SceneDependency:
+
+
+    def __init__(self, node: str, node_type: str, attribute: str, value: str):
+
+        self.node: str = node
+        self.node_type: str = node_type
+        self.attribute: str = attribute # long attribute name, as used by cmds.getAttr
+        self.value: str = value
+
+
+    def __repr__(self) -> str:
+        return f'SceneDependency({self.node}.{self.attribute} = {self.value!r})'
+
+
+class MaScanner:
+
+
+    def __init__(self, filepath: str):
+
+        self.filepath: str = filepath
+
+        # node type -> (long attribute name, names the attribute may be written with in a .ma file)
+        self.NODE_ATTRIBUTES: dict = {
+            'PxrTexture': ('filename', ('filename',)),
+            'PxrPtexture': ('filename', ('filename',)),
+            'PxrNormalMap': ('filename', ('filename',)),
+            'RenderManArchive': ('filename', ('filename',)),
+            'AlembicNode': ('abc_File', ('abc_File', 'fn')),
+            'file': ('fileTextureName', ('fileTextureName', 'ftn')),
+            'gpuCache': ('cacheFileName', ('cacheFileName', 'cfn')),
+            'xgmSplineCache': ('fileName', ('fileName', 'fn'))
+        }
+
+        self.dependencies: list = []
+        self.references: list = []
+        self.nodes: dict = {} # node name -> node type, for the node types above only
+        self.playback_range: tuple = None # playbackOptions -min -max of the sceneConfigurationScriptNode
+        self.render_globals: dict = {} # defaultRenderGlobals animation, startFrame, endFrame
+
+
+    def split_statements(self):
+
+        # yields every mel statement of the file, joined across lines, without its trailing ';'
+        statement: list = []
+        in_string: bool = False
+        escaped: bool = False
+        with open(self.filepath, 'r', encoding='utf-8', errors='replace') as ma_file:
+            for line in ma_file:
+                if not in_string and not statement and line.lstrip().startswith('//'):
+                    continue
+                for char in line:
+                    if in_string:
+                        statement.append(char)
+                        if escaped:
+                            escaped = False
+                        elif char == '\\':
+                            escaped = True
+                        elif char == '"':
+                            in_string = False
+                        continue
+                    if char == '"':
+                        in_string = True
+                        statement.append(char)
+                    elif char == ';':
+                        yield ''.join(statement).strip()
+                        statement = []
+                    else:
+                        statement.append(char)
+        if ''.join(statement).strip():
+            yield ''.join(statement).strip()
+
+
+    def tokenize(self, statement: str) -> list:
+
+        tokens: list = []
+        token: list = []
+        in_string: bool = False
+        quoted: bool = False
+        index: int = 0
+        while index < len(statement):
+            char = statement[index]
+            if in_string:
+                if char == '\\' and index + 1 < len(statement):
+                    index += 1
+                    token.append(statement[index])
+                elif char == '"':
+                    in_string = False
+                else:
+                    token.append(char)
+            elif char == '"':
+                in_string = True
+                quoted = True
+            elif char.isspace():
+                if token or quoted:
+                    tokens.append(''.join(token))
+                token = []
+                quoted = False
+            else:
+                token.append(char)
+            index += 1
+        if token or quoted:
+            tokens.append(''.join(token))
+        return tokens
+
+
+    def option_value(self, tokens: list, *flags: str) -> str:
+
+        for index, token in enumerate(tokens[:-1]):
+            if token in flags:
+                return tokens[index + 1]
+        return ''
+
+
+    def attribute_token(self, tokens: list) -> str:
+
+        # example : setAttr -l on ".ftn" -type "string" "...", flags and their values may come before the attribute
+        for token in tokens[1:]:
+            if token.startswith('.'):
+                return token.lstrip('.')
+        return ''
+
+
+    def scan(self) -> list:
+
+        self.dependencies = []
+        self.references = []
+        self.nodes = {}
+        self.playback_range = None
+        self.render_globals = {}
+
+        current_node: str = ''
+        current_type: str = ''
+        for statement in self.split_statements():
+            command: str = statement.split(None, 1)[0] if statement else ''
+
+            if command == 'createNode':
+                tokens: list = self.tokenize(statement)
+                current_type = tokens[1] if len(tokens) > 1 else ''
+                current_node = self.option_value(tokens, '-n', '-name')
+                if current_type in self.NODE_ATTRIBUTES:
+                    self.nodes[current_node] = current_type
+                continue
+
+            if command == 'select':
+                # "select -ne node" makes node the target of the following setAttr
+                tokens: list = self.tokenize(statement)
+                current_node = tokens[-1].lstrip(':') if '-ne' in tokens or '-noExpand' in tokens else ''
+                current_type = self.nodes.get(current_node, '')
+                continue
+
+            if command == 'setAttr' and current_node in ('sceneConfigurationScriptNode', 'defaultRenderGlobals'):
+                self.scan_frame_range(node=current_node, tokens=self.tokenize(statement))
+                continue
+
+            if command == 'setAttr' and current_type in self.NODE_ATTRIBUTES:
+                tokens: list = self.tokenize(statement)
+                attribute_name, attribute_names = self.NODE_ATTRIBUTES[current_type]
+                if len(tokens) < 3 or self.attribute_token(tokens) not in attribute_names:
+                    continue
+                if self.option_value(tokens, '-type', '-typ') != 'string':
+                    continue
+                self.dependencies.append(SceneDependency(node=current_node, node_type=current_type, attribute=attribute_name, value=tokens[-1]))
+                continue
+
+            if command == 'file':
+                tokens: list = self.tokenize(statement)
+                if '-r' in tokens or '-rdi' in tokens or '-reference' in tokens:
+                    reference_path: str = tokens[-1]
+                    if reference_path not in self.references:
+                        self.references.append(reference_path)
+                continue
+
+            if command in ('connectAttr', 'relationship', 'fileInfo'):
+                current_node = ''
+                current_type = ''
+
+        return self.dependencies
+
+
+    def scan_frame_range(self, node: str, tokens: list) -> None:
+
+        if len(tokens) < 3:
+            return
+        attribute: str = self.attribute_token(tokens)
+        if node == 'sceneConfigurationScriptNode':
+            # example : setAttr ".b" -type "string" "playbackOptions -min 1 -max 120 -ast 1 -aet 200 "
+            if attribute not in ('b', 'before'):
+                return
+            options: list = tokens[-1].split()
+            minimum: str = self.option_value(options, '-min', '-minTime')
+            maximum: str = self.option_value(options, '-max', '-maxTime')
+            try:
+                self.playback_range = (float(minimum), float(maximum))
+            except ValueError:
+                pass
+            return
+
+        names: dict = {'an': 'animation', 'animation': 'animation', 'fs': 'startFrame', 'startFrame': 'startFrame', 'ef': 'endFrame', 'endFrame': 'endFrame'}
+        if attribute not in names:
+            return
+        value: str = tokens[-1]
+        if names[attribute] == 'animation':
+            self.render_globals['animation'] = value in ('yes', 'true', '1', 'on')
+            return
+        try:
+            self.render_globals[names[attribute]] = float(value)
+        except ValueError:
+            pass
+
+
+    def frame_range(self) -> tuple:
+
+        # same rule as Archive.get_frame_range on the opened scene
+        if self.render_globals.get('animation') and 'startFrame' in self.render_globals and 'endFrame' in self.render_globals:
+            return (self.render_globals['startFrame'], self.render_globals['endFrame'])
+        return self.playback_range
+
+
+    def dependencies_of_type(self, *node_types: str) -> list:
+        return [dependency for dependency in self.dependencies if dependency.node_type in node_types]
+
+
+    def ordered_dependencies(self) -> list:
+
+        # same order as the node loops of Archive.archive_file
+        return self.dependencies_of_type('PxrTexture', 'PxrPtexture', 'PxrNormalMap') \
+            + self.dependencies_of_type('RenderManArchive') \
+            + self.dependencies_of_type('AlembicNode', 'gpuCache', 'xgmSplineCache') \
+            + self.dependencies_of_type('file')
+
+
+def scan_maya_ascii(filepath: str, follow_references: bool = True, _scanned: set = None) -> MaScanner:
+
+    if os.path.splitext(filepath)[1].lower() != '.ma':
+        raise ValueError(f'{filepath} is not a Maya ASCII file.')
+    scanner: MaScanner = MaScanner(filepath=filepath)
+    scanner.scan()
+    if not follow_references:
+        return scanner
+
+    # referenced nodes are part of the opened scene, so their dependencies are too
+    scanned: set = _scanned if _scanned is not None else {os.path.normcase(os.path.abspath(filepath))}
+    for reference_path in list(scanner.references):
+        reference_key: str = os.path.normcase(os.path.abspath(reference_path))
+        if reference_key in scanned or not os.path.isfile(reference_path):
+            continue
+        scanned.add(reference_key)
+        if os.path.splitext(reference_path)[1].lower() != '.ma':
+            continue
+        reference_scanner: MaScanner = scan_maya_ascii(filepath=reference_path, follow_references=True, _scanned=scanned)
+        scanner.dependencies.extend(reference_scanner.dependencies)
+        scanner.references.extend(path for path in reference_scanner.references if path not in scanner.references)
+    return scanner
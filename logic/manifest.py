@@ -0,0 +1,155 @@
+import glob
+import json
+import os
+import threading
+import time
+from .logger import Logger
+
+
+class Manifest:
+
+
+    def __init__(self, manifest_path: str, logger: Logger, shard: str = None):
+
+        self.MANIFEST_PATH: str = manifest_path # example : \\GANDALF\3d4_23_24\ARCHIVAGE\COUP-DE-SOLEIL\2_ASSETS\A_CHARAS\archive_manifest.jsonl
+        # a batch worker appends to its own shard, the scheduler merges the shards into MANIFEST_PATH once the workers are done
+        self.WRITE_PATH: str = shard_path(manifest_path, shard) if shard else manifest_path
+        self.logger: Logger = logger
+
+        self._lock: threading.Lock = threading.Lock()
+        self._file = None
+        self.copies: dict = {} # destination filepath -> copy record
+        self.attributes: dict = {} # scene filepath -> {node.attribute: value}
+        self.assets: dict = {} # publish filepath -> asset record
+        self.load()
+
+
+    def load(self) -> None:
+
+        # the shard of a worker killed before the merge is read back as well
+        paths: list = [path for path in dict.fromkeys((self.MANIFEST_PATH, self.WRITE_PATH)) if os.path.exists(path)]
+        if not paths:
+            return
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as manifest_file:
+                for line in manifest_file:
+                    try:
+                        record: dict = json.loads(line)
+                    except ValueError:
+                        # an interrupted run can leave a truncated last line
+                        continue
+                    self.apply(record)
+        self.logger.info(f'Manifest loaded: {len(self.copies)} files, {len(self.assets)} assets.')
+
+
+    def apply(self, record: dict) -> None:
+
+        record_type: str = record.get('type')
+        if record_type == 'copy':
+            self.copies[record['destination']] = record
+        elif record_type == 'attribute':
+            self.attributes.setdefault(record['scene'], {})[f"{record['node']}.{record['attribute']}"] = record['value']
+        elif record_type == 'asset':
+            self.assets[record['source']] = record
+
+
+    def write(self, record: dict) -> None:
+
+        record['time'] = time.time()
+        line: str = json.dumps(record)
+        with self._lock:
+            self.apply(record)
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.WRITE_PATH) or '.', exist_ok=True)
+                self._file = open(self.WRITE_PATH, 'a', encoding='utf-8')
+                # resuming after a torn last line: the new records start on a line of their own
+                if self._file.tell() and not ends_with_newline(self.WRITE_PATH):
+                    self._file.write('\n')
+            self._file.write(f'{line}\n')
+            self._file.flush()
+
+
+    def close(self) -> None:
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+    def record_copy(self, source_filepath: str, destination_filepath: str, size: int, mtime_ns: int, digest: str = None, method: str = 'copy') -> None:
+        self.write({'type': 'copy', 'source': source_filepath, 'destination': destination_filepath, 'size': size, 'mtime_ns': mtime_ns, 'hash': digest, 'method': method})
+
+
+    def record_attribute(self, scene_filepath: str, node: str, attribute: str, value: str) -> None:
+        self.write({'type': 'attribute', 'scene': scene_filepath, 'node': node, 'attribute': attribute, 'value': value})
+
+
+    def record_asset(self, source_filepath: str, stat: os.stat_result = None) -> None:
+
+        if stat is None:
+            stat = os.stat(source_filepath)
+        self.write({'type': 'asset', 'source': source_filepath, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+
+
+    def needs_copy(self, source_filepath: str, destination_filepath: str, stat: os.stat_result = None) -> bool:
+
+        # new, changed or incomplete: no record, source changed since the copy, or destination missing or truncated
+        record: dict = self.copies.get(destination_filepath)
+        if record is None or record['source'] != source_filepath:
+            return True
+        if stat is None:
+            try:
+                stat = os.stat(source_filepath)
+            except OSError:
+                return True
+        if record['size'] != stat.st_size or record['mtime_ns'] != stat.st_mtime_ns:
+            return True
+        try:
+            return os.path.getsize(destination_filepath) != record['size']
+        except OSError:
+            return True
+
+
+    def asset_done(self, source_filepath: str) -> bool:
+
+        record: dict = self.assets.get(source_filepath)
+        if record is None:
+            return False
+        try:
+            stat: os.stat_result = os.stat(source_filepath)
+        except OSError:
+            return False
+        return record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns
+
+
+def ends_with_newline(path: str) -> bool:
+
+    with open(path, 'rb') as manifest_file:
+        manifest_file.seek(-1, os.SEEK_END)
+        return manifest_file.read(1) == b'\n'
+
+
+def shard_path(path: str, shard: str) -> str:
+
+    # example : archive_manifest.jsonl, worker0 -> archive_manifest.worker0.jsonl
+    root, extension = os.path.splitext(path)
+    return f'{root}.{shard}{extension}'
+
+
+def merge_shards(path: str) -> int:
+
+    # appends every shard of path to it and removes them, only once no worker writes to them anymore
+    root, extension = os.path.splitext(path)
+    shard_paths: list = sorted(glob.glob(f'{glob.escape(root)}.*{glob.escape(extension)}'))
+    for shard in shard_paths:
+        with open(shard, 'rb') as shard_file:
+            data: bytes = shard_file.read()
+        if data:
+            # a worker killed mid line: the truncated line stays on its own and is skipped on load
+            if not data.endswith(b'\n'):
+                data += b'\n'
+            with open(path, 'ab') as merged_file:
+                merged_file.write(data)
+        os.remove(shard)
+    return len(shard_paths)
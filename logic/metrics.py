@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class Metrics:
+
+
+    def __init__(self):
+
+        self._lock: threading.Lock = threading.Lock()
+        self._events_file = None
+        self._events_path: str = None
+        self._last_flush: float = time.monotonic()
+        self.FLUSH_INTERVAL: float = 1.0 # events are buffered, not written to the share one line at a time
+        self.asset: str = ''
+        # (asset, kind, name) -> [seconds, spans, bytes], copies are totalled per source directory: a long archive keeps a few entries per asset, not one per file
+        self.spans: dict = defaultdict(lambda: [0.0, 0, 0])
+        self.counters: dict = defaultdict(Counter) # asset -> counter name -> value
+
+
+    def write_events_to_file(self, path: str) -> None:
+
+        with self._lock:
+            if self._events_file is not None:
+                if self._events_file.name == path:
+                    return
+                self._events_file.close()
+            self._events_path = path
+            self._events_file = open(path, 'a', encoding='utf-8', buffering=64 * 1024)
+
+
+    def close(self) -> None:
+
+        with self._lock:
+            if self._events_file is not None:
+                self._events_file.close()
+                self._events_file = None
+
+
+    def event(self, event_type: str, **fields) -> None:
+
+        if self._events_path is None:
+            return
+        fields.update({'time': time.time(), 'event': event_type, 'asset': fields.get('asset', self.asset)})
+        line: str = json.dumps(fields, default=str)
+        with self._lock:
+            # closed at the end of an archive, opened again if the same session archives more
+            if self._events_file is None:
+                self._events_file = open(self._events_path, 'a', encoding='utf-8', buffering=64 * 1024)
+            self._events_file.write(f'{line}\n')
+            if time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+                self._events_file.flush()
+                self._last_flush = time.monotonic()
+
+
+    def flush(self) -> None:
+
+        with self._lock:
+            if self._events_file is not None:
+                self._events_file.flush()
+
+
+    def set_asset(self, asset: str) -> None:
+
+        self.asset = asset
+        self.event('asset_start')
+
+
+    def record_span(self, kind: str, name: str, duration: float, directory: str = '', size: int = 0, **fields) -> None:
+
+        with self._lock:
+            total: list = self.spans[(self.asset, kind, directory if kind == 'copy' else name)]
+            total[0] += duration
+            total[1] += 1
+            total[2] += size
+        self.event('span', kind=kind, name=name, directory=directory, duration=duration, bytes=size, **fields)
+
+
+    @contextmanager
+    def span(self, kind: str, name: str = '', **fields):
+
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(kind=kind, name=name, duration=time.perf_counter() - start, **fields)
+
+
+    def count(self, counter: str, value: int = 1) -> None:
+
+        with self._lock:
+            self.counters[self.asset][counter] += value
+
+
+    def totals(self, asset: str = None) -> Counter:
+
+        with self._lock:
+            if asset is not None:
+                return Counter(self.counters.get(asset, {}))
+            totals: Counter = Counter()
+            for counter in self.counters.values():
+                totals.update(counter)
+            return totals
+
+
+    def summary(self, asset: str = None, limit: int = 10) -> list:
+
+        # summary table lines: counters, time per phase, slowest nodes and slowest source directories
+        with self._lock:
+            spans: list = [(key, list(total)) for key, total in self.spans.items() if asset is None or key[0] == asset]
+
+        lines: list = []
+        totals: Counter = self.totals(asset=asset)
+        copy_seconds: float = sum(total[0] for (_, kind, _), total in spans if kind == 'copy')
+        lines.append(f"Files copied: {totals['files_copied']} ({totals['bytes_copied'] / 1024 / 1024:.1f} MB), "
+                     f"skipped: {totals['files_skipped']} ({totals['bytes_skipped'] / 1024 / 1024:.1f} MB), failed: {totals['files_failed']}")
+        if totals['frames_skipped']:
+            lines.append(f"Frames out of range skipped: {totals['frames_skipped']} ({totals['bytes_frames_skipped'] / 1024 / 1024:.1f} MB avoided)")
+        if totals['files_reflink'] or totals['files_hardlink']:
+            lines.append(f"Linked instead of copied: {totals['files_reflink']} reflinks ({totals['bytes_reflink'] / 1024 / 1024:.1f} MB), "
+                         f"{totals['files_hardlink']} hard links ({totals['bytes_hardlink'] / 1024 / 1024:.1f} MB)")
+        if copy_seconds:
+            lines.append(f"Copy throughput: {totals['bytes_copied'] / 1024 / 1024 / copy_seconds:.1f} MB/s per thread")
+
+        phases: dict = defaultdict(float)
+        for (_, kind, name), total in spans:
+            if kind == 'phase':
+                phases[name] += total[0]
+        for phase, duration in sorted(phases.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f'  phase {phase:<24} {duration:>9.2f}s')
+
+        nodes: list = [(name if asset is not None else f'{span_asset}:{name}', total[0]) for (span_asset, kind, name), total in spans if kind == 'node']
+        for node, duration in sorted(nodes, key=lambda item: item[1], reverse=True)[:limit]:
+            lines.append(f'  node  {node:<24} {duration:>9.2f}s')
+
+        directories: dict = defaultdict(lambda: [0.0, 0, 0])
+        for (_, kind, directory), total in spans:
+            if kind == 'copy':
+                for index, value in enumerate(total):
+                    directories[directory][index] += value
+        for directory, (duration, files, size) in sorted(directories.items(), key=lambda item: item[1][0], reverse=True)[:limit]:
+            lines.append(f'  dir   {directory} {duration:>9.2f}s {files} files {size / 1024 / 1024:.1f} MB')
+        return lines
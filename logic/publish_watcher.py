@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from .batch_scheduler import MAYAPY_PATH, BatchScheduler
+from .logger import Logger
+from .manifest import Manifest
+
+
+class PublishWatcher:
+
+
+    def __init__(self, watch_dirpaths: list, archive_path: str, poll_interval: float = 60, settle_time: float = 120, max_attempts: int = 3,
+                 scheduler_options: dict = None, logger: Logger = None):
+
+        self.WATCH_DIRPATHS: list = list(watch_dirpaths) # example : [r'\\GANDALF\3d4_23_24\COUPDESOLEIL\09_publish']
+        self.ARCHIVE_PATH: str = archive_path
+        self.POLL_INTERVAL: float = poll_interval
+        self.SETTLE_TIME: float = settle_time # a publish is archived once its size and mtime have not changed for this long
+        self.MAX_ATTEMPTS: int = max(1, max_attempts)
+        self.EXTENSIONS: tuple = ('.ma', '.mb')
+        self.QUEUE_PATH: str = os.path.join(archive_path, 'archive_watch_queue.json')
+        self.MANIFEST_FILENAME: str = 'archive_manifest.jsonl' # one per destination
+        self.WATCH_LOG_PATH: str = os.path.join(archive_path, 'archive_watch.log')
+        self.scheduler_options: dict = scheduler_options or {} # BatchScheduler keyword arguments, example : {'workers': 2, 'mayapy': MAYAPY_PATH}
+
+        self.logger: Logger = logger or Logger(logger_name='ArchiveWatch')
+        if logger is None:
+            self.logger.write_to_file(path=self.WATCH_LOG_PATH)
+
+        # publish filepath -> {size, mtime_ns, stable_since, status, attempts, error}, kept on disk across restarts
+        self.queue: dict = {}
+        self.load_queue()
+        self.stop_event: threading.Event = threading.Event()
+
+
+    def load_queue(self) -> None:
+
+        if not os.path.exists(self.QUEUE_PATH):
+            return
+        try:
+            with open(self.QUEUE_PATH, 'r', encoding='utf-8') as queue_file:
+                self.queue = json.load(queue_file)
+        except (OSError, ValueError):
+            self.logger.warning(f'Watch queue {self.QUEUE_PATH} is unreadable, publishes are discovered again.')
+            self.queue = {}
+            return
+        # a publish being archived when the watcher stopped is archived again
+        for entry in self.queue.values():
+            if entry['status'] == 'running':
+                entry['status'] = 'pending'
+        self.logger.info(f'Watch queue loaded: {len(self.queue)} publishes, {len(self.pending())} pending.')
+
+
+    def save_queue(self) -> None:
+
+        temp_path: str = f'{self.QUEUE_PATH}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as queue_file:
+            json.dump(self.queue, queue_file, indent=1)
+        os.replace(temp_path, self.QUEUE_PATH)
+
+
+    def scan(self) -> dict:
+
+        # publish filepath -> os.stat_result, every publish of the watched trees
+        publishes: dict = {}
+        dirpaths: list = list(self.WATCH_DIRPATHS)
+        while dirpaths:
+            dirpath: str = dirpaths.pop()
+            try:
+                with os.scandir(dirpath) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir():
+                                dirpaths.append(entry.path)
+                            elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in self.EXTENSIONS and not entry.name.startswith('.'):
+                                publishes[entry.path] = entry.stat()
+                        except OSError:
+                            continue
+            except OSError as error:
+                self.logger.warning(f'Cannot list {dirpath}: {error}')
+        return publishes
+
+
+    def destination(self, source_path: str) -> str:
+
+        # the category directories of the publish are kept: chr and prp assets of the same name do not share an archived asset
+        # example : ...\09_publish\asset\01_character\CDS_chr_bob_P.ma -> ARCHIVE_PATH\asset\01_character
+        dirpath: str = os.path.dirname(source_path)
+        for watch_dirpath in self.WATCH_DIRPATHS:
+            try:
+                relative_dirpath: str = os.path.relpath(dirpath, watch_dirpath)
+            except ValueError:
+                continue
+            if relative_dirpath != os.pardir and not relative_dirpath.startswith(os.pardir + os.sep):
+                return os.path.normpath(os.path.join(self.ARCHIVE_PATH, relative_dirpath))
+        return self.ARCHIVE_PATH
+
+
+    def update(self, publishes: dict, manifests: dict = None, now: float = None) -> int:
+
+        now = time.time() if now is None else now
+        changed: int = 0
+        for source_path, stat in publishes.items():
+            entry: dict = self.queue.get(source_path)
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                continue
+            # new or updated publish: it waits until it stops changing
+            manifest: Manifest = manifests.get(self.destination(source_path)) if manifests else None
+            if entry is None and manifest is not None and manifest.asset_done(source_path):
+                self.queue[source_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'stable_since': now, 'status': 'done', 'attempts': 0, 'error': ''}
+                continue
+            self.queue[source_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'stable_since': now, 'status': 'pending', 'attempts': 0, 'error': ''}
+            self.logger.info(f"{'New' if entry is None else 'Updated'} publish: {source_path}")
+            changed += 1
+
+        for source_path in [source_path for source_path in self.queue if source_path not in publishes]:
+            self.logger.info(f'Publish removed: {source_path}')
+            del self.queue[source_path]
+            changed += 1
+        return changed
+
+
+    def pending(self) -> list:
+        return [source_path for source_path, entry in self.queue.items() if entry['status'] == 'pending' or (entry['status'] == 'error' and entry['attempts'] < self.MAX_ATTEMPTS)]
+
+
+    def ready(self, now: float = None) -> list:
+
+        now = time.time() if now is None else now
+        return sorted(source_path for source_path in self.pending() if now - self.queue[source_path]['stable_since'] >= self.SETTLE_TIME)
+
+
+    def dispatch(self, publish_files: list) -> dict:
+
+        for source_path in publish_files:
+            self.queue[source_path]['status'] = 'running'
+            self.queue[source_path]['attempts'] += 1
+        self.save_queue()
+
+        # one batch per destination, each with its own manifest
+        batches: dict = {}
+        for source_path in publish_files:
+            batches.setdefault(self.destination(source_path), []).append(source_path)
+        summary: dict = {'done': 0, 'error': 0, 'timeout': 0, 'skipped': 0, 'duration': 0.0, 'failed': []}
+        results: dict = {}
+        for destination, batch_files in batches.items():
+            os.makedirs(destination, exist_ok=True)
+            scheduler: BatchScheduler = BatchScheduler(source_path='', archive_path=destination, logger=self.logger, **self.scheduler_options)
+            batch_summary: dict = scheduler.run(publish_files=batch_files)
+            for key, value in batch_summary.items():
+                summary[key] = summary.get(key, 0) + value
+            results.update((result['source'], result) for result in scheduler.results)
+
+        for source_path in publish_files:
+            entry: dict = self.queue.get(source_path)
+            if entry is None:
+                continue
+            result: dict = results.get(source_path)
+            # no result: the manifest already had it as archived
+            if result is None or result['status'] == 'done':
+                entry['status'] = 'done'
+                entry['error'] = ''
+            else:
+                entry['status'] = 'error'
+                entry['error'] = result.get('error', '')
+        self.save_queue()
+        return summary
+
+
+    def poll(self) -> list:
+
+        publishes: dict = self.scan()
+        # the manifests are only read for publishes the queue does not know yet, example : the first run on a show already archived
+        manifests: dict = {}
+        for source_path in publishes:
+            destination: str = self.destination(source_path)
+            if source_path not in self.queue and destination not in manifests:
+                manifests[destination] = Manifest(manifest_path=os.path.join(destination, self.MANIFEST_FILENAME), logger=self.logger)
+        if self.update(publishes=publishes, manifests=manifests):
+            self.save_queue()
+        ready: list = self.ready()
+        if ready:
+            self.logger.info(f'Archiving {len(ready)} settled publishes, {len(self.pending()) - len(ready)} still settling.')
+            self.dispatch(publish_files=ready)
+        return ready
+
+
+    def run(self, cycles: int = None) -> None:
+
+        self.logger.info(f'Watching {self.WATCH_DIRPATHS}, every {self.POLL_INTERVAL}s, settle time {self.SETTLE_TIME}s.')
+        cycle: int = 0
+        while not self.stop_event.is_set():
+            self.poll()
+            cycle += 1
+            if cycles is not None and cycle >= cycles:
+                break
+            self.stop_event.wait(self.POLL_INTERVAL)
+        self.logger.info('Watch stopped.')
+        self.logger.flush()
+
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Watch publish folders and archive every new or updated publish once it has settled.')
+    parser.add_argument('archive_path')
+    parser.add_argument('watch_dirpaths', nargs='+')
+    parser.add_argument('--poll-interval', type=float, default=60)
+    parser.add_argument('--settle-time', type=float, default=120)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--mayapy', default=MAYAPY_PATH)
+    arguments = parser.parse_args()
+
+    watcher: PublishWatcher = PublishWatcher(
+        watch_dirpaths=arguments.watch_dirpaths,
+        archive_path=arguments.archive_path,
+        poll_interval=arguments.poll_interval,
+        settle_time=arguments.settle_time,
+        max_attempts=arguments.max_attempts,
+        scheduler_options={'workers': arguments.workers, 'mayapy': arguments.mayapy}
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    sys.exit(0)
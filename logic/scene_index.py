@@ -0,0 +1,94 @@
+from maya import cmds
+try:
+    import maya.api.OpenMaya as om
+except ImportError:
+    om = None
+from .logger import Logger
+from .ma_scanner import SceneDependency
+
+
+class SceneResourceIndex:
+
+
+    def __init__(self, node_attributes: dict, logger: Logger):
+
+        self.NODE_ATTRIBUTES: dict = node_attributes # node type -> path attribute
+        self.logger: Logger = logger
+
+        self.scene_path: str = ''
+        self.resources: list = [] # SceneDependency for every path bearing node of the scene
+        self._rewrites: list = [] # (SceneDependency, new value)
+
+
+    def collect(self) -> list:
+
+        # one ls over every node type, node types included, then the path values in one pass
+        self.scene_path = cmds.file(query=True, sceneName=True)
+        self._rewrites = []
+        listing: list = cmds.ls(type=list(self.NODE_ATTRIBUTES), showType=True) or []
+        nodes: list = listing[0::2]
+        node_types: list = listing[1::2]
+        attributes: list = [self.NODE_ATTRIBUTES[node_type] for node_type in node_types]
+        values: list = self.read_values(nodes=nodes, attributes=attributes)
+
+        self.resources = [
+            SceneDependency(node=node, node_type=node_type, attribute=attribute, value=value or '')
+            for node, node_type, attribute, value in zip(nodes, node_types, attributes, values)
+        ]
+        self.logger.info(f'Scene resources: {len(self.resources)} path attributes.')
+        return self.resources
+
+
+    def read_values(self, nodes: list, attributes: list) -> list:
+
+        if om is None:
+            return [cmds.getAttr(f'{node}.{attribute}') for node, attribute in zip(nodes, attributes)]
+
+        selection = om.MSelectionList()
+        for node in nodes:
+            selection.add(node)
+        values: list = []
+        for index, attribute in enumerate(attributes):
+            plug = om.MFnDependencyNode(selection.getDependNode(index)).findPlug(attribute, False)
+            values.append(plug.asString())
+        return values
+
+
+    def of_type(self, *node_types: str) -> list:
+        return [resource for resource in self.resources if resource.node_type in node_types]
+
+
+    def set_path(self, resource: SceneDependency, value: str) -> None:
+        self._rewrites.append((resource, value))
+
+
+    def apply_rewrites(self) -> int:
+
+        rewrites: list = self._rewrites
+        self._rewrites = []
+        if not rewrites:
+            return 0
+
+        # every path rewrite at once, without filling the undo queue
+        undo_state: bool = cmds.undoInfo(query=True, state=True)
+        cmds.undoInfo(stateWithoutFlush=False)
+        try:
+            if om is not None:
+                selection = om.MSelectionList()
+                for resource, value in rewrites:
+                    selection.add(resource.node)
+                modifier = om.MDGModifier()
+                for index, (resource, value) in enumerate(rewrites):
+                    plug = om.MFnDependencyNode(selection.getDependNode(index)).findPlug(resource.attribute, False)
+                    modifier.newPlugValueString(plug, value)
+                modifier.doIt()
+            else:
+                for resource, value in rewrites:
+                    cmds.setAttr(f'{resource.node}.{resource.attribute}', value, type='string')
+        finally:
+            cmds.undoInfo(stateWithoutFlush=undo_state)
+
+        for resource, value in rewrites:
+            resource.value = value
+        self.logger.info(f'Rewrote {len(rewrites)} path attributes.')
+        return len(rewrites)
@@ -0,0 +1,89 @@
+import functools
+import os
+import re
+
+
+# Maya / RenderMan filename tokens: <udim>, u<u>_v<v>, <f> / <f4>, %04d / %d, ####
+# %04d and #### are frame tokens only between separators, example : cloth.####.abc, not CDS_x_#1.png
+TOKEN_SPLIT: re.Pattern = re.compile(r'<udim>|<u>|<v>|<f\d*>|(?:^|(?<=[._-]))(?:%0\d+d|%d|#+)(?=[._-]|$)', re.IGNORECASE)
+UDIM_REGEX: str = r'(?P<udim>(?!1000)1\d{3})' # 1001 - 1999
+TEX_EXTENSION: str = '.tex'
+# filenames compare like the file system does: case-insensitive on Windows shares, exact on Linux
+FILENAME_FLAGS: int = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+
+
+class TokenPattern:
+
+
+    def __init__(self, filename: str):
+
+        self.filename: str = filename # example : CDS_bat01_A_BaseColor.<udim>.png
+        self.tokens: list = [] # token names found in the filename: udim, u, v, frame
+        self.prefix: str = '' # literal text before the first token, for the sorted directory listing lookup
+
+        parts: list = []
+        position: int = 0
+        for match in TOKEN_SPLIT.finditer(filename):
+            if not self.tokens:
+                self.prefix = filename[:match.start()]
+            parts.append(re.escape(filename[position:match.start()]))
+            parts.append(self.token_regex(match.group(0)))
+            position = match.end()
+        if not self.tokens:
+            self.prefix = filename
+        parts.append(re.escape(filename[position:]))
+        # the RenderMan .tex conversion sits next to the source map
+        self.regex: re.Pattern = re.compile(f"{''.join(parts)}(?P<tex>{re.escape(TEX_EXTENSION)})?", FILENAME_FLAGS)
+        # a file named exactly like the pattern is its own member, example : CDS_x_#.png on disk
+        self.literal: re.Pattern = re.compile(f'{re.escape(filename)}(?P<tex>{re.escape(TEX_EXTENSION)})?', FILENAME_FLAGS)
+
+
+    def token_regex(self, token: str) -> str:
+
+        lower: str = token.lower()
+        if lower == '<udim>':
+            name: str = 'udim'
+            regex: str = UDIM_REGEX
+        elif lower in ('<u>', '<v>'):
+            name: str = lower[1]
+            regex: str = rf'(?P<{name}>\d+)'
+        else:
+            name: str = 'frame'
+            if lower.startswith('<f'):
+                padding: int = int(lower[2:-1] or 1)
+            elif lower.startswith('%0'):
+                padding: int = int(lower[2:-1])
+            elif lower == '%d':
+                padding: int = 1
+            else:
+                padding: int = len(token)
+            # padding is a minimum width, frames past it keep every digit
+            regex: str = rf'(?P<frame>-?\d{{{padding},}})'
+
+        # a token used twice in one filename must match the same value
+        if name in self.tokens:
+            return f'(?P={name})'
+        self.tokens.append(name)
+        return regex
+
+
+    def match(self, filename: str) -> dict:
+
+        # token values of a file of the set, None when the file is not part of it
+        match: re.Match = self.regex.fullmatch(filename)
+        if match is None:
+            # the literal file carries no token value
+            match = self.literal.fullmatch(filename)
+            return {'tex': match.group('tex') is not None} if match is not None else None
+        values: dict = {name: int(match.group(name)) for name in self.tokens}
+        values['tex'] = match.group('tex') is not None
+        return values
+
+
+    def matches(self, filename: str) -> bool:
+        return self.regex.fullmatch(filename) is not None or self.literal.fullmatch(filename) is not None
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_token_pattern(filename: str) -> TokenPattern:
+    return TokenPattern(filename=filename)
@@ -0,0 +1,17 @@
+import sys
+import pytest
+from benchmarks import fake_maya
+
+
+REPLACED_MODULES: tuple = ('maya', 'maya.cmds', 'maya.mel', 'logic.archive', 'logic.scene_index')
+
+
+@pytest.fixture
+def fake_cmds():
+
+    # logic.archive imported against the fake maya.cmds, the modules in place before are put back afterwards
+    saved: dict = {name: sys.modules.pop(name) for name in REPLACED_MODULES if name in sys.modules}
+    yield fake_maya.install()
+    for name in REPLACED_MODULES:
+        sys.modules.pop(name, None)
+    sys.modules.update(saved)
@@ -0,0 +1,31 @@
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from logic.batch_scheduler import RESULT_PREFIX
+from logic.logger import Logger
+from logic.manifest import Manifest
+
+
+# stands in for logic.batch_worker: archive_path shard --options options_path, one publish path per stdin line
+archive_path, shard, options_path = sys.argv[1], sys.argv[2], sys.argv[4]
+with open(options_path, 'r', encoding='utf-8') as options_file:
+    options: dict = json.load(options_file)
+manifest: Manifest = Manifest(manifest_path=os.path.join(archive_path, 'archive_manifest.jsonl'), logger=Logger(logger_name='StubWorker'), shard=shard)
+
+for line in sys.stdin:
+    source_path: str = line.strip()
+    # example : CDS_env_crash_P.ma, the asset name picks the behaviour
+    behaviour: str = os.path.basename(source_path).split('_')[2]
+    if behaviour == 'crash':
+        os._exit(3)
+    if behaviour == 'hang':
+        time.sleep(60)
+    result: dict = {'source': source_path, 'status': 'done', 'error': '', 'duration': 0.0, 'pid': os.getpid(), 'options': options}
+    if behaviour == 'error':
+        result.update(status='error', error='stub error')
+    else:
+        manifest.record_asset(source_filepath=source_path)
+    sys.stdout.write(f'{RESULT_PREFIX}{json.dumps(result)}\n')
+    sys.stdout.flush()
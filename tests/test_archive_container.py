@@ -0,0 +1,30 @@
+import os
+import shutil
+from benchmarks.run_benchmarks import MAYA_PROJECT_DIRPATH
+from benchmarks.show_tree import generate_show
+from logic.container import ContainerReader
+from logic.manifest import Manifest
+
+
+def test_two_publishes_of_one_asset(fake_cmds, tmp_path):
+
+    from logic.archive import Archive
+
+    show: dict = generate_show(str(tmp_path / 'show'), assets=1, textures_per_asset=1, udims=2, shared_textures=1, rib_frames=2, alembic_size=1024, tile_size=1024, rib_size=1024)
+    source_path: str = show['source_path']
+    # the mod and ldv publishes of asset000 share the archived asset directory
+    shutil.copy(os.path.join(source_path, 'CDS_env_asset000_ldv_P.ma'), os.path.join(source_path, 'CDS_env_asset000_mod_P.ma'))
+    archive_path: str = str(tmp_path / 'archive')
+    os.makedirs(archive_path)
+
+    archive_tool: Archive = Archive(source_path=source_path, archive_path=archive_path, output_mode='container', interactive=False)
+    archive_tool.MAYA_PROJECT_DIRPATH = MAYA_PROJECT_DIRPATH
+    assert archive_tool.archive_files() == 'done'
+
+    for publish_name in ('CDS_env_asset000_ldv_P', 'CDS_env_asset000_mod_P'):
+        reader: ContainerReader = ContainerReader(container_path=os.path.join(archive_path, f'{publish_name}.tar.gz'))
+        assert reader.index['asset'] == 'asset000'
+        assert f'asset000/maya/scenes/{publish_name}.ma' in reader.members
+
+    manifest: Manifest = Manifest(manifest_path=os.path.join(archive_path, 'archive_manifest.jsonl'), logger=archive_tool.logger)
+    assert sorted(os.path.basename(source) for source in manifest.assets) == ['CDS_env_asset000_ldv_P.ma', 'CDS_env_asset000_mod_P.ma']
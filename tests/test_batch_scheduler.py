@@ -0,0 +1,70 @@
+import glob
+import os
+import sys
+from logic.batch_scheduler import BatchScheduler
+from logic.io_scheduler import DEFAULT_PROFILES, IOProfile
+from logic.logger import Logger
+from logic.manifest import Manifest
+
+
+STUB_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'stub_worker.py')
+
+
+def make_scheduler(tmp_path, publish_names: list, **kwargs) -> BatchScheduler:
+
+    source_path: str = str(tmp_path / 'publish')
+    archive_path: str = str(tmp_path / 'archive')
+    os.makedirs(source_path)
+    os.makedirs(archive_path)
+    for publish_name in publish_names:
+        with open(os.path.join(source_path, publish_name), 'w') as publish_file:
+            publish_file.write(publish_name)
+    return BatchScheduler(source_path=source_path, archive_path=archive_path, worker_command=[sys.executable, STUB_PATH, archive_path],
+                          logger=Logger(logger_name='TestBatch'), **kwargs)
+
+
+def test_batch_done_and_recycled(tmp_path):
+
+    scheduler: BatchScheduler = make_scheduler(tmp_path, ['CDS_env_eglise_ldv_P.ma', 'CDS_env_eglise_mod_P.ma', 'CDS_env_banc_ldv_P.ma', 'CDS_env_puits_ldv_P.ma'],
+                                               workers=1, scenes_per_worker=2, options={'link_method': 'hardlink'})
+    summary: dict = scheduler.run()
+    assert (summary['done'], summary['error'], summary['timeout'], summary['failed']) == (4, 0, 0, [])
+
+    # a new worker process every 2 publishes, each one started with the options of the batch
+    pids: list = [result['pid'] for result in scheduler.results]
+    assert len(set(pids)) == 2 and pids.count(pids[0]) == 2
+    assert all(result['options']['link_method'] == 'hardlink' for result in scheduler.results)
+    # a single worker keeps the whole budget
+    assert scheduler.results[0]['options']['io_profiles'] == [vars(profile) for profile in DEFAULT_PROFILES]
+
+    # the manifest shards of the workers are merged once the batch is done
+    manifest_path: str = os.path.join(scheduler.ARCHIVE_PATH, 'archive_manifest.jsonl')
+    assert glob.glob(os.path.join(scheduler.ARCHIVE_PATH, 'archive_manifest.*.jsonl')) == []
+    assert len(Manifest(manifest_path=manifest_path, logger=scheduler.logger).assets) == 4
+
+    rerun: BatchScheduler = BatchScheduler(source_path=scheduler.SOURCE_PATH, archive_path=scheduler.ARCHIVE_PATH, worker_command=scheduler.WORKER_COMMAND, logger=scheduler.logger)
+    assert rerun.run()['skipped'] == 4
+
+
+def test_batch_crash_timeout_and_error(tmp_path):
+
+    scheduler: BatchScheduler = make_scheduler(tmp_path, ['CDS_env_eglise_P.ma', 'CDS_env_crash_P.ma', 'CDS_env_hang_P.ma', 'CDS_env_error_P.ma'],
+                                               workers=2, scene_timeout=2)
+    summary: dict = scheduler.run()
+    assert (summary['done'], summary['error'], summary['timeout']) == (1, 2, 1)
+
+    failed: dict = {os.path.basename(result['source']): result for result in summary['failed']}
+    assert sorted(failed) == ['CDS_env_crash_P.ma', 'CDS_env_error_P.ma', 'CDS_env_hang_P.ma']
+    assert failed['CDS_env_crash_P.ma']['error'] == 'worker exited'
+    assert failed['CDS_env_hang_P.ma']['status'] == 'timeout'
+    assert failed['CDS_env_error_P.ma']['error'] == 'stub error'
+
+
+def test_batch_io_budget_split(tmp_path):
+
+    io_profiles: list = [IOProfile(name='day', start_hour=0, end_hour=24, bytes_per_second=40 * 1024 * 1024, max_per_share=2)]
+    scheduler: BatchScheduler = make_scheduler(tmp_path, ['CDS_env_eglise_P.ma', 'CDS_env_banc_P.ma'], workers=2, options={'io_profiles': io_profiles})
+    assert scheduler.run()['done'] == 2
+    # two workers on the same share: 20 MB/s and one stream each
+    for result in scheduler.results:
+        assert result['options']['io_profiles'] == [{'name': 'day', 'start_hour': 0, 'end_hour': 24, 'bytes_per_second': 20 * 1024 * 1024, 'max_per_share': 1}]
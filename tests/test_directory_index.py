@@ -0,0 +1,60 @@
+import ntpath
+import os
+from logic.directory_index import DirectoryIndex, DirectoryListing
+
+
+def touch(dirpath: str, *filenames: str) -> None:
+
+    for filename in filenames:
+        with open(os.path.join(dirpath, filename), 'wb') as touched_file:
+            touched_file.write(filename.encode())
+
+
+def test_prefix_lookup(tmp_path):
+
+    touch(str(tmp_path), 'CDS_bar.1001.png', 'CDS_bar.1002.png', 'CDS_bar_old.1001.png', 'CDS_baz.png')
+    os.mkdir(tmp_path / 'CDS_bar.1003.png')
+    listing: DirectoryListing = DirectoryListing(dirpath=str(tmp_path))
+    # sorted, files only, the decoy with the same stem is left to the token pattern
+    assert listing.starting_with('CDS_bar.') == ['CDS_bar.1001.png', 'CDS_bar.1002.png']
+    assert listing.starting_with('CDS_bar') == ['CDS_bar.1001.png', 'CDS_bar.1002.png', 'CDS_bar_old.1001.png']
+    assert listing.starting_with('CDS_qux') == []
+    assert listing.contains('CDS_baz.png') and not listing.contains('CDS_bar.1003.png')
+    assert listing.stat('CDS_baz.png').st_size == len('CDS_baz.png')
+
+
+def test_prefix_lookup_windows_case(tmp_path, monkeypatch):
+
+    # a Windows share: lookups ignore the case, the names keep the case they have on disk
+    monkeypatch.setattr(os.path, 'normcase', ntpath.normcase)
+    touch(str(tmp_path), 'CDS_Bar.1001.PNG', 'cds_bar.1002.png', 'CDS_Baz.png')
+    listing: DirectoryListing = DirectoryListing(dirpath=str(tmp_path))
+    assert listing.starting_with('CDS_BAR.') == ['CDS_Bar.1001.PNG', 'cds_bar.1002.png']
+    assert listing.contains('cds_baz.PNG')
+    assert listing.stat('CDS_BAZ.PNG') is not None
+
+
+def test_missing_directory(tmp_path):
+
+    index: DirectoryIndex = DirectoryIndex()
+    assert index.find_files_starting_with(dirpath=str(tmp_path / 'missing'), prefix='CDS_') == []
+    assert not index.exists(str(tmp_path / 'missing' / 'CDS_bar.png'))
+
+
+def test_invalidate(tmp_path):
+
+    dirpath: str = str(tmp_path)
+    touch(dirpath, 'CDS_bar.1001.png')
+    index: DirectoryIndex = DirectoryIndex()
+    assert index.find_files_starting_with(dirpath=dirpath, prefix='CDS_bar') == [os.path.join(dirpath, 'CDS_bar.1001.png')]
+
+    # the listing is kept until invalidated
+    touch(dirpath, 'CDS_bar.1002.png')
+    assert not index.exists(os.path.join(dirpath, 'CDS_bar.1002.png'))
+    index.invalidate(dirpath=os.path.join(dirpath, '.'))
+    assert index.exists(os.path.join(dirpath, 'CDS_bar.1002.png'))
+
+    touch(dirpath, 'CDS_bar.1003.png')
+    assert index.stat(os.path.join(dirpath, 'CDS_bar.1003.png')) is None
+    index.invalidate()
+    assert index.stat(os.path.join(dirpath, 'CDS_bar.1003.png')) is not None
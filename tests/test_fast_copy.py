@@ -0,0 +1,123 @@
+import errno
+import hashlib
+import os
+import pytest
+from logic import fast_copy
+
+
+DATA: bytes = os.urandom(3 * 1024 * 1024 + 17)
+
+
+@pytest.fixture
+def source(tmp_path) -> str:
+
+    source_filepath: str = str(tmp_path / 'source' / 'CDS_bar_albedo.1001.png')
+    os.makedirs(os.path.dirname(source_filepath))
+    with open(source_filepath, 'wb') as source_file:
+        source_file.write(DATA)
+    os.utime(source_filepath, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+    return source_filepath
+
+
+def part_files(dirpath: str) -> list:
+    return [filename for filename in os.listdir(dirpath) if filename.endswith('.part')]
+
+
+def test_place_file_copy(tmp_path, source):
+
+    destination: str = str(tmp_path / 'CDS_bar_albedo.1001.png')
+    with open(destination, 'wb') as destination_file:
+        destination_file.write(b'previous archive')
+    used, digest = fast_copy.place_file(source, destination, buffer_size=1024 * 1024)
+    assert used == 'copy'
+    assert digest == hashlib.sha256(DATA).hexdigest()
+    with open(destination, 'rb') as destination_file:
+        assert destination_file.read() == DATA
+    assert os.stat(destination).st_mtime_ns == os.stat(source).st_mtime_ns
+    assert part_files(str(tmp_path)) == []
+
+
+def test_place_file_failure_keeps_destination(tmp_path, source):
+
+    destination: str = str(tmp_path / 'CDS_bar_albedo.1001.png')
+    with open(destination, 'wb') as destination_file:
+        destination_file.write(b'previous archive')
+
+    def throttle(size: int) -> None:
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    with pytest.raises(OSError):
+        fast_copy.place_file(source, destination, buffer_size=1024 * 1024, throttle=throttle)
+    # the half written temp file is removed, the previous file is untouched
+    with open(destination, 'rb') as destination_file:
+        assert destination_file.read() == b'previous archive'
+    assert part_files(str(tmp_path)) == []
+
+
+def test_place_file_fallback(tmp_path, source, monkeypatch):
+
+    calls: list = []
+
+    def hard_link(source_filepath: str, destination_filepath: str) -> bool:
+        calls.append('hardlink')
+        return False
+
+    def reflink_data(source_filepath: str, destination_filepath: str) -> bool:
+        calls.append('reflink')
+        return False
+
+    monkeypatch.setattr(fast_copy, 'hard_link', hard_link)
+    monkeypatch.setattr(fast_copy, 'reflink_data', reflink_data)
+    used, digest = fast_copy.place_file(source, str(tmp_path / 'hardlink.png'), method='hardlink')
+    assert (used, calls) == ('copy', ['hardlink', 'reflink'])
+    assert digest == hashlib.sha256(DATA).hexdigest()
+
+    calls.clear()
+    used, digest = fast_copy.place_file(source, str(tmp_path / 'reflink.png'), method='reflink')
+    assert (used, calls) == ('copy', ['reflink'])
+
+    # another device: no link is tried
+    calls.clear()
+    used, digest = fast_copy.place_file(source, str(tmp_path / 'other_device.png'), method='hardlink', same_device=False)
+    assert (used, calls) == ('copy', [])
+    assert part_files(str(tmp_path)) == []
+
+
+def test_place_file_hardlink(tmp_path, source):
+
+    destination: str = str(tmp_path / 'CDS_bar_albedo.1001.png')
+    used, digest = fast_copy.place_file(source, destination, method='hardlink')
+    if used != 'hardlink':
+        pytest.skip('hard links are not supported here')
+    assert digest is None
+    assert os.path.samefile(source, destination)
+    assert part_files(str(tmp_path)) == []
+
+
+def test_place_file_unknown_method(tmp_path, source):
+
+    with pytest.raises(ValueError):
+        fast_copy.place_file(source, str(tmp_path / 'symlink.png'), method='symlink')
+
+
+def test_kernel_copy_short(tmp_path, source, monkeypatch):
+
+    # the source is truncated while copied: copy_file_range reports the end of file early
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is None:
+        pytest.skip('no copy_file_range here')
+    offsets: list = []
+
+    def short_copy_file_range(source_fd: int, destination_fd: int, count: int, offset_src: int, offset_dst: int) -> int:
+        if offsets:
+            return 0
+        offsets.append(offset_src)
+        return copy_file_range(source_fd, destination_fd, 1024, offset_src, offset_dst)
+
+    monkeypatch.setattr(os, 'copy_file_range', short_copy_file_range)
+    destination: str = str(tmp_path / 'scene.ma')
+    with pytest.raises(OSError) as error:
+        fast_copy.place_file(source, destination, hash_name=None)
+    assert error.value.errno == errno.EIO
+    assert not os.path.exists(destination)
+    assert part_files(str(tmp_path)) == []
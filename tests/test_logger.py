@@ -0,0 +1,33 @@
+import pytest
+from logic.logger import Logger
+
+
+def read_log(path) -> str:
+
+    with open(path, 'r', encoding='utf-8') as log_file:
+        return log_file.read()
+
+
+@pytest.mark.parametrize('queue_mode', [False, True])
+def test_write_to_file_replaces_previous_archive(tmp_path, queue_mode):
+
+    logger: Logger = Logger(logger_name=f'TestLogger{queue_mode}', queue_mode=queue_mode)
+    first_path: str = str(tmp_path / 'first' / 'archive.log')
+    second_path: str = str(tmp_path / 'second' / 'archive.log')
+    (tmp_path / 'first').mkdir()
+    (tmp_path / 'second').mkdir()
+
+    logger.write_to_file(path=first_path)
+    logger.info('first archive')
+    # another Logger of the same archive keeps the handler
+    Logger(logger_name=f'TestLogger{queue_mode}').write_to_file(path=first_path)
+    logger.write_to_file(path=second_path)
+    logger.info('second archive')
+    logger.flush()
+
+    assert read_log(first_path).count('first archive') == 1
+    assert 'second archive' not in read_log(first_path)
+    assert 'first archive' not in read_log(second_path)
+    assert 'second archive' in read_log(second_path)
+    assert [handler.baseFilename for handler in logger.handlers() if hasattr(handler, 'baseFilename')] == [second_path]
+    logger.disable_queue()
@@ -0,0 +1,53 @@
+import os
+import pytest
+from logic.ma_scanner import MaScanner
+
+
+SAMPLE_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sample_scene.ma')
+TEXTURE_DIRPATH: str = '//GANDALF/3d4_23_24/COUPDESOLEIL/10_texture/04_enviro/eglise'
+CACHE_DIRPATH: str = '//GANDALF/3d4_23_24/COUPDESOLEIL/11_cache/eglise'
+
+
+def scan_sample() -> MaScanner:
+
+    scanner: MaScanner = MaScanner(filepath=SAMPLE_PATH)
+    scanner.scan()
+    return scanner
+
+
+def test_scan_sample():
+
+    scanner: MaScanner = scan_sample()
+    dependencies: list = [(dependency.node, dependency.attribute, dependency.value) for dependency in scanner.dependencies]
+    assert dependencies == [
+        ('eglise_BaseColor', 'fileTextureName', f'{TEXTURE_DIRPATH}/CDS_eglise_BaseColor.<UDIM>.png'),
+        ('eglise_Roughness', 'fileTextureName', f'{TEXTURE_DIRPATH}/CDS_eglise_Roughness.<UDIM>.png'), # setAttr -l on ".ftn"
+        ('eglise_Normal', 'filename', f'{TEXTURE_DIRPATH}/CDS_eglise_Normal.<UDIM>.tex'),
+        ('eglise_ivyShape', 'cacheFileName', f'{CACHE_DIRPATH}/ivy.abc'),
+        ('eglise_clothAlembic', 'abc_File', f'{CACHE_DIRPATH}/cloth.####.abc'),
+        ('eglise_Mask', 'fileTextureName', f'{TEXTURE_DIRPATH}/CDS_eglise_Mask.png') # select -ne, then setAttr -l on -k off ".ftn"
+    ]
+    # file -rdi and file -r of the same reference
+    assert scanner.references == ['//GANDALF/3d4_23_24/COUPDESOLEIL/09_publish/asset/01_character/CDS_chr_bob_P.ma']
+    assert scanner.frame_range() == (101.0, 148.0)
+
+
+def test_scan_matches_maya():
+
+    # the same scene opened in mayapy, read the way Archive reads it
+    standalone = pytest.importorskip('maya.standalone')
+    standalone.initialize(name='python')
+    from maya import cmds
+    from logic.logger import Logger
+    from logic.scene_index import SceneResourceIndex
+
+    for plugin_name in ('RenderMan_for_Maya', 'AbcImport', 'gpuCache'):
+        cmds.loadPlugin(plugin_name, quiet=True)
+    # the reference is not loaded: only the nodes of the sample itself are compared
+    cmds.file(SAMPLE_PATH, open=True, force=True, loadReferenceDepth='none')
+
+    scanner: MaScanner = scan_sample()
+    index: SceneResourceIndex = SceneResourceIndex(node_attributes={node_type: attribute for node_type, (attribute, _) in scanner.NODE_ATTRIBUTES.items()},
+                                                   logger=Logger(logger_name='test_ma_scanner'))
+    maya_dependencies: set = {(resource.node, resource.attribute, resource.value) for resource in index.collect() if resource.value}
+    assert {(dependency.node, dependency.attribute, dependency.value) for dependency in scanner.dependencies} == maya_dependencies
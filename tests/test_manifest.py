@@ -0,0 +1,114 @@
+import json
+import os
+from logic.logger import Logger
+from logic.manifest import Manifest, merge_shards, shard_path
+
+
+LOGGER: Logger = Logger(logger_name='TestManifest')
+
+
+def write_file(filepath: str, data: bytes) -> os.stat_result:
+
+    with open(filepath, 'wb') as written_file:
+        written_file.write(data)
+    return os.stat(filepath)
+
+
+def copied(tmp_path, manifest: Manifest, data: bytes = b'texture') -> tuple:
+
+    source: str = str(tmp_path / 'source.png')
+    destination: str = str(tmp_path / 'destination.png')
+    stat: os.stat_result = write_file(source, data)
+    write_file(destination, data)
+    manifest.record_copy(source, destination, stat.st_size, stat.st_mtime_ns)
+    return source, destination
+
+
+def test_needs_copy(tmp_path):
+
+    manifest: Manifest = Manifest(manifest_path=str(tmp_path / 'archive_manifest.jsonl'), logger=LOGGER)
+    source, destination = copied(tmp_path, manifest)
+    assert not manifest.needs_copy(source, destination)
+    assert manifest.needs_copy(source, str(tmp_path / 'other.png'))
+    assert manifest.needs_copy(str(tmp_path / 'other.png'), destination)
+
+    # same size, newer mtime
+    stat: os.stat_result = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert manifest.needs_copy(source, destination)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert not manifest.needs_copy(source, destination)
+
+    # different size, mtime kept
+    write_file(source, b'texture v2')
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert manifest.needs_copy(source, destination)
+
+
+def test_needs_copy_destination(tmp_path):
+
+    manifest: Manifest = Manifest(manifest_path=str(tmp_path / 'archive_manifest.jsonl'), logger=LOGGER)
+    source, destination = copied(tmp_path, manifest)
+    # a copy interrupted after the record
+    write_file(destination, b'tex')
+    assert manifest.needs_copy(source, destination)
+    os.remove(destination)
+    assert manifest.needs_copy(source, destination)
+
+
+def test_reload(tmp_path):
+
+    manifest_path: str = str(tmp_path / 'archive_manifest.jsonl')
+    manifest: Manifest = Manifest(manifest_path=manifest_path, logger=LOGGER)
+    source, destination = copied(tmp_path, manifest)
+    manifest.record_asset(source)
+    manifest.close()
+
+    reloaded: Manifest = Manifest(manifest_path=manifest_path, logger=LOGGER)
+    assert not reloaded.needs_copy(source, destination)
+    assert reloaded.asset_done(source)
+
+
+def test_resume_torn_last_line(tmp_path):
+
+    manifest_path: str = str(tmp_path / 'archive_manifest.jsonl')
+    manifest: Manifest = Manifest(manifest_path=manifest_path, logger=LOGGER)
+    source, destination = copied(tmp_path, manifest)
+    manifest.close()
+    # the run was killed in the middle of the next record
+    with open(manifest_path, 'a', encoding='utf-8') as manifest_file:
+        manifest_file.write('{"type": "copy", "source": "')
+
+    resumed: Manifest = Manifest(manifest_path=manifest_path, logger=LOGGER)
+    assert not resumed.needs_copy(source, destination)
+    resumed.record_asset(source)
+    resumed.close()
+
+    reloaded: Manifest = Manifest(manifest_path=manifest_path, logger=LOGGER)
+    assert not reloaded.needs_copy(source, destination)
+    assert reloaded.asset_done(source)
+
+
+def test_merge_shards(tmp_path):
+
+    manifest_path: str = str(tmp_path / 'archive_manifest.jsonl')
+    sources: list = []
+    for worker in range(2):
+        source: str = str(tmp_path / f'asset{worker}.ma')
+        write_file(source, b'//Maya ASCII')
+        sources.append(source)
+        shard: Manifest = Manifest(manifest_path=manifest_path, logger=LOGGER, shard=f'worker{worker}')
+        assert shard.WRITE_PATH == shard_path(manifest_path, f'worker{worker}')
+        shard.record_asset(source)
+        shard.close()
+    # worker1 was killed mid line
+    with open(shard_path(manifest_path, 'worker1'), 'a', encoding='utf-8') as shard_file:
+        shard_file.write(json.dumps({'type': 'asset', 'source': 'torn'})[:10])
+
+    assert merge_shards(manifest_path) == 2
+    assert not os.path.exists(shard_path(manifest_path, 'worker0'))
+    assert not os.path.exists(shard_path(manifest_path, 'worker1'))
+
+    merged: Manifest = Manifest(manifest_path=manifest_path, logger=LOGGER)
+    assert all(merged.asset_done(source) for source in sources)
+    assert merge_shards(manifest_path) == 0
@@ -0,0 +1,67 @@
+import pytest
+from logic.token_pattern import TokenPattern, compile_token_pattern
+
+
+def test_udim_range():
+
+    pattern: TokenPattern = compile_token_pattern('CDS_bat01_A_BaseColor.<udim>.png')
+    assert pattern.tokens == ['udim']
+    assert pattern.prefix == 'CDS_bat01_A_BaseColor.'
+    assert pattern.match('CDS_bat01_A_BaseColor.1001.png') == {'udim': 1001, 'tex': False}
+    assert pattern.matches('CDS_bat01_A_BaseColor.1999.png')
+    for name in ('CDS_bat01_A_BaseColor.1000.png', 'CDS_bat01_A_BaseColor.2001.png', 'CDS_bat01_A_BaseColor.0999.png', 'CDS_bat01_A_BaseColor.100.png'):
+        assert not pattern.matches(name)
+
+
+def test_uv_tiles():
+
+    pattern: TokenPattern = compile_token_pattern('CDS_rock_u<u>_v<v>.exr')
+    assert pattern.tokens == ['u', 'v']
+    assert pattern.match('CDS_rock_u1_v2.exr') == {'u': 1, 'v': 2, 'tex': False}
+    assert not pattern.matches('CDS_rock_u1_vx.exr')
+
+
+@pytest.mark.parametrize('filename', ['cloth.<f>.abc', 'cloth.<f4>.abc', 'cloth.%04d.abc', 'cloth.####.abc'])
+def test_frame_tokens(filename: str):
+
+    pattern: TokenPattern = compile_token_pattern(filename)
+    assert pattern.tokens == ['frame']
+    assert pattern.match('cloth.0101.abc') == {'frame': 101, 'tex': False}
+    # the padding is a minimum width
+    assert pattern.match('cloth.12345.abc')['frame'] == 12345
+
+
+def test_frame_padding():
+
+    assert not compile_token_pattern('cloth.####.abc').matches('cloth.001.abc')
+    assert compile_token_pattern('cloth.%d.abc').match('cloth.7.abc')['frame'] == 7
+    assert compile_token_pattern('####.rib').match('0012.rib')['frame'] == 12
+
+
+def test_tex_suffix():
+
+    pattern: TokenPattern = compile_token_pattern('CDS_bat01_A_BaseColor.<udim>.png')
+    assert pattern.match('CDS_bat01_A_BaseColor.1002.png.tex') == {'udim': 1002, 'tex': True}
+    assert not pattern.matches('CDS_bat01_A_BaseColor.1002.tex')
+
+
+def test_decoys():
+
+    # same prefix, not the same set
+    assert not compile_token_pattern('CDS_bat01_A_BaseColor.<udim>.png').matches('CDS_bat01_A_BaseColor_old.1001.png')
+    assert not compile_token_pattern('CDS_asset000Proxy.<f>.rib').matches('CDS_asset000ProxyLOD.0001.rib')
+    assert not compile_token_pattern('CDS_rock.<udim>.png').matches('CDS_rock.1001.jpg')
+
+
+def test_literal_hash_and_percent():
+
+    # # and %d inside a name are not frame tokens
+    for filename in ('CDS_x_#1.png', 'CDS_x#.png', 'CDS_x_100%done.png'):
+        pattern: TokenPattern = compile_token_pattern(filename)
+        assert pattern.tokens == []
+        assert pattern.matches(filename)
+    # between separators # is a frame token, a file named exactly like the pattern still matches itself
+    pattern: TokenPattern = compile_token_pattern('CDS_x_#.png')
+    assert pattern.tokens == ['frame']
+    assert pattern.match('CDS_x_7.png')['frame'] == 7
+    assert pattern.match('CDS_x_#.png') == {'tex': False}
@@ -1,18 +1,23 @@
 from maya import cmds
 import maya.api.OpenMaya as om
-from logic.archive import Archive
+import maya.utils
+from logic.archive_job import ArchiveJob
+from logic.io_scheduler import IOProfile
+from logic.job_control import format_progress
 
 
 class MainUi:
 
     def __init__(self) -> None:
+        self.job: ArchiveJob = None
+        self.paused: bool = False # the state last asked for, the progress of the job only follows a moment later
         self.create_ui()
 
     def create_ui(self):
         if cmds.window("customUI", exists=True):
             cmds.deleteUI("customUI", window=True)
 
-        window = cmds.window("customUI", title="Archive", widthHeight=(400, 200))
+        window = cmds.window("customUI", title="Archive", widthHeight=(400, 420))
         form = cmds.formLayout()
 
         # Radio buttons in a row layout
@@ -36,21 +41,51 @@ class MainUi:
         cmds.button(label='Browse', command=lambda x: self.browse_archive('archiving_path_field'))
         cmds.setParent('..')
 
+        # Frame range of rib / cache sequences, 0 0 for the render range of each shot
+        self.frame_range_field = cmds.intFieldGrp('frame_range_field', numberOfFields=3, label='Frames Start End Handle', value1=0, value2=0, value3=1)
+
+        # I/O limits on GANDALF: gentle during the day, the whole server at night, 0 MB/s for no limit
+        self.day_hours_field = cmds.intFieldGrp('day_hours_field', numberOfFields=2, label='Day Hours', value1=8, value2=20)
+        self.day_io_field = cmds.intFieldGrp('day_io_field', numberOfFields=2, label='Day MB/s Streams', value1=40, value2=2)
+        self.night_io_field = cmds.intFieldGrp('night_io_field', numberOfFields=2, label='Night MB/s Streams', value1=0, value2=8)
+
         # Apply button
         self.apply_button = cmds.button(label='START ARCHIVING', height=30, command=self.start_archive)
 
+        # Progress of the background job, pause and cancel stop between two files
+        self.progress_bar = cmds.progressBar(maxValue=1000, height=16)
+        self.progress_text = cmds.text(label='', align='left')
+        job_row = cmds.rowLayout(numberOfColumns=2, columnWidth2=(190, 190))
+        self.pause_button = cmds.button(label='PAUSE', width=185, enable=False, command=self.toggle_pause)
+        self.cancel_button = cmds.button(label='CANCEL', width=185, enable=False, command=self.cancel_archive)
+        cmds.setParent('..')
+
         # Arrange elements in the form layout
         cmds.formLayout(form, edit=True,
                         attachForm=[
                             (radio_row, 'top', 10), (radio_row, 'left', 10), (radio_row, 'right', 10),
                             (row1, 'left', 10), (row1, 'right', 10),
                             (row2, 'left', 10), (row2, 'right', 10),
-                            (self.apply_button, 'left', 10), (self.apply_button, 'right', 10), (self.apply_button, 'bottom', 10)
+                            (self.frame_range_field, 'left', 10), (self.frame_range_field, 'right', 10),
+                            (self.day_hours_field, 'left', 10), (self.day_hours_field, 'right', 10),
+                            (self.day_io_field, 'left', 10), (self.day_io_field, 'right', 10),
+                            (self.night_io_field, 'left', 10), (self.night_io_field, 'right', 10),
+                            (self.apply_button, 'left', 10), (self.apply_button, 'right', 10),
+                            (self.progress_bar, 'left', 10), (self.progress_bar, 'right', 10),
+                            (self.progress_text, 'left', 10), (self.progress_text, 'right', 10),
+                            (job_row, 'left', 10), (job_row, 'right', 10), (job_row, 'bottom', 10)
                         ],
                         attachControl=[
                             (row1, 'top', 10, radio_row),
                             (row2, 'top', 10, row1),
-                            (self.apply_button, 'top', 10, row2)
+                            (self.frame_range_field, 'top', 10, row2),
+                            (self.day_hours_field, 'top', 10, self.frame_range_field),
+                            (self.day_io_field, 'top', 10, self.day_hours_field),
+                            (self.night_io_field, 'top', 10, self.day_io_field),
+                            (self.apply_button, 'top', 10, self.night_io_field),
+                            (self.progress_bar, 'top', 10, self.apply_button),
+                            (self.progress_text, 'top', 5, self.progress_bar),
+                            (job_row, 'top', 10, self.progress_text)
                         ])
 
         cmds.showWindow(window)
@@ -81,8 +116,31 @@ class MainUi:
             cmds.textFieldGrp(text_field, edit=True, text=archive_path[0])
 
 
+    def get_frame_range(self) -> tuple:
+
+        start, end, handle = cmds.intFieldGrp(self.frame_range_field, query=True, value=True)
+        if start == 0 and end == 0:
+            return None, handle
+        return (min(start, end), max(start, end)), handle
+
+
+    def get_io_profiles(self) -> list:
+
+        day_start, day_end = cmds.intFieldGrp(self.day_hours_field, query=True, value=True)
+        day_rate, day_streams = cmds.intFieldGrp(self.day_io_field, query=True, value=True)
+        night_rate, night_streams = cmds.intFieldGrp(self.night_io_field, query=True, value=True)
+        return [
+            IOProfile(name='day', start_hour=day_start, end_hour=day_end, bytes_per_second=day_rate * 1024 * 1024, max_per_share=day_streams),
+            IOProfile(name='night', start_hour=day_end, end_hour=day_start, bytes_per_second=night_rate * 1024 * 1024, max_per_share=night_streams)
+        ]
+
+
     def start_archive(self, button: str):
 
+        if self.job is not None and self.job.is_running():
+            cmds.confirmDialog(message='An archive job is already running.', icon='warning', button='OK')
+            return
+
         source_path: str = cmds.textFieldGrp(self.source_path_field, query=True, text=True)
         archive_path: str = cmds.textFieldGrp(self.archiving_path_field, query=True, text=True)
 
@@ -92,14 +150,66 @@ class MainUi:
 
         om.MGlobal.displayInfo(f'Source Path: {source_path}')
         om.MGlobal.displayInfo(f'Archive Path: {archive_path}')
+        frame_range, frame_handle = self.get_frame_range()
+        options: dict = {'frame_range': frame_range, 'frame_handle': frame_handle, 'io_profiles': self.get_io_profiles()}
+
+        # the archive runs in a mayapy process: this Maya session stays usable and only shows the progress
+        publish_files: list = None if cmds.radioCollection(self.radio_col, query = True, select = True) == 'folder' else [source_path]
+        self.job = ArchiveJob(source_path=source_path, archive_path=archive_path, publish_files=publish_files, options=options,
+                              on_progress=lambda progress: maya.utils.executeDeferred(self.update_progress, progress),
+                              on_finished=lambda progress: maya.utils.executeDeferred(self.job_finished, progress))
+        self.job.start()
+        self.paused = False
+        om.MGlobal.displayInfo(f'Archive job started, log: {archive_path}/archive.log')
+        cmds.button(self.apply_button, edit=True, enable=False)
+        cmds.button(self.pause_button, edit=True, enable=True, label='PAUSE')
+        cmds.button(self.cancel_button, edit=True, enable=True)
+
+
+    def update_progress(self, progress: dict) -> None:
+
+        # the window may have been closed while the job runs
+        if not cmds.window('customUI', exists=True):
+            return
+        done: float = progress['bytes_done'] / progress['bytes_total'] if progress['bytes_total'] else 0.0
+        cmds.progressBar(self.progress_bar, edit=True, progress=int(min(1.0, done) * 1000))
+        cmds.text(self.progress_text, edit=True, label=format_progress(progress))
 
-        if cmds.radioCollection(self.radio_col, query = True, select = True) == 'folder':
-            archive_tool: Archive = Archive(source_path=source_path, archive_path=archive_path)
-            om.MGlobal.displayInfo(f'archive_tool.archive_files()')
-            archive_tool.archive_files()
 
-        else: # 'file'
-            archive_tool: Archive = Archive(source_path=source_path, archive_path=archive_path)
-            om.MGlobal.displayInfo(f'archive_tool.archive_file()')
-            archive_tool.archive_file(source_path, archive_path)
-            cmds.file(new=True, force=True)
+    def toggle_pause(self, button: str) -> None:
+
+        if self.job is None or not self.job.is_running():
+            return
+        self.paused = not self.paused
+        if self.paused:
+            self.job.pause()
+        else:
+            self.job.resume()
+        cmds.button(self.pause_button, edit=True, label='RESUME' if self.paused else 'PAUSE')
+
+
+    def cancel_archive(self, button: str) -> None:
+
+        if self.job is None or not self.job.is_running():
+            return
+        self.job.cancel()
+        cmds.button(self.pause_button, edit=True, enable=False)
+        cmds.button(self.cancel_button, edit=True, enable=False)
+
+
+    def job_finished(self, progress: dict) -> None:
+
+        if cmds.window('customUI', exists=True):
+            self.update_progress(progress)
+            cmds.button(self.apply_button, edit=True, enable=True)
+            cmds.button(self.pause_button, edit=True, enable=False, label='PAUSE')
+            cmds.button(self.cancel_button, edit=True, enable=False)
+
+        messages: dict = {
+            'done': 'Archiving done.',
+            'cancelled': 'Archiving cancelled, archive again to resume.',
+            'refused': 'Not enough space on the archive share, see archive.log.',
+            'failed': f"Archiving failed, see archive.log.\n{progress['error'].strip().splitlines()[-1] if progress['error'].strip() else ''}"
+        }
+        icon: str = 'information' if progress['state'] in ('done', 'cancelled') else 'critical'
+        cmds.confirmDialog(message=messages.get(progress['state'], progress['state']), messageAlign='left', icon=icon, button='OK')